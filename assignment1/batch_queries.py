@@ -0,0 +1,208 @@
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from assignment1.question1 import preprocess, split_query, is_query_word, query_term, index_documents, \
+    document_names, INVERTED_INDEX_PATH, UTF_8, READ, WRITE
+from assignment1.boolean_query import run_query, postings_of, document_universe, document_frequency
+from assignment2 import vector_spacing
+
+# Constants
+BOOLEAN = 'boolean'
+RANKED = 'ranked'
+STANDARD_STREAM = '-'
+
+
+def read_queries(file: str) -> list:
+    """Reads one query per line, blank lines are skipped"""
+    with open(file, READ, encoding=UTF_8) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def new_stats() -> Counter:
+    return Counter()
+
+
+class BatchPostings:
+    """Index proxy serving the postings decoded for the current batch
+
+    Every term is fetched from the index and decoded once, then dropped after the last
+    query of the batch that uses it. Everything else is delegated to the index.
+    """
+
+    def __init__(self, index, uses: Counter, stats: Counter):
+        self.index = index
+        self.uses = uses
+        self.stats = stats
+        self.decoded = {}
+        self.universe_postings = None
+
+    def postings(self, term: str):
+        postings = self.decoded.get(term)
+        if postings is None:
+            postings = self.decoded[term] = list(postings_of(self.index, term))
+            self.stats['postings_fetched'] += 1
+            self.stats['doc_ids_decoded'] += len(postings)
+        return postings
+
+    def document_frequency(self, term: str) -> int:
+        # Stored in the term dictionary, the postings are only decoded when they are read
+        return document_frequency(self.index, term)
+
+    def universe(self):
+        if self.universe_postings is None:
+            self.universe_postings = document_universe(self.index)
+        return self.universe_postings
+
+    def release(self, terms):
+        """Drops the postings of the terms that no remaining query uses"""
+        for term in terms:
+            self.uses[term] -= 1
+            if self.uses[term] <= 0:
+                self.decoded.pop(term, None)
+
+    def __getitem__(self, term: str):
+        return self.index[term]
+
+    def __contains__(self, term) -> bool:
+        return term in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+
+def preprocess_batch_query(query: str, terms: dict) -> list:
+    """question1.preprocess_query, each distinct word of the batch is preprocessed once"""
+    tokens = split_query(query)
+    for i, word in enumerate(tokens):
+        if is_query_word(word):
+            if word not in terms:
+                terms[word] = query_term(word, preprocess)
+            tokens[i] = terms[word]
+    return tokens
+
+
+def search_boolean_batch(queries, index, stats: Counter = None, index_path: str = INVERTED_INDEX_PATH):
+    """Evaluates the Boolean queries, yields a JSON-ready record per query as it is answered
+
+    Distinct queries are preprocessed and evaluated once. Queries are evaluated grouped by
+    their terms, so queries sharing terms run one after the other while the decoded
+    postings are held, and each postings list is fetched and decoded once per batch.
+    Records carry the position of the query in the input, they come out in evaluation order.
+    Documents are named with the document table of the index saved at index_path.
+    """
+    stats = new_stats() if stats is None else stats
+    start = time.perf_counter()
+    terms = {}
+    parsed = {}
+    positions = {}
+    for position, query in enumerate(queries):
+        stats['queries'] += 1
+        positions.setdefault(query, []).append(position)
+        if query in parsed:
+            continue
+        try:
+            parsed[query] = preprocess_batch_query(query, terms)
+        except ValueError as error:
+            parsed[query] = error
+    stats['unique_queries'] += len(parsed)
+
+    query_terms = {query: sorted({token for token in tokens if is_query_word(token)})
+                   for query, tokens in parsed.items() if not isinstance(tokens, Exception)}
+    uses = Counter(term for terms_of_query in query_terms.values() for term in terms_of_query)
+    batch_index = BatchPostings(index, uses, stats)
+    for query in sorted(parsed, key=lambda query: query_terms.get(query, [])):
+        tokens = parsed[query]
+        record = {'query': query}
+        if isinstance(tokens, Exception):
+            record['error'] = str(tokens)
+        else:
+            try:
+                record['documents'] = document_names(run_query(tokens, batch_index), index_path)
+            except ValueError as error:
+                record['error'] = str(error)
+            batch_index.release(query_terms[query])
+        for position in positions[query]:
+            yield {'id': position, **record}
+    stats['seconds'] += time.perf_counter() - start
+
+
+def search_ranked_batch(queries, index, k: int = vector_spacing.TOP_K, pruning: bool = False,
+                        stats: Counter = None):
+    """Ranks the documents for every query, yields a JSON-ready record per query as it is answered
+
+    Distinct query strings are preprocessed once and queries with the same tokens are scored
+    once. The postings of the vector space index are already decoded in memory.
+    """
+    stats = new_stats() if stats is None else stats
+    start = time.perf_counter()
+    positions = {}
+    for position, query in enumerate(queries):
+        stats['queries'] += 1
+        positions.setdefault(query, []).append(position)
+    stats['unique_queries'] += len(positions)
+
+    # Tokens keep their order, it is the summation order of the scores
+    token_queries = {}
+    for query in positions:
+        token_queries.setdefault(tuple(vector_spacing.preprocess(query)), []).append(query)
+    max_weights = index.max_weights if pruning else None
+    for tokens, same_queries in sorted(token_queries.items()):
+        stats['scored_queries'] += 1
+        results = [[index.doc_ids[doc_id], score] for doc_id, score in vector_spacing.process_query_tokens(
+            list(tokens), index.inverted_index, index.doc_lengths, index.total_docs, index.idf, k, max_weights)]
+        for query in same_queries:
+            for position in positions[query]:
+                yield {'id': position, 'query': query, 'results': results}
+    stats['seconds'] += time.perf_counter() - start
+
+
+def write_jsonl(records, file) -> int:
+    """Writes one JSON object per line as the records come, returns their number"""
+    written = 0
+    for record in records:
+        file.write(json.dumps(record) + '\n')
+        written += 1
+    return written
+
+
+def throughput(stats: Counter) -> dict:
+    """Returns the batch counters with the queries per second"""
+    seconds = stats['seconds']
+    return {**stats, 'queries_per_second': stats['queries'] / seconds if seconds > 0 else float('inf')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluates a file of queries, one per line, into JSONL results')
+    parser.add_argument('mode', choices=(BOOLEAN, RANKED))
+    parser.add_argument('queries', help="file of queries, '-' for standard input")
+    parser.add_argument('--output', default=STANDARD_STREAM, help="JSONL results file, '-' for standard output")
+    parser.add_argument('--k', type=int, default=vector_spacing.TOP_K)
+    parser.add_argument('--pruning', action='store_true', help='rank with MaxScore')
+    args = parser.parse_args()
+
+    queries = [line.strip() for line in sys.stdin if line.strip()] if args.queries == STANDARD_STREAM \
+        else read_queries(args.queries)
+    stats = new_stats()
+    if args.mode == BOOLEAN:
+        records = search_boolean_batch(queries, index_documents(), stats)
+    else:
+        records = search_ranked_batch(queries, vector_spacing.get_index().compact(), args.k, args.pruning, stats)
+
+    if args.output == STANDARD_STREAM:
+        write_jsonl(records, sys.stdout)
+    else:
+        with open(args.output, WRITE, encoding=UTF_8) as f:
+            write_jsonl(records, f)
+    print(json.dumps(throughput(stats)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+import heapq
+from bisect import bisect_left
+from assignment1.instrumentation import instrumented, stage, count, ENABLED as INSTRUMENTED
+
+# Constants
+AND = 'and'
+OR = 'or'
+NOT = 'not'
+TERM = 'term'
+LEFT_PARENTHESIS = '('
+RIGHT_PARENTHESIS = ')'
+OPERATORS = (AND, OR, NOT)
+
+
+# Postings Functions
+def postings_of(index, term: str):
+    """Returns the sorted doc-ids of the term, without copying when the index stores them sorted"""
+    if hasattr(index, 'postings'):
+        return index.postings(term)
+    return sorted(index[term]) if term in index else []
+
+
+def position_lists_of(index, term: str):
+    """Returns the doc-id -> positions mapping of the term, decoded per document when the index supports it"""
+    if hasattr(index, 'position_lists'):
+        return index.position_lists(term)
+    return index[term]
+
+
+@instrumented('postings_fetch')
+def fetch_postings(index, term: str):
+    """postings_of, counting the postings lists and doc-ids touched"""
+    postings = postings_of(index, term)
+    count('postings.lists')
+    count('postings.doc_ids', len(postings))
+    return postings
+
+
+def document_frequency(index, term: str) -> int:
+    """Returns the number of documents containing the term"""
+    if hasattr(index, 'document_frequency'):
+        return index.document_frequency(term)
+    return len(index[term]) if term in index else 0
+
+
+def document_universe(index):
+    """Returns the sorted doc-ids of all documents, the operand of a leading NOT"""
+    if hasattr(index, 'universe'):
+        return index.universe()
+    return sorted(set().union(*index.values()))
+
+
+def gallop(postings, target: int, low: int) -> int:
+    """Returns the first position >= low whose doc-id is >= target, probing 1, 2, 4, ... steps ahead"""
+    step = 1
+    high = low
+    while high < len(postings) and postings[high] < target:
+        low = high + 1
+        high += step
+        step *= 2
+    return bisect_left(postings, target, low, min(high, len(postings)))
+
+
+@instrumented('set_algebra.intersect')
+def intersect(smaller, larger) -> list:
+    """Intersects two sorted doc-id lists in O(m log(n / m)) by galloping through the larger one"""
+    if len(smaller) > len(larger):
+        smaller, larger = larger, smaller
+    result = []
+    position = 0
+    for doc_id in smaller:
+        position = gallop(larger, doc_id, position)
+        if position == len(larger):
+            break
+        if larger[position] == doc_id:
+            result.append(doc_id)
+            position += 1
+    return result
+
+
+@instrumented('set_algebra.difference')
+def difference(postings, excluded) -> list:
+    """Returns the doc-ids of postings that are not in excluded, both sorted"""
+    result = []
+    position = 0
+    for doc_id in postings:
+        position = gallop(excluded, doc_id, position)
+        if position == len(excluded) or excluded[position] != doc_id:
+            result.append(doc_id)
+    return result
+
+
+@instrumented('set_algebra.union')
+def union(postings_lists: list) -> list:
+    """Merges sorted doc-id lists without duplicates"""
+    result = []
+    for doc_id in heapq.merge(*postings_lists):
+        if not result or result[-1] != doc_id:
+            result.append(doc_id)
+    return result
+
+
+# Query Parsing Functions
+def parse_query(tokens: list) -> tuple:
+    """Parses the query tokens into an AST of (operator, operands) nodes
+
+    Precedence, from lowest to highest, is OR, AND, NOT. Adjacent operands without an
+    operator are ANDed, so 'a NOT b' means 'a AND NOT b'.
+    """
+    node, position = parse_or(tokens, 0)
+    if position != len(tokens):
+        raise ValueError(f'Unexpected {tokens[position]!r} in query')
+    return node
+
+
+def is_operator(token: str, operator: str) -> bool:
+    """Checks if the token is the operator, case insensitively"""
+    return token.lower() == operator
+
+
+def parse_or(tokens: list, position: int) -> tuple:
+    """Parses operands separated by OR"""
+    operands = []
+    node, position = parse_and(tokens, position)
+    operands.append(node)
+    while position < len(tokens) and is_operator(tokens[position], OR):
+        node, position = parse_and(tokens, position + 1)
+        operands.append(node)
+    return (OR, operands) if len(operands) > 1 else operands[0], position
+
+
+def parse_and(tokens: list, position: int) -> tuple:
+    """Parses operands separated by AND or by nothing"""
+    operands = []
+    node, position = parse_not(tokens, position)
+    operands.append(node)
+    while position < len(tokens) and not is_operator(tokens[position], OR) \
+            and tokens[position] != RIGHT_PARENTHESIS:
+        if is_operator(tokens[position], AND):
+            position += 1
+        node, position = parse_not(tokens, position)
+        operands.append(node)
+    return (AND, operands) if len(operands) > 1 else operands[0], position
+
+
+def parse_not(tokens: list, position: int) -> tuple:
+    """Parses a possibly negated operand"""
+    if position < len(tokens) and is_operator(tokens[position], NOT):
+        node, position = parse_not(tokens, position + 1)
+        return (NOT, node), position
+    return parse_operand(tokens, position)
+
+
+def parse_operand(tokens: list, position: int) -> tuple:
+    """Parses a term or a parenthesized query"""
+    if position == len(tokens):
+        raise ValueError('Query ends where an operand is expected')
+    token = tokens[position]
+    if token == LEFT_PARENTHESIS:
+        node, position = parse_or(tokens, position + 1)
+        if position == len(tokens) or tokens[position] != RIGHT_PARENTHESIS:
+            raise ValueError('Unbalanced parenthesis in query')
+        return node, position + 1
+    if token == RIGHT_PARENTHESIS or token.lower() in OPERATORS:
+        raise ValueError(f'Unexpected {token!r} in query')
+    return (TERM, token), position + 1
+
+
+# Query Planning and Evaluation Functions
+def estimate_cost(node: tuple, index, num_documents: int) -> int:
+    """Estimates the number of documents a node matches, from document frequencies"""
+    operator, operand = node
+    if operator == TERM:
+        return document_frequency(index, operand)
+    if operator == NOT:
+        return max(num_documents - estimate_cost(operand, index, num_documents), 0)
+    costs = [estimate_cost(child, index, num_documents) for child in operand]
+    return min(costs) if operator == AND else sum(costs)
+
+
+def evaluate(node: tuple, index, universe=None) -> list:
+    """Evaluates the AST against the index, returns the sorted matching doc-ids"""
+    operator, operand = node
+    if operator == TERM:
+        if INSTRUMENTED:
+            return fetch_postings(index, operand)
+        return postings_of(index, operand)
+    if operator == OR:
+        return union([evaluate(child, index, universe) for child in operand])
+    if operator == NOT:
+        universe = document_universe(index) if universe is None else universe
+        return difference(universe, evaluate(operand, index, universe))
+
+    # AND: positive operands are intersected rarest first, negated ones are subtracted at the end
+    num_documents = len(universe) if universe is not None else getattr(index, 'num_documents', 0)
+    positives = sorted((child for child in operand if child[0] != NOT),
+                       key=lambda child: estimate_cost(child, index, num_documents))
+    negatives = sorted((child[1] for child in operand if child[0] == NOT),
+                       key=lambda child: -estimate_cost(child, index, num_documents))
+    if positives:
+        result = evaluate(positives[0], index, universe)
+        for child in positives[1:]:
+            if not result:
+                return []
+            result = intersect(result, evaluate(child, index, universe))
+    else:
+        universe = document_universe(index) if universe is None else universe
+        result = universe
+    for child in negatives:
+        if not result:
+            return []
+        result = difference(result, evaluate(child, index, universe))
+    return list(result)
+
+
+def run_query(tokens: list, index) -> list:
+    """Parses and evaluates the preprocessed query tokens"""
+    with stage('boolean.parse'):
+        node = parse_query(tokens)
+    with stage('boolean.evaluate'):
+        return list(evaluate(node, index))
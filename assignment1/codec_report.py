@@ -0,0 +1,109 @@
+import os
+import sys
+import tempfile
+import time
+from ast import literal_eval
+from assignment1.index_store import write_binary_index, open_binary_index, dictionary_path, postings_path, \
+    CODEC_RAW, CODEC_VBYTE, KIND_DOCUMENTS, KIND_POSITIONAL
+from assignment1.compact_index import CompactIndex
+from assignment1.question1 import build_index, create_inverted_index, preprocess, DOCUMENT_PATH, UTF_8
+from assignment1.question2a import create_bi_word_index
+from assignment1.question2b import create_positional_index
+from assignment1.question2c import create_soundex_index, preprocess_for_soundex
+
+# Constants
+REPORT_INDEXES = (
+    ('inverted', create_inverted_index, preprocess, KIND_DOCUMENTS),
+    ('bi-word', create_bi_word_index, preprocess, KIND_DOCUMENTS),
+    ('positional', create_positional_index, preprocess, KIND_POSITIONAL),
+    ('soundex', create_soundex_index, preprocess_for_soundex, KIND_DOCUMENTS),
+)
+CODECS = (('raw', CODEC_RAW), ('vbyte', CODEC_VBYTE))
+
+
+def python_size(index: dict) -> int:
+    """Estimates the memory held by an in-memory index: the dict, its keys, containers and integers"""
+    size = sys.getsizeof(index)
+    for term, postings in index.items():
+        size += sys.getsizeof(term) + sys.getsizeof(postings)
+        for doc_id in postings:
+            size += sys.getsizeof(doc_id)
+            if isinstance(postings, dict):
+                positions = postings[doc_id]
+                size += sys.getsizeof(positions) + sum(sys.getsizeof(position) for position in positions)
+    return size
+
+
+def count_entries(index: dict) -> int:
+    """Returns the number of doc-ids and positions stored in the index"""
+    return sum(len(postings) + sum(len(positions) for positions in postings.values())
+               if isinstance(postings, dict) else len(postings) for postings in index.values())
+
+
+def decode_index(index, kind: int) -> float:
+    """Decodes every postings list of the index, returns the elapsed seconds"""
+    start = time.perf_counter()
+    for term in index:
+        if kind == KIND_POSITIONAL:
+            index[term]
+        else:
+            list(index.postings(term))
+    return time.perf_counter() - start
+
+
+def decode_all(path: str, kind: int) -> float:
+    """Decodes every postings list of the binary index, returns the elapsed seconds"""
+    with open_binary_index(path) as index:
+        return decode_index(index, kind)
+
+
+def parse_text(text: str) -> float:
+    """Parses a text dump back into an index, returns the elapsed seconds"""
+    start = time.perf_counter()
+    literal_eval(text)
+    return time.perf_counter() - start
+
+
+def report_index(index: dict, kind: int, work_dir: str) -> list:
+    """Measures the size and decode throughput of the text dump, the in-memory indexes and each binary codec"""
+    entries = count_entries(index)
+    text = str(index)
+    rows = [{'representation': 'text', 'bytes': len(text.encode(UTF_8)),
+             'seconds': parse_text(text)},
+            {'representation': 'python', 'bytes': python_size(index), 'seconds': 0.0}]
+    compact_index = CompactIndex(index)
+    rows.append({'representation': 'compact', 'bytes': compact_index.nbytes(),
+                 'seconds': decode_index(compact_index, kind)})
+    for name, codec in CODECS:
+        path = os.path.join(work_dir, name)
+        write_binary_index(index, path, kind, codec=codec)
+        size = os.path.getsize(dictionary_path(path)) + os.path.getsize(postings_path(path))
+        rows.append({'representation': name, 'bytes': size, 'seconds': decode_all(path, kind)})
+    for row in rows:
+        row['bytes_per_entry'] = row['bytes'] / entries if entries else 0.0
+        row['entries_per_second'] = entries / row['seconds'] if row['seconds'] > 0 else float('inf')
+    return rows
+
+
+def report(dir_path: str = DOCUMENT_PATH) -> dict:
+    """Builds every index of the corpus and compares its representations"""
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, builder, preprocessor, kind in REPORT_INDEXES:
+            index = build_index(builder, dir_path, preprocessor=preprocessor)
+            results[name] = report_index(index, kind, work_dir)
+    return results
+
+
+def main():
+    """Prints the size and decode throughput of each index representation"""
+    print(f"{'index':<11} {'format':<8} {'bytes':>12} {'bytes/entry':>12} {'entries/s':>12}")
+    for name, rows in report().items():
+        for row in rows:
+            throughput = f"{row['entries_per_second']:>12.0f}" if row['representation'] != 'python' else f"{'-':>12}"
+            print(f"{name:<11} {row['representation']:<8} {row['bytes']:>12} {row['bytes_per_entry']:>12.2f} "
+                  f"{throughput}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import copy
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from assignment1.index_store import infer_kind, KIND_DOCUMENTS, KIND_POSITIONAL, DOC_ID_TYPE
+from assignment1.query_cache import new_version
+
+# Constants
+OFFSET_TYPE = 'I'
+
+
+class CompactIndex(Mapping):
+    """Read-only in-memory index made of a sorted term table and contiguous arrays
+
+    The doc-ids of the i-th term are doc_ids[offsets[i]:offsets[i + 1]]. In a positional
+    index, the positions of the j-th posting are positions[position_offsets[j]:position_offsets[j + 1]].
+    Terms are interned so that they are shared with the query tokens. Lookups return the
+    same types as BinaryIndex, so the search functions work on either.
+    """
+
+    def __init__(self, index, num_documents: int = None):
+        self.kind = getattr(index, 'kind', None)
+        if self.kind is None:
+            self.kind = infer_kind(index)
+        positional = self.kind == KIND_POSITIONAL
+        self.terms = tuple(sys.intern(term) for term in sorted(index))
+        self.offsets = array(OFFSET_TYPE, [0])
+        self.doc_ids = array(DOC_ID_TYPE)
+        self.position_offsets = array(OFFSET_TYPE, [0]) if positional else None
+        self.positions_array = array(DOC_ID_TYPE) if positional else None
+        max_doc_id = -1
+        for term in self.terms:
+            postings = index[term]
+            doc_ids = sorted(postings)
+            self.doc_ids.extend(doc_ids)
+            self.offsets.append(len(self.doc_ids))
+            if doc_ids:
+                max_doc_id = max(max_doc_id, doc_ids[-1])
+            if positional:
+                for doc_id in doc_ids:
+                    self.positions_array.extend(postings[doc_id])
+                    self.position_offsets.append(len(self.positions_array))
+        if num_documents is None:
+            num_documents = getattr(index, 'num_documents', max_doc_id + 1)
+        self.num_documents = num_documents
+        self.version = new_version()
+
+    def term_number(self, term: str) -> int:
+        """Returns the rank of the term in the term table, -1 when it is not indexed"""
+        i = bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else -1
+
+    def document_frequency(self, term: str) -> int:
+        """Returns the number of documents containing the term"""
+        i = self.term_number(term)
+        return self.offsets[i + 1] - self.offsets[i] if i >= 0 else 0
+
+    def universe(self) -> range:
+        """Returns the doc-ids of all indexed documents"""
+        return range(self.num_documents)
+
+    def postings(self, term: str):
+        """Returns the sorted doc-ids of the term as a view on the doc-id array"""
+        i = self.term_number(term)
+        if i < 0:
+            return array(DOC_ID_TYPE)
+        return memoryview(self.doc_ids)[self.offsets[i]:self.offsets[i + 1]]
+
+    def positions(self, term: str, doc_id: int) -> list:
+        """Returns the positions of the term in the document"""
+        i = self.term_number(term)
+        if i < 0 or self.kind != KIND_POSITIONAL:
+            return []
+        j = bisect_left(self.doc_ids, doc_id, self.offsets[i], self.offsets[i + 1])
+        if j == self.offsets[i + 1] or self.doc_ids[j] != doc_id:
+            return []
+        return self.positions_array[self.position_offsets[j]:self.position_offsets[j + 1]].tolist()
+
+    def document_index(self) -> 'CompactIndex':
+        """Returns the doc-id index of a positional index, sharing its term table and doc-id array"""
+        index = copy.copy(self)
+        index.kind = KIND_DOCUMENTS
+        index.position_offsets = None
+        index.positions_array = None
+        return index
+
+    def __getitem__(self, term: str):
+        i = self.term_number(term)
+        if i < 0:
+            raise KeyError(term)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        if self.kind == KIND_DOCUMENTS:
+            return set(self.doc_ids[start:end])
+        positions, position_offsets = self.positions_array, self.position_offsets
+        return {self.doc_ids[j]: positions[position_offsets[j]:position_offsets[j + 1]].tolist()
+                for j in range(start, end)}
+
+    def __contains__(self, term) -> bool:
+        return self.term_number(term) >= 0
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def nbytes(self) -> int:
+        """Returns the memory held by the term table and the arrays"""
+        size = sys.getsizeof(self.terms) + sum(sys.getsizeof(term) for term in self.terms)
+        for values in (self.offsets, self.doc_ids, self.position_offsets, self.positions_array):
+            if values is not None:
+                size += sys.getsizeof(values)
+        return size
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+# Constants
+DOCUMENT_TABLE_EXTENSION = '.documents.json'
+READ = 'r'
+WRITE = 'w'
+READ_BINARY = 'rb'
+UTF_8 = 'utf-8'
+HASH_BLOCK_SIZE = 2 ** 20
+TEMPORARY_EXTENSION = '.tmp'
+
+
+def file_hash(file: str) -> str:
+    """Returns the SHA-1 of the file content"""
+    digest = hashlib.sha1()
+    with open(file, READ_BINARY) as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def document_table_path(path: str) -> str:
+    """Returns the document table file of the index stored at path"""
+    return path + DOCUMENT_TABLE_EXTENSION
+
+
+class DocumentTable:
+    """Path, length in bytes, modification time and content hash of each indexed document, by doc-id
+
+    Saved with an index so that results resolve to file names without listing the
+    directory, and without relying on the listing order staying the same.
+    """
+
+    def __init__(self, documents: list):
+        self.documents = documents
+        self.file_names = [os.path.basename(document['path']) for document in documents]
+
+    @classmethod
+    def from_files(cls, files: list) -> 'DocumentTable':
+        """Describes the files, the position of a file is its doc-id"""
+        documents = []
+        for file in files:
+            stat = os.stat(file)
+            documents.append({'path': file, 'length': stat.st_size, 'mtime': stat.st_mtime,
+                              'hash': file_hash(file)})
+        return cls(documents)
+
+    def name(self, doc_id: int) -> str:
+        return self.file_names[doc_id]
+
+    def names(self, doc_ids) -> list:
+        """Returns the file names of the documents, in doc-id order"""
+        file_names = self.file_names
+        return [file_names[doc_id] for doc_id in sorted(doc_ids)]
+
+    def save(self, path: str):
+        """Atomically replaces the document table of the index stored at path"""
+        file = document_table_path(path)
+        with open(file + TEMPORARY_EXTENSION, WRITE, encoding=UTF_8) as f:
+            json.dump({'documents': self.documents}, f)
+        os.replace(file + TEMPORARY_EXTENSION, file)
+        load_document_table.cache_clear()
+
+    @classmethod
+    def load(cls, path: str) -> 'DocumentTable':
+        with open(document_table_path(path), READ, encoding=UTF_8) as f:
+            return cls(json.load(f)['documents'])
+
+    def describes(self, files: list) -> bool:
+        """Checks if the table lists the files in the same order, each one unchanged since it was described
+
+        Files whose modification time changed are compared by content hash.
+        """
+        if [os.path.basename(file) for file in files] != self.file_names:
+            return False
+        return all(os.stat(file).st_mtime == document['mtime'] or file_hash(file) == document['hash']
+                   for file, document in zip(files, self.documents))
+
+    def __getitem__(self, doc_id: int) -> dict:
+        return self.documents[doc_id]
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
+def save_document_table(files: list, path: str) -> DocumentTable:
+    """Describes the indexed files and saves the table next to the index stored at path"""
+    table = DocumentTable.from_files(files)
+    table.save(path)
+    return table
+
+
+def document_table_exists(path: str) -> bool:
+    return os.path.exists(document_table_path(path))
+
+
+@lru_cache(maxsize=None)
+def load_document_table(path: str):
+    """Returns the document table of the index stored at path, loaded once, None when there is none"""
+    return DocumentTable.load(path) if document_table_exists(path) else None
@@ -0,0 +1,261 @@
+import json
+import os
+import threading
+from collections.abc import Mapping
+from assignment1.index_store import write_binary_index, open_binary_index, remove_binary_index, KIND_DOCUMENTS, \
+    KIND_POSITIONAL
+from assignment1.query_cache import new_version
+from assignment1.document_table import file_hash
+from assignment1.question1 import preprocess, create_inverted_index, build_partial_index, DOCUMENT_PATH, \
+    INVERTED_INDEX_PATH, DOCUMENT_EXTENSION, UTF_8, READ, WRITE, INPUT_MESSAGE, QUERY_SUCCESS_MESSAGE, \
+    QUERY_FAILURE_MESSAGE, preprocess_query, search
+
+# Constants
+MANIFEST_EXTENSION = '.manifest.json'
+SEGMENT_EXTENSION = '.seg'
+TEMPORARY_EXTENSION = '.tmp'
+MAX_SEGMENTS = 8
+
+
+def empty_manifest() -> dict:
+    """Returns the manifest of an index without documents"""
+    return {'next_doc_id': 0, 'next_segment': 0, 'segments': [], 'tombstones': [], 'documents': {}}
+
+
+class SegmentedIndex(Mapping):
+    """Index made of immutable binary segments, updated by adding delta segments
+
+    New and changed documents are indexed into a delta segment under fresh doc-ids,
+    the doc-ids of changed and deleted documents become tombstones that are filtered
+    out on lookup. Segments are merged, dropping the tombstoned doc-ids, in a
+    background thread once there are more than MAX_SEGMENTS of them.
+    """
+
+    def __init__(self, path: str, builder=create_inverted_index, preprocessor=preprocess,
+                 kind: int = KIND_DOCUMENTS, max_segments: int = MAX_SEGMENTS):
+        self.path = path
+        self.builder = builder
+        self.preprocessor = preprocessor
+        self.kind = kind
+        self.max_segments = max_segments
+        self.lock = threading.RLock()
+        self.merge_thread = None
+
+        if os.path.exists(self.manifest_path()):
+            with open(self.manifest_path(), READ, encoding=UTF_8) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = empty_manifest()
+        self.tombstones = set(self.manifest['tombstones'])
+        self.segments = [open_binary_index(self.segment_path(name)) for name in self.manifest['segments']]
+        # Changes with every update, cached results and postings of older versions are dropped
+        self.version = new_version()
+
+    def manifest_path(self) -> str:
+        """Returns the manifest file of the index"""
+        return self.path + MANIFEST_EXTENSION
+
+    def segment_path(self, name: int) -> str:
+        """Returns the path of a segment"""
+        return self.path + SEGMENT_EXTENSION + str(name)
+
+    def save_manifest(self):
+        """Atomically replaces the manifest on disk"""
+        self.manifest['tombstones'] = sorted(self.tombstones)
+        temporary_path = self.manifest_path() + TEMPORARY_EXTENSION
+        with open(temporary_path, WRITE, encoding=UTF_8) as f:
+            json.dump(self.manifest, f)
+        os.replace(temporary_path, self.manifest_path())
+
+    def new_segment_name(self) -> int:
+        """Reserves the name of a new segment"""
+        name = self.manifest['next_segment']
+        self.manifest['next_segment'] += 1
+        return name
+
+    # Updates
+    def changed_files(self, dir_path: str) -> tuple:
+        """Compares the directory with the manifest, returns the new or changed files, the removed ones and
+        whether only modification times were updated"""
+        documents = self.manifest['documents']
+        files = {file for file in os.listdir(dir_path) if file.endswith(DOCUMENT_EXTENSION)}
+        changed = []
+        touched = False
+        for file in sorted(files):
+            file_path = os.path.join(dir_path, file)
+            mtime = os.stat(file_path).st_mtime
+            known = documents.get(file)
+            if known is not None and known['mtime'] == mtime:
+                continue
+            content_hash = file_hash(file_path)
+            if known is not None and known['hash'] == content_hash:
+                known['mtime'] = mtime
+                touched = True
+                continue
+            changed.append((file, mtime, content_hash))
+        removed = [file for file in documents if file not in files]
+        return changed, removed, touched
+
+    def refresh(self, dir_path: str = DOCUMENT_PATH) -> tuple:
+        """Indexes new and changed documents into a delta segment and tombstones the stale ones"""
+        changed, removed, touched = self.changed_files(dir_path)
+        if not changed and not removed:
+            if touched:
+                self.save_manifest()
+            return 0, 0
+
+        with self.lock:
+            documents = self.manifest['documents']
+            for file in removed:
+                self.tombstones.add(documents.pop(file)['doc_id'])
+            for file, _, _ in changed:
+                if file in documents:
+                    self.tombstones.add(documents[file]['doc_id'])
+
+            if changed:
+                offset = self.manifest['next_doc_id']
+                delta = build_partial_index(self.builder, self.preprocessor,
+                                            [os.path.join(dir_path, file) for file, _, _ in changed], offset)
+                name = self.new_segment_name()
+                write_binary_index(delta, self.segment_path(name), self.kind, offset + len(changed))
+                for doc_id, (file, mtime, content_hash) in enumerate(changed, offset):
+                    documents[file] = {'doc_id': doc_id, 'mtime': mtime, 'hash': content_hash}
+                self.manifest['next_doc_id'] = offset + len(changed)
+                self.manifest['segments'].append(name)
+                self.segments.append(open_binary_index(self.segment_path(name)))
+            self.save_manifest()
+            self.version = new_version()
+
+        if len(self.segments) > self.max_segments:
+            self.merge_in_background()
+        return len(changed), len(removed)
+
+    def merge_in_background(self) -> threading.Thread:
+        """Starts merging the segments in a background thread, unless a merge is already running"""
+        if self.merge_thread is None or not self.merge_thread.is_alive():
+            self.merge_thread = threading.Thread(target=self.merge, daemon=True)
+            self.merge_thread.start()
+        return self.merge_thread
+
+    def merge(self):
+        """Merges the current segments into one, dropping the tombstoned doc-ids"""
+        with self.lock:
+            segments = list(self.segments)
+            names = list(self.manifest['segments'])
+            tombstones = set(self.tombstones)
+            name = self.new_segment_name()
+        if len(segments) <= 1 and not tombstones:
+            return
+
+        # Lookups keep being served from the old segments while the merged one is written
+        merged = {}
+        for term in sorted(set().union(*segments)):
+            postings = self.merge_postings(segments, term, tombstones)
+            if postings:
+                merged[term] = postings
+        write_binary_index(merged, self.segment_path(name), self.kind, max(
+            (segment.num_documents for segment in segments), default=0))
+
+        with self.lock:
+            # Segments and tombstones added while merging are kept
+            self.segments = [open_binary_index(self.segment_path(name))] + self.segments[len(segments):]
+            self.manifest['segments'] = [name] + self.manifest['segments'][len(names):]
+            self.tombstones -= tombstones
+            self.save_manifest()
+            self.version = new_version()
+        for segment, old_name in zip(segments, names):
+            segment.close()
+            remove_binary_index(self.segment_path(old_name))
+
+    def wait_for_merge(self):
+        """Blocks until the background merge, if any, is done"""
+        if self.merge_thread is not None:
+            self.merge_thread.join()
+
+    # Lookups
+    def merge_postings(self, segments: list, term: str, tombstones: set):
+        """Combines the postings of the term across segments without the tombstoned doc-ids"""
+        if self.kind == KIND_POSITIONAL:
+            postings = {}
+            for segment in segments:
+                if term in segment:
+                    postings.update((doc_id, positions) for doc_id, positions in segment[term].items()
+                                    if doc_id not in tombstones)
+            return postings
+        return [doc_id for segment in segments if term in segment
+                for doc_id in segment.postings(term) if doc_id not in tombstones]
+
+    def postings(self, term: str) -> list:
+        """Returns the sorted live doc-ids of the term"""
+        with self.lock:
+            postings = self.merge_postings(self.segments, term, self.tombstones)
+        return sorted(postings)
+
+    def universe(self) -> list:
+        """Returns the sorted doc-ids of the live documents"""
+        return sorted(document['doc_id'] for document in self.manifest['documents'].values())
+
+    def __getitem__(self, term: str):
+        with self.lock:
+            postings = self.merge_postings(self.segments, term, self.tombstones)
+        if not postings:
+            raise KeyError(term)
+        return postings if self.kind == KIND_POSITIONAL else set(postings)
+
+    def __contains__(self, term) -> bool:
+        # The term dictionaries answer, postings are only read when tombstones may have removed every one
+        with self.lock:
+            segments = [segment for segment in self.segments if term in segment]
+            if not segments or not self.tombstones:
+                return bool(segments)
+            return any(doc_id not in self.tombstones for segment in segments for doc_id in segment.postings(term))
+
+    def __iter__(self):
+        with self.lock:
+            terms = sorted(set().union(*self.segments))
+        return (term for term in terms if term in self)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def document_names(self, indices) -> list:
+        """Maps doc-ids back to the file names recorded in the manifest"""
+        names = {document['doc_id']: file for file, document in self.manifest['documents'].items()}
+        return [names[doc_id] for doc_id in sorted(indices) if doc_id in names]
+
+    def close(self):
+        """Waits for a running merge and closes the segments"""
+        self.wait_for_merge()
+        for segment in self.segments:
+            segment.close()
+
+
+def index_documents_incrementally(path: str = INVERTED_INDEX_PATH, dir_path: str = DOCUMENT_PATH,
+                                  builder=create_inverted_index, preprocessor=preprocess,
+                                  kind: int = KIND_DOCUMENTS) -> SegmentedIndex:
+    """Opens the segmented index and brings it up to date with the directory"""
+    index = SegmentedIndex(path, builder, preprocessor, kind)
+    index.refresh(dir_path)
+    return index
+
+
+def main():
+    """Opens the index once, refreshes it before each query and closes it on exit"""
+    inverted_index = index_documents_incrementally()
+    try:
+        while True:
+            query = input(INPUT_MESSAGE)
+            inverted_index.refresh()
+            result = search(preprocess_query(query), inverted_index)
+            if not result:
+                print(QUERY_FAILURE_MESSAGE)
+            else:
+                print(QUERY_SUCCESS_MESSAGE)
+                for name in inverted_index.document_names(result):
+                    print(name)
+    finally:
+        inverted_index.close()
+
+
+if __name__ == '__main__':
+    main()
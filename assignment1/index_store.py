@@ -0,0 +1,325 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+from assignment1.postings_codec import encode as vbyte_encode_postings, CompressedPostings, CompressedPositions
+from assignment1.query_cache import new_version
+
+# Constants
+DICTIONARY_EXTENSION = '.dict'
+POSTINGS_EXTENSION = '.postings'
+READ_BINARY = 'rb'
+WRITE_BINARY = 'wb'
+UTF_8 = 'utf-8'
+MAGIC = b'IRIX'
+VERSION = 2
+# Version 1 stored the kind as a 16-bit field, its high byte reads as the raw codec
+SUPPORTED_VERSIONS = (1, 2)
+KIND_DOCUMENTS = 0
+KIND_POSITIONAL = 1
+CODEC_RAW = 0
+CODEC_VBYTE = 1
+DEFAULT_CODEC = CODEC_VBYTE
+DOC_ID_TYPE = 'I'
+# magic, version, kind, codec, number of terms, number of documents
+HEADER = struct.Struct('<4sHBBII')
+# term length, postings offset, postings length in bytes, document frequency
+ENTRY = struct.Struct('<HQQI')
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+def dictionary_path(path: str) -> str:
+    """Returns the term dictionary file of the index stored at path"""
+    return path + DICTIONARY_EXTENSION
+
+
+def postings_path(path: str) -> str:
+    """Returns the postings file of the index stored at path"""
+    return path + POSTINGS_EXTENSION
+
+
+def binary_index_exists(path: str) -> bool:
+    """Checks if a binary index is stored at path"""
+    return os.path.exists(dictionary_path(path)) and os.path.exists(postings_path(path))
+
+
+def to_bytes(values) -> bytes:
+    """Encodes the integers as little-endian unsigned 32-bit values"""
+    values = array(DOC_ID_TYPE, values)
+    if not LITTLE_ENDIAN:
+        values.byteswap()
+    return values.tobytes()
+
+
+def from_bytes(buffer):
+    """Decodes little-endian unsigned 32-bit values without copying when possible"""
+    if LITTLE_ENDIAN:
+        return memoryview(buffer).cast(DOC_ID_TYPE)
+    values = array(DOC_ID_TYPE, bytes(buffer))
+    values.byteswap()
+    return values
+
+
+def infer_kind(index: dict) -> int:
+    """Infers whether the index maps terms to document sets or to positional postings"""
+    for postings in index.values():
+        return KIND_POSITIONAL if isinstance(postings, dict) else KIND_DOCUMENTS
+    return KIND_DOCUMENTS
+
+
+def encode_postings(postings, kind: int, codec: int = CODEC_RAW) -> tuple:
+    """Encodes the postings of a term, returns the bytes and the document frequency
+
+    With the raw codec, document postings are stored as a sorted doc-id array and
+    positional postings as the sorted doc-id array, followed by the number of positions
+    of each document and the concatenated position lists. The VByte codec stores the
+    same values gap encoded in blocks, see postings_codec.
+    """
+    doc_ids = sorted(postings)
+    if kind == KIND_DOCUMENTS:
+        if codec == CODEC_VBYTE:
+            return vbyte_encode_postings(doc_ids), len(doc_ids)
+        return to_bytes(doc_ids), len(doc_ids)
+
+    counts = [len(postings[doc_id]) for doc_id in doc_ids]
+    positions = [position for doc_id in doc_ids for position in postings[doc_id]]
+    if codec == CODEC_VBYTE:
+        return vbyte_encode_postings(doc_ids, counts, positions), len(doc_ids)
+    return to_bytes(doc_ids) + to_bytes(counts) + to_bytes(positions), len(doc_ids)
+
+
+def transcode_postings(data, doc_freq: int, kind: int, codec: int) -> bytes:
+    """Re-encodes raw encoded postings with the codec"""
+    if codec == CODEC_RAW:
+        return data
+    values = from_bytes(data)
+    if kind == KIND_DOCUMENTS:
+        return vbyte_encode_postings(values)
+    return vbyte_encode_postings(values[:doc_freq], values[doc_freq:2 * doc_freq], values[2 * doc_freq:])
+
+
+class IndexWriter:
+    """Streams terms, in sorted order, into a term dictionary and a postings file"""
+
+    def __init__(self, path: str, kind: int = KIND_DOCUMENTS, num_documents: int = None, codec: int = CODEC_RAW):
+        self.path = path
+        self.kind = kind
+        self.codec = codec
+        self.num_documents = num_documents
+        self.num_terms = 0
+        self.max_doc_id = -1
+        self.offset = 0
+        self.last_term = None
+        self.dictionary_file = open(dictionary_path(path), WRITE_BINARY)
+        self.postings_file = open(postings_path(path), WRITE_BINARY)
+        self.dictionary_file.write(HEADER.pack(MAGIC, VERSION, kind, codec, 0, 0))
+
+    def add(self, term: str, postings):
+        """Appends the postings of the term, terms must be added in increasing order"""
+        if self.last_term is not None and term <= self.last_term:
+            raise ValueError(f'Terms must be added in increasing order: {term!r} after {self.last_term!r}')
+        data, doc_freq = encode_postings(postings, self.kind, self.codec)
+        self.add_encoded(term, data, doc_freq, max(postings) if doc_freq else -1)
+
+    def add_encoded(self, term: str, data: bytes, doc_freq: int, max_doc_id: int):
+        """Appends postings of the term already encoded with the codec of the writer"""
+        encoded_term = term.encode(UTF_8)
+        self.dictionary_file.write(ENTRY.pack(len(encoded_term), self.offset, len(data), doc_freq))
+        self.dictionary_file.write(encoded_term)
+        self.postings_file.write(data)
+        self.offset += len(data)
+        self.num_terms += 1
+        self.max_doc_id = max(self.max_doc_id, max_doc_id)
+        self.last_term = term
+
+    def close(self):
+        """Writes the final header and closes the files"""
+        if self.dictionary_file.closed:
+            return
+        num_documents = self.num_documents if self.num_documents is not None else self.max_doc_id + 1
+        self.dictionary_file.seek(0)
+        header = HEADER.pack(MAGIC, VERSION, self.kind, self.codec, self.num_terms, num_documents)
+        self.dictionary_file.write(header)
+        self.dictionary_file.close()
+        self.postings_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BinaryIndex(Mapping):
+    """Read-only index backed by a term dictionary and a memory-mapped postings file
+
+    Only the term dictionary is read up front, postings are decoded from the
+    memory map when a term is looked up.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(dictionary_path(path), READ_BINARY) as f:
+            data = f.read()
+        magic, version, self.kind, self.codec, self.num_terms, self.num_documents = HEADER.unpack_from(data)
+        if magic != MAGIC or version not in SUPPORTED_VERSIONS:
+            raise ValueError(f'{dictionary_path(path)} is not a version {VERSION} binary index')
+        self.terms = self.read_dictionary(data)
+        # The index is immutable, a new version is only needed per opened index
+        self.version = new_version()
+
+        self.postings_file = open(postings_path(path), READ_BINARY)
+        if os.fstat(self.postings_file.fileno()).st_size:
+            self.buffer = mmap.mmap(self.postings_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.buffer = b''
+
+    def read_dictionary(self, data: bytes) -> dict:
+        """Parses the term dictionary into term -> (offset, length, document frequency)"""
+        terms = {}
+        position = HEADER.size
+        for _ in range(self.num_terms):
+            term_length, offset, length, doc_freq = ENTRY.unpack_from(data, position)
+            position += ENTRY.size
+            term = data[position:position + term_length].decode(UTF_8)
+            position += term_length
+            terms[term] = (offset, length, doc_freq)
+        return terms
+
+    def raw_postings(self, term: str) -> memoryview:
+        """Returns the encoded postings of the term as a view on the memory map"""
+        offset, length, _ = self.terms[term]
+        return memoryview(self.buffer)[offset:offset + length]
+
+    def document_frequency(self, term: str) -> int:
+        """Returns the number of documents containing the term"""
+        return self.terms[term][2] if term in self.terms else 0
+
+    def universe(self) -> range:
+        """Returns the doc-ids of all indexed documents"""
+        return range(self.num_documents)
+
+    def postings(self, term: str):
+        """Returns the sorted doc-ids of the term without building a set
+
+        Raw postings are a view on the memory map, compressed ones are decoded block by
+        block as they are accessed.
+        """
+        if term not in self.terms:
+            return array(DOC_ID_TYPE)
+        doc_freq = self.terms[term][2]
+        if self.codec == CODEC_VBYTE:
+            return CompressedPostings(self.raw_postings(term), doc_freq, self.kind == KIND_POSITIONAL)
+        return from_bytes(self.raw_postings(term)[:4 * doc_freq])
+
+    def positional_postings(self, term: str) -> tuple:
+        """Returns the doc-ids, the position counts and the concatenated positions of the term"""
+        doc_freq = self.terms[term][2]
+        if self.codec == CODEC_VBYTE:
+            doc_ids, counts, positions = array(DOC_ID_TYPE), array(DOC_ID_TYPE), array(DOC_ID_TYPE)
+            for doc_id, document_positions in self.postings(term).items():
+                doc_ids.append(doc_id)
+                counts.append(len(document_positions))
+                positions.extend(document_positions)
+            return doc_ids, counts, positions
+        values = from_bytes(self.raw_postings(term))
+        return values[:doc_freq], values[doc_freq:2 * doc_freq], values[2 * doc_freq:]
+
+    def position_lists(self, term: str):
+        """Returns the doc-id -> positions mapping of the term, compressed positions are decoded per document"""
+        if self.codec == CODEC_VBYTE:
+            if term not in self.terms:
+                raise KeyError(term)
+            return CompressedPositions(self.postings(term))
+        return self[term]
+
+    def positions(self, term: str, doc_id: int) -> list:
+        """Returns the positions of the term in the document"""
+        if self.codec == CODEC_VBYTE:
+            return self.postings(term).positions(doc_id)
+        doc_ids, counts, positions = self.positional_postings(term)
+        start = 0
+        for i, current in enumerate(doc_ids):
+            if current == doc_id:
+                return list(positions[start:start + counts[i]])
+            start += counts[i]
+        return []
+
+    def __getitem__(self, term: str):
+        if term not in self.terms:
+            raise KeyError(term)
+        if self.kind == KIND_DOCUMENTS:
+            return set(self.postings(term))
+
+        if self.codec == CODEC_VBYTE:
+            return dict(self.postings(term).items())
+        doc_ids, counts, positions = self.positional_postings(term)
+        postings = {}
+        start = 0
+        for doc_id, count in zip(doc_ids, counts):
+            postings[doc_id] = list(positions[start:start + count])
+            start += count
+        return postings
+
+    def __contains__(self, term) -> bool:
+        return term in self.terms
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __len__(self) -> int:
+        return self.num_terms
+
+    def close(self):
+        """Releases the memory map and the postings file"""
+        if isinstance(self.buffer, mmap.mmap):
+            try:
+                self.buffer.close()
+            except BufferError:
+                # postings views handed out to callers are still alive
+                pass
+        self.postings_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_encoded_postings(path: str):
+    """Streams (term, document frequency, encoded postings) in term order without loading the dictionary
+
+    The postings are returned as stored, in the codec of the index.
+    """
+    with open(dictionary_path(path), READ_BINARY) as dictionary_file, \
+            open(postings_path(path), READ_BINARY) as postings_file:
+        _, _, _, _, num_terms, _ = HEADER.unpack(dictionary_file.read(HEADER.size))
+        for _ in range(num_terms):
+            term_length, offset, length, doc_freq = ENTRY.unpack(dictionary_file.read(ENTRY.size))
+            term = dictionary_file.read(term_length).decode(UTF_8)
+            # Postings are written in term order, so they are read sequentially
+            yield term, doc_freq, postings_file.read(length)
+
+
+def remove_binary_index(path: str):
+    """Deletes the files of the binary index stored at path"""
+    for file in (dictionary_path(path), postings_path(path)):
+        if os.path.exists(file):
+            os.remove(file)
+
+
+def write_binary_index(index: dict, path: str, kind: int = None, num_documents: int = None,
+                       codec: int = DEFAULT_CODEC):
+    """Writes the index as a term dictionary and a postings file"""
+    kind = infer_kind(index) if kind is None else kind
+    with IndexWriter(path, kind, num_documents, codec) as writer:
+        for term in sorted(index):
+            writer.add(term, index[term])
+
+
+def open_binary_index(path: str) -> BinaryIndex:
+    """Opens the binary index stored at path"""
+    return BinaryIndex(path)
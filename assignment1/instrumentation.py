@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+# Constants
+ENABLE_VARIABLE = 'IR_INSTRUMENTATION'
+SLOW_QUERY_VARIABLE = 'IR_SLOW_QUERY_MS'
+SLOW_QUERY_MS = 100.0
+DISABLED_VALUES = ('', '0', 'false', 'no')
+QUERY_STAGE_PREFIX = 'query.'
+# Read once at import, disabled hooks are not installed at all
+ENABLED = os.environ.get(ENABLE_VARIABLE, '').lower() not in DISABLED_VALUES
+NO_STAGE = nullcontext()
+
+slow_query_log = logging.getLogger('assignment1.slow_queries')
+
+
+class Recorder:
+    """Calls and seconds of each stage and totals of each counter"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.seconds = Counter()
+        self.counters = Counter()
+
+    def add_stage(self, name: str, seconds: float):
+        with self.lock:
+            self.calls[name] += 1
+            self.seconds[name] += seconds
+
+    def add_count(self, name: str, amount: int):
+        with self.lock:
+            self.counters[name] += amount
+
+    def snapshot(self) -> dict:
+        """Returns the stages, with their mean milliseconds, and the counters"""
+        with self.lock:
+            stages = {name: {'calls': self.calls[name], 'seconds': self.seconds[name],
+                             'mean_ms': 1000 * self.seconds[name] / self.calls[name]} for name in self.calls}
+            return {'stages': stages, 'counters': dict(self.counters)}
+
+
+_totals = Recorder()
+# Recorder of the query running on the thread, stages and counters are also added to it
+_local = threading.local()
+
+
+def slow_query_threshold() -> float:
+    """Returns the duration, in milliseconds, from which a query is logged"""
+    return float(os.environ.get(SLOW_QUERY_VARIABLE, SLOW_QUERY_MS))
+
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+
+def record_stage(name: str, seconds: float):
+    _totals.add_stage(name, seconds)
+    trace = current_trace()
+    if trace is not None:
+        trace.add_stage(name, seconds)
+
+
+def count(name: str, amount: int = 1):
+    """Adds to the counter, callers on hot paths check ENABLED first"""
+    if not ENABLED:
+        return
+    _totals.add_count(name, amount)
+    trace = current_trace()
+    if trace is not None:
+        trace.add_count(name, amount)
+
+
+@contextmanager
+def timed_stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def stage(name: str):
+    """Times the enclosed block as a stage, a shared no-op context when disabled"""
+    return timed_stage(name) if ENABLED else NO_STAGE
+
+
+def instrumented(name: str):
+    """Times every call of the function as a stage, returns the function unchanged when disabled"""
+    def decorator(function):
+        if not ENABLED:
+            return function
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with timed_stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def format_breakdown(kind: str, query, seconds: float, trace: Recorder) -> str:
+    """Formats the per-stage breakdown of a query, slowest stage first"""
+    snapshot = trace.snapshot()
+    lines = [f"Slow {kind} query {query!r}: {1000 * seconds:.2f} ms"]
+    for name, stats in sorted(snapshot['stages'].items(), key=lambda item: -item[1]['seconds']):
+        lines.append(f"  {name:<32} {1000 * stats['seconds']:>10.3f} ms {stats['calls']:>8} calls")
+    for name, total in sorted(snapshot['counters'].items()):
+        lines.append(f"  {name:<32} {total:>10}")
+    return '\n'.join(lines)
+
+
+def traced_query(kind: str, position: int = 0):
+    """Times the query, the argument at position, as a stage and logs its per-stage breakdown when it is slow
+
+    A query run from inside another one, like the Boolean search of a soundex query,
+    is part of the breakdown of the outer query. Returns the function unchanged when disabled.
+    """
+    def decorator(function):
+        if not ENABLED:
+            return function
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if current_trace() is not None:
+                with timed_stage(QUERY_STAGE_PREFIX + kind):
+                    return function(*args, **kwargs)
+
+            _local.trace = trace = Recorder()
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                _local.trace = None
+                record_stage(QUERY_STAGE_PREFIX + kind, seconds)
+                if 1000 * seconds >= slow_query_threshold():
+                    query = args[position] if position < len(args) else None
+                    slow_query_log.warning(format_breakdown(kind, query, seconds, trace))
+        return wrapper
+    return decorator
+
+
+def report() -> dict:
+    """Returns the stages and counters recorded since the start or the last reset"""
+    return {'enabled': ENABLED, **_totals.snapshot()}
+
+
+def reset():
+    global _totals
+    _totals = Recorder()
@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from assignment1.question1 import DOCUMENT_PATH, INVERTED_INDEX_PATH, WORKERS, CHUNK_SIZE, get_preprocessor, \
+    list_documents, read_document_as_string, create_inverted_index, shift_doc_ids, merge_partial_indexes, save_index
+from assignment1.question2a import BI_WORD_INDEX_PATH, create_bi_word_index
+from assignment1.question2b import POSITIONAL_INDEX_PATH, create_positional_index
+from assignment1.question2c import SOUNDEX_INDEX_PATH, SOUNDEX_TABLE_FILE, SoundexTable, \
+    create_soundex_index_from_terms
+from assignment1.document_table import DocumentTable
+from assignment1.compact_index import CompactIndex
+from assignment1.instrumentation import instrumented, stage
+from assignment2 import vector_spacing
+
+# Constants
+INVERTED = 'inverted'
+POSITIONAL = 'positional'
+BI_WORD = 'bi_word'
+SOUNDEX = 'soundex'
+SOUNDEX_TERMS = 'soundex_terms'
+SOUNDEX_TABLE = 'soundex_table'
+VECTOR = 'vector'
+
+
+def preprocess_document(text: str) -> tuple:
+    """Returns the index terms, the unstemmed words for soundex and the vector space tokens of the text
+
+    The terms are the normalized words of one pass of the shared pipeline. The vector space
+    tokens take a second pass through vector_spacing.preprocess, which cleans differently,
+    splitting contractions at the apostrophe instead of expanding them, so that the vector
+    space index equals the one VectorSpaceIndex.build and refresh produce for the same files.
+    """
+    preprocessor = get_preprocessor()
+    words = preprocessor.tokenize(text)
+    normalize_token = preprocessor.normalize_token
+    return [normalize_token(word) for word in words], words, vector_spacing.preprocess(text)
+
+
+def build_partial_indexes(files: list, offset: int) -> dict:
+    """Reads and preprocesses a chunk of files once and builds the partial index of every kind
+
+    Doc-ids are shifted by the chunk offset, vector space tokens are kept per document.
+    """
+    with stage('multi_index.preprocess'):
+        documents = [preprocess_document(read_document_as_string(file)) for file in files]
+    terms = [document[0] for document in documents]
+    return {
+        POSITIONAL: shift_doc_ids(create_positional_index(terms), offset),
+        BI_WORD: shift_doc_ids(create_bi_word_index(terms), offset),
+        SOUNDEX_TERMS: shift_doc_ids(create_inverted_index([document[1] for document in documents]), offset),
+        VECTOR: [document[2] for document in documents],
+    }
+
+
+def build_all_indexes(dir_path: str = DOCUMENT_PATH, workers: int = WORKERS, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Builds and saves the inverted, positional, bi-word, soundex and vector space indexes in one corpus pass"""
+    return build_indexes_of_files(list_documents(dir_path), workers, chunk_size)
+
+
+@instrumented('build.multi_index')
+def build_indexes_of_files(files: list, workers: int = WORKERS, chunk_size: int = CHUNK_SIZE,
+                           directory: str = '') -> dict:
+    """Builds every index of the files and saves them under their usual names in the directory
+
+    Every document is read and preprocessed once, using a process pool when workers > 1.
+    The inverted index is the doc-ids of the positional postings. Returns the indexes
+    like the single index builders do, by kind.
+    """
+    offsets = range(0, len(files), chunk_size)
+    chunks = [files[offset:offset + chunk_size] for offset in offsets]
+    if workers <= 1:
+        partial_indexes = list(map(build_partial_indexes, chunks, offsets))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partial_indexes = list(pool.map(build_partial_indexes, chunks, offsets))
+
+    with stage('multi_index.merge'):
+        positional_index = merge_partial_indexes(partial[POSITIONAL] for partial in partial_indexes)
+        bi_word_index = merge_partial_indexes(partial[BI_WORD] for partial in partial_indexes)
+        term_index = merge_partial_indexes(partial[SOUNDEX_TERMS] for partial in partial_indexes)
+        token_lists = [tokens for partial in partial_indexes for tokens in partial[VECTOR]]
+    del partial_indexes
+
+    inverted_index = {term: set(postings) for term, postings in positional_index.items()}
+    soundex_table = SoundexTable.from_term_index(term_index)
+    soundex_index = create_soundex_index_from_terms(term_index, soundex_table.codes)
+
+    # Files are described and hashed once, the table is saved with every index
+    document_table = DocumentTable.from_files(files)
+    for index, path in ((inverted_index, INVERTED_INDEX_PATH), (positional_index, POSITIONAL_INDEX_PATH),
+                        (bi_word_index, BI_WORD_INDEX_PATH), (soundex_index, SOUNDEX_INDEX_PATH)):
+        save_index(index, os.path.join(directory, path), num_documents=len(files))
+        document_table.save(os.path.join(directory, path))
+    soundex_table.save(os.path.join(directory, SOUNDEX_TABLE_FILE))
+
+    doc_ids = dict(enumerate(document_table.file_names))
+    stats = {document_table.name(doc_id): (document['mtime'], document['hash'])
+             for doc_id, document in enumerate(document_table.documents)}
+    vector_index = vector_spacing.VectorSpaceIndex.from_documents(dict(enumerate(token_lists)), doc_ids, stats)
+    vector_index.save(os.path.join(directory, vector_spacing.VECTOR_INDEX_FILE))
+
+    return {
+        INVERTED: CompactIndex(inverted_index, len(files)),
+        POSITIONAL: CompactIndex(positional_index, len(files)),
+        BI_WORD: CompactIndex(bi_word_index, len(files)),
+        SOUNDEX: CompactIndex(soundex_index, len(files)),
+        SOUNDEX_TABLE: soundex_table,
+        VECTOR: vector_index,
+    }
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else WORKERS
+    start = time.perf_counter()
+    indexes = build_all_indexes(DOCUMENT_PATH, workers)
+    print(f"Built every index in {time.perf_counter() - start:.2f} s")
+    for kind in (INVERTED, POSITIONAL, BI_WORD, SOUNDEX):
+        print(f"{kind}: {len(indexes[kind])} terms")
+    print(f"{VECTOR}: {indexes[VECTOR].total_docs} documents")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from itertools import accumulate
+
+# Constants
+BLOCK_SIZE = 128
+UINT32 = 'I'
+CONTINUATION_MASK = 0x7F
+STOP_BIT = 0x80
+VBYTE_SHIFT = 7
+# last doc-id of the block, end of the block in the doc-id section, start of its positions in the position section
+DOCUMENT_SKIP_FIELDS = 2
+POSITIONAL_SKIP_FIELDS = 3
+LITTLE_ENDIAN = sys.byteorder == 'little'
+# List slot and int object of a decoded doc-id
+DECODED_DOC_ID_SIZE = 8 + sys.getsizeof(2 ** 20)
+
+
+def pack_uint32(values) -> bytes:
+    """Packs the integers as little-endian unsigned 32-bit values"""
+    values = array(UINT32, values)
+    if not LITTLE_ENDIAN:
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack_uint32(buffer) -> array:
+    """Unpacks little-endian unsigned 32-bit values"""
+    values = array(UINT32)
+    values.frombytes(buffer)
+    if not LITTLE_ENDIAN:
+        values.byteswap()
+    return values
+
+
+def vbyte_encode(values, output: bytearray):
+    """Appends the integers to output, 7 bits per byte, the last byte of each integer has the stop bit set"""
+    for value in values:
+        while value > CONTINUATION_MASK:
+            output.append(value & CONTINUATION_MASK)
+            value >>= VBYTE_SHIFT
+        output.append(value | STOP_BIT)
+
+
+def vbyte_decode(buffer, offset: int, count: int) -> tuple:
+    """Decodes count integers starting at offset, returns them and the offset after the last one"""
+    values = []
+    value = 0
+    shift = 0
+    while len(values) < count:
+        byte = buffer[offset]
+        offset += 1
+        if byte & STOP_BIT:
+            values.append(value | ((byte & CONTINUATION_MASK) << shift))
+            value = 0
+            shift = 0
+        else:
+            value |= byte << shift
+            shift += VBYTE_SHIFT
+    return values, offset
+
+
+def vbyte_skip(buffer, offset: int, count: int) -> int:
+    """Returns the offset after count encoded integers, without decoding them"""
+    while count:
+        if buffer[offset] & STOP_BIT:
+            count -= 1
+        offset += 1
+    return offset
+
+
+def gaps(values, previous: int = 0) -> list:
+    """Returns the differences between consecutive values"""
+    result = []
+    for value in values:
+        result.append(value - previous)
+        previous = value
+    return result
+
+
+def encode(doc_ids, counts=None, positions=None) -> bytes:
+    """Encodes sorted doc-ids, and optionally their positions, as blocks of VByte gaps behind a skip table
+
+    Doc-ids are split into blocks of BLOCK_SIZE, each block is gap encoded from the last
+    doc-id of the previous block so it can be decoded on its own. For positional postings
+    the position section follows, with the position count and the position gaps of each
+    document. Lists of a single block, most of the vocabulary, are stored without skip table.
+    """
+    positional = counts is not None
+    skips, documents, position_data = [], bytearray(), bytearray()
+    start = 0
+    previous = 0
+    for block_start in range(0, len(doc_ids), BLOCK_SIZE):
+        block = doc_ids[block_start:block_start + BLOCK_SIZE]
+        vbyte_encode(gaps(block, previous), documents)
+        previous = block[-1]
+        skips.extend((previous, len(documents)))
+        if positional:
+            skips.append(len(position_data))
+            for count in counts[block_start:block_start + len(block)]:
+                vbyte_encode((count,), position_data)
+                vbyte_encode(gaps(positions[start:start + count]), position_data)
+                start += count
+    if len(doc_ids) <= BLOCK_SIZE:
+        return bytes(documents) + bytes(position_data)
+    return pack_uint32(skips) + bytes(documents) + bytes(position_data)
+
+
+class CompressedPostings(Sequence):
+    """Sorted doc-ids decoded block by block on access, with the positions of each document when positional
+
+    Random access and bisection only decode the blocks they touch, so galloping
+    intersections skip the blocks in between.
+    """
+
+    def __init__(self, data, doc_freq: int, positional: bool = False):
+        self.data = data
+        self.doc_freq = doc_freq
+        self.positional = positional
+        self.num_blocks = (doc_freq + BLOCK_SIZE - 1) // BLOCK_SIZE
+        self.blocks = {}
+        if self.num_blocks <= 1:
+            # Without skip table, the only block is decoded up front
+            block_gaps, end = vbyte_decode(data, 0, doc_freq)
+            self.blocks[0] = list(accumulate(block_gaps))
+            self.last_doc_ids = self.blocks[0][-1:]
+            self.block_ends = [end]
+            self.position_offsets = [0]
+            self.documents_start = 0
+            self.positions_start = end
+            return
+        fields = POSITIONAL_SKIP_FIELDS if positional else DOCUMENT_SKIP_FIELDS
+        skips = unpack_uint32(data[:4 * fields * self.num_blocks])
+        self.last_doc_ids = skips[0::fields]
+        self.block_ends = skips[1::fields]
+        self.position_offsets = skips[2::fields] if positional else None
+        self.documents_start = 4 * fields * self.num_blocks
+        self.positions_start = self.documents_start + self.block_ends[-1]
+
+    def block(self, number: int) -> list:
+        """Decodes, and caches, the doc-ids of a block"""
+        doc_ids = self.blocks.get(number)
+        if doc_ids is None:
+            start = self.documents_start + (self.block_ends[number - 1] if number else 0)
+            count = min(BLOCK_SIZE, self.doc_freq - number * BLOCK_SIZE)
+            block_gaps, _ = vbyte_decode(self.data, start, count)
+            doc_ids = list(accumulate(block_gaps, initial=self.last_doc_ids[number - 1] if number else 0))[1:]
+            self.blocks[number] = doc_ids
+        return doc_ids
+
+    def detached(self) -> 'CompressedPostings':
+        """Returns the postings on a copy of their bytes, usable once the index they were read from is closed"""
+        return CompressedPostings(bytes(self.data), self.doc_freq, self.positional)
+
+    def memory_bound(self) -> int:
+        """Returns the bytes held once every block is decoded"""
+        return len(self.data) + self.doc_freq * DECODED_DOC_ID_SIZE
+
+    def __len__(self) -> int:
+        return self.doc_freq
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.doc_freq))]
+        if i < 0:
+            i += self.doc_freq
+        if not 0 <= i < self.doc_freq:
+            raise IndexError('postings index out of range')
+        return self.block(i // BLOCK_SIZE)[i % BLOCK_SIZE]
+
+    def __iter__(self):
+        for number in range(self.num_blocks):
+            yield from self.block(number)
+
+    def __contains__(self, doc_id) -> bool:
+        number = bisect_left(self.last_doc_ids, doc_id)
+        if number == self.num_blocks:
+            return False
+        doc_ids = self.block(number)
+        i = bisect_left(doc_ids, doc_id)
+        return i < len(doc_ids) and doc_ids[i] == doc_id
+
+    def positions(self, doc_id: int) -> list:
+        """Decodes the positions of the document, skipping the other documents of its block"""
+        number = bisect_left(self.last_doc_ids, doc_id)
+        if not self.positional or number == self.num_blocks:
+            return []
+        doc_ids = self.block(number)
+        i = bisect_left(doc_ids, doc_id)
+        if i == len(doc_ids) or doc_ids[i] != doc_id:
+            return []
+        offset = self.positions_start + self.position_offsets[number]
+        for _ in range(i):
+            (count,), offset = vbyte_decode(self.data, offset, 1)
+            offset = vbyte_skip(self.data, offset, count)
+        (count,), offset = vbyte_decode(self.data, offset, 1)
+        position_gaps, _ = vbyte_decode(self.data, offset, count)
+        return list(accumulate(position_gaps))
+
+    def items(self):
+        """Yields every document with its positions, decoding the position section sequentially"""
+        offset = self.positions_start
+        for doc_id in self:
+            (count,), offset = vbyte_decode(self.data, offset, 1)
+            position_gaps, offset = vbyte_decode(self.data, offset, count)
+            yield doc_id, list(accumulate(position_gaps))
+
+
+class CompressedPositions:
+    """Maps the documents of a compressed positional posting to their positions, decoded on lookup"""
+
+    def __init__(self, postings: CompressedPostings):
+        self.postings = postings
+
+    def __getitem__(self, doc_id: int) -> list:
+        positions = self.postings.positions(doc_id)
+        if not positions:
+            raise KeyError(doc_id)
+        return positions
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self.postings
+
+    def __iter__(self):
+        return iter(self.postings)
+
+    def __len__(self) -> int:
+        return len(self.postings)
@@ -0,0 +1,250 @@
+import itertools
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from assignment1.boolean_query import postings_of
+from assignment1.postings_codec import CompressedPostings
+
+# Constants
+LRU = 'lru'
+LFU = 'lfu'
+MAX_RESULT_ENTRIES = 4096
+MAX_RESULT_BYTES = 64 * 2 ** 20
+MAX_POSTINGS_BYTES = 64 * 2 ** 20
+DOC_ID_TYPE = 'I'
+POSTINGS = 'postings'
+BOOLEAN_QUERY = 'boolean'
+BI_WORD_QUERY = 'bi-word'
+MISSING = object()
+VERSIONS = itertools.count(1)
+
+
+def new_version() -> int:
+    """Returns a version token that no other index, or earlier state of an index, has"""
+    return next(VERSIONS)
+
+
+def index_version(index):
+    """Returns the version token of the index, None when the index cannot tell when it changes"""
+    return getattr(index, 'version', None)
+
+
+def estimate_size(value) -> int:
+    """Estimates the memory held by a cached value and the objects it directly contains"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list, set, frozenset)):
+        size += sum(sys.getsizeof(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(sys.getsizeof(key) + sys.getsizeof(item) for key, item in value.items())
+    elif isinstance(value, CompressedPostings):
+        # Blocks are decoded after the value is cached, it is charged as if they all were
+        size += value.memory_bound()
+    return size
+
+
+class Cache:
+    """Bounded cache with LRU or LFU eviction, invalidated when the index version changes
+
+    Each entry remembers the version of the index it was computed for and is dropped on
+    lookup once the index has another version. The cache is bounded by a number of
+    entries, by an estimate of the memory held by the values, or both. LFU keeps one
+    insertion-ordered bucket per use count, so the least frequently used entry, the least
+    recently used among ties, is evicted in O(1).
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, policy: str = LRU, sizer=estimate_size):
+        if policy not in (LRU, LFU):
+            raise ValueError(f'Unknown eviction policy {policy!r}')
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.sizer = sizer
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Drops every entry and resets the counters"""
+        # key -> (version, value, size, use count)
+        self.entries = {}
+        self.order = OrderedDict()
+        self.buckets = {}
+        self.min_count = 0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def touch(self, key, count: int) -> int:
+        """Records a use of the entry, returns its new use count"""
+        if self.policy == LRU:
+            self.order.move_to_end(key)
+            return count
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[count]
+            if self.min_count == count:
+                self.min_count = count + 1
+        self.buckets.setdefault(count + 1, OrderedDict())[key] = None
+        return count + 1
+
+    def remove(self, key):
+        """Removes the entry from the cache"""
+        _, _, size, count = self.entries.pop(key)
+        self.bytes -= size
+        if self.policy == LRU:
+            del self.order[key]
+            return
+        bucket = self.buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[count]
+
+    def evict(self):
+        """Removes the least recently, or least frequently, used entry"""
+        if self.policy == LRU:
+            key = next(iter(self.order))
+        else:
+            if self.min_count not in self.buckets:
+                self.min_count = min(self.buckets)
+            key = next(iter(self.buckets[self.min_count]))
+        self.remove(key)
+        self.evictions += 1
+
+    def over_budget(self, size: int) -> bool:
+        """Checks if adding an entry of this size would exceed the number of entries or bytes allowed"""
+        return (self.max_entries is not None and len(self.entries) >= self.max_entries) or \
+            (self.max_bytes is not None and self.bytes + size > self.max_bytes)
+
+    def get(self, key, version=None):
+        """Returns the cached value computed for this version of the index, MISSING otherwise"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] != version:
+                self.remove(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            self.hits += 1
+            entry_version, value, size, count = entry
+            self.entries[key] = (entry_version, value, size, self.touch(key, count))
+            return value
+
+    def put(self, key, value, version=None):
+        """Caches the value computed for this version of the index, evicting entries over the budget"""
+        size = self.sizer(value)
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            # Evicting before inserting keeps the new entry from being the LFU victim
+            while self.entries and self.over_budget(size):
+                self.evict()
+            self.entries[key] = (version, value, size, 1)
+            self.bytes += size
+            if self.policy == LRU:
+                self.order[key] = None
+            else:
+                self.buckets.setdefault(1, OrderedDict())[key] = None
+                self.min_count = 1
+
+    def get_or_compute(self, key, compute, version=None):
+        """Returns the cached value, computing and caching it on a miss"""
+        value = self.get(key, version)
+        if value is MISSING:
+            # Computed outside the lock, concurrent misses on the same key compute it twice
+            value = compute()
+            self.put(key, value, version)
+        return value
+
+    def stats(self) -> dict:
+        """Returns the hit, miss, eviction and invalidation counters and the memory held"""
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions, 'invalidations': self.invalidations,
+                'entries': len(self.entries), 'bytes': self.bytes}
+
+
+RESULT_CACHE = Cache(max_entries=MAX_RESULT_ENTRIES, max_bytes=MAX_RESULT_BYTES, policy=LFU)
+POSTINGS_CACHE = Cache(max_bytes=MAX_POSTINGS_BYTES, policy=LRU)
+# Caches reported by cache_stats and emptied by clear_caches, by name
+CACHES = {'results': RESULT_CACHE, 'postings': POSTINGS_CACHE}
+
+
+def register_cache(name: str, cache: Cache) -> Cache:
+    """Adds a cache of another module to the ones reported and cleared with the result and postings caches"""
+    CACHES[name] = cache
+    return cache
+
+
+def cacheable_postings(postings):
+    """Returns postings that can be shared between queries and outlive the index they were read from
+
+    Compressed postings stay compressed, their blocks are decoded on access and kept, so
+    galloping still skips blocks. Other postings are copied into a doc-id array.
+    """
+    if isinstance(postings, CompressedPostings):
+        return postings.detached()
+    return array(DOC_ID_TYPE, postings)
+
+
+class CachedIndex:
+    """Index proxy serving the postings of hot terms from the postings cache
+
+    Everything else is delegated to the index. Indexes without a version are not cached.
+    """
+
+    def __init__(self, index, cache: Cache = POSTINGS_CACHE):
+        self.index = index
+        self.cache = cache
+
+    def postings(self, term: str):
+        """Returns the sorted doc-ids of the term, each block decoded once while the term stays in the cache"""
+        version = index_version(self.index)
+        if version is None:
+            return postings_of(self.index, term)
+        return self.cache.get_or_compute((id(self.index), POSTINGS, term),
+                                         lambda: cacheable_postings(postings_of(self.index, term)), version)
+
+    def __getitem__(self, term: str):
+        return self.index[term]
+
+    def __contains__(self, term) -> bool:
+        return term in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+
+def cached_result(index, key: tuple, compute, cache: Cache = RESULT_CACHE):
+    """Returns the cached result of the normalized query on the index, computing it on a miss
+
+    Results must be immutable since they are shared between callers.
+    """
+    version = index_version(index)
+    if version is None:
+        return compute()
+    return cache.get_or_compute((id(index),) + key, compute, version)
+
+
+def cache_stats() -> dict:
+    """Returns the counters of every registered cache"""
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+
+def clear_caches():
+    """Empties every registered cache"""
+    for cache in CACHES.values():
+        with cache.lock:
+            cache.clear()
@@ -0,0 +1,344 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from assignment1.question1 import INVERTED_INDEX_PATH, UTF_8, WORKERS, \
+    index_documents, preprocess_query, search, load_or_build, document_names
+from assignment1.document_table import load_document_table
+from assignment1.question2a import BI_WORD_INDEX_PATH, index_bi_words, search_bi_word_index
+from assignment1.question2b import POSITIONAL_INDEX_PATH, search_phrase, search_query
+from assignment1.question2b import load_positional_index
+from assignment1.question2c import SOUNDEX_INDEX_PATH, index_soundex, load_soundex_table, search_soundex_index, \
+    expand_soundex_query
+from assignment1.term_dictionary import TermDictionary, rewrite_boolean_query, rewrite_ranked_query, WILDCARD
+from assignment1.query_cache import cache_stats
+from assignment1.instrumentation import report as instrumentation_report
+from assignment2 import vector_spacing
+from assignment2.impact_index import ImpactIndex
+
+# Constants
+HOST = '127.0.0.1'
+PORT = 8080
+RANKING_WORKERS = 2
+DEFAULT_PROXIMITY = 1
+MAX_REQUEST_LINE = 8192
+GET = 'GET'
+HTTP_OK = '200 OK'
+HTTP_BAD_REQUEST = '400 Bad Request'
+HTTP_NOT_FOUND = '404 Not Found'
+HTTP_METHOD_NOT_ALLOWED = '405 Method Not Allowed'
+HTTP_INTERNAL_ERROR = '500 Internal Server Error'
+TRUE_VALUES = ('1', 'true', 'yes')
+
+_ranking_index = None
+_ranking_dictionary = None
+_impact_index = None
+
+
+# Index Loading Functions
+class QueryIndexes:
+    """Every index of the assignment, loaded once and shared by all requests
+
+    Saved indexes are rebuilt when documents were added, changed or deleted since they were saved.
+    """
+
+    def __init__(self, workers: int = WORKERS):
+        self.inverted_index = index_documents(workers)
+        self.bi_word_index = load_or_build(BI_WORD_INDEX_PATH, lambda: index_bi_words(workers))
+        self.positional_inverted_index, self.positional_index = load_positional_index(workers)
+        self.soundex_index = load_or_build(SOUNDEX_INDEX_PATH, lambda: index_soundex(workers))
+        self.soundex_table = load_soundex_table()
+        for path in (INVERTED_INDEX_PATH, BI_WORD_INDEX_PATH, POSITIONAL_INDEX_PATH, SOUNDEX_INDEX_PATH):
+            load_document_table(path)
+        # The positional index has the vocabulary of the inverted index, one dictionary serves both
+        self.term_dictionary = TermDictionary.from_index(self.inverted_index)
+
+    @staticmethod
+    def names(doc_ids, index_path: str) -> list:
+        """Returns the file names of the documents, in doc-id order, from the document table of the index"""
+        return document_names(doc_ids, index_path)
+
+
+# Ranking Worker Functions
+def ensure_ranking_index(file: str = vector_spacing.VECTOR_INDEX_FILE, directory: str = vector_spacing.CORPUS):
+    """Brings the saved vector space index up to date with the directory once, before the workers load it
+
+    New, changed and deleted documents are applied with VectorSpaceIndex.refresh, a missing
+    index or one saved in another format is rebuilt.
+    """
+    try:
+        index = vector_spacing.VectorSpaceIndex.load(file)
+    except (OSError, ValueError):
+        vector_spacing.VectorSpaceIndex.build(directory).save(file)
+        return
+    if any(index.refresh(directory)):
+        index.save(file)
+
+
+def init_ranking_worker(file: str):
+    """Loads the vector space index, its impact-ordered copy and its term dictionary once per worker process
+
+    The index is the one ensure_ranking_index saved, workers only read it and never rebuild
+    it concurrently. The rest is built here rather than on the first query needing it, whose
+    time budget would otherwise include building it.
+    """
+    global _ranking_index, _impact_index, _ranking_dictionary
+    _ranking_index = vector_spacing.VectorSpaceIndex.load(file).compact()
+    _impact_index = ImpactIndex(_ranking_index)
+    _ranking_dictionary = TermDictionary(_ranking_index.doc_freqs)
+
+
+def rank_within_budget(query: str, k: int, budget_ms, max_postings, correct: bool = False) -> tuple:
+    """Ranks the documents score-at-a-time on impacts until the time or postings budget is spent
+
+    The time budget starts when the worker picks the query up, rewriting wildcards and
+    misspelled words included. Returns the (file, score) pairs and whether scoring stopped early.
+    """
+    start = time.perf_counter()
+    tokens = query_tokens(query, correct)
+    if budget_ms is not None:
+        budget_ms = max(budget_ms - 1000 * (time.perf_counter() - start), 0.0)
+    response = _impact_index.process_query_tokens(tokens, k, budget_ms, max_postings)
+    return [(_ranking_index.doc_ids[doc_id], score) for doc_id, score in response['results']], \
+        response['terminated_early']
+
+
+def ranking_worker_ready() -> bool:
+    return _ranking_index is not None
+
+
+def query_tokens(query: str, correct: bool = False) -> list:
+    """Returns the vector space tokens of the query, with wildcards expanded and, when correct, words corrected"""
+    if WILDCARD in query or correct:
+        return rewrite_ranked_query(query, _ranking_dictionary, vector_spacing.preprocess, correct)
+    return vector_spacing.preprocess(query)
+
+
+def rank(query: str, k: int, pruning: bool, correct: bool = False) -> list:
+    """Ranks the documents of the worker index for the query, returns (file, score) pairs
+
+    Wildcards are expanded and, when correct, misspelled words are corrected with the term dictionary.
+    """
+    index = _ranking_index
+    if WILDCARD in query or correct:
+        results = vector_spacing.process_query_tokens(query_tokens(query, correct), index.inverted_index,
+                                                      index.doc_lengths, index.total_docs, index.idf, k,
+                                                      index.max_weights if pruning else None)
+    else:
+        results = index.process_query(query, k, pruning)
+    return [(index.doc_ids[doc_id], score) for doc_id, score in results]
+
+
+# Request Handling Functions
+def parameter(parameters: dict, name: str, default=None) -> str:
+    """Returns the last value of the query string parameter"""
+    values = parameters.get(name)
+    if not values:
+        if default is None:
+            raise ValueError(f"Missing parameter: {name}")
+        return default
+    return values[-1]
+
+
+def flag(parameters: dict, name: str) -> bool:
+    return parameter(parameters, name, '').lower() in TRUE_VALUES
+
+
+class QueryServer:
+    """JSON over HTTP query service, Boolean and soundex queries run on the event loop, phrase and
+    proximity matching in threads and ranked scoring in a pool of worker processes that each hold
+    the vector space index
+    """
+
+    def __init__(self, indexes: QueryIndexes, ranking_workers: int = RANKING_WORKERS):
+        self.indexes = indexes
+        self.ranking_workers = ranking_workers
+        self.pool = None
+        self.routes = {
+            '/boolean': self.boolean,
+            '/bi-word': self.bi_word,
+            '/phrase': self.phrase,
+            '/proximity': self.proximity,
+            '/soundex': self.soundex,
+            '/ranked': self.ranked,
+            '/stats': self.stats,
+        }
+
+    async def start_pool(self):
+        """Starts the ranking workers and waits until they have loaded the vector space index"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, ensure_ranking_index)
+        self.pool = ProcessPoolExecutor(max_workers=self.ranking_workers, initializer=init_ranking_worker,
+                                        initargs=(vector_spacing.VECTOR_INDEX_FILE,))
+        await asyncio.gather(*(loop.run_in_executor(self.pool, ranking_worker_ready)
+                               for _ in range(self.ranking_workers)))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def dictionary(self, parameters: dict):
+        """Returns the term dictionary when the request asks for spelling correction"""
+        return self.indexes.term_dictionary if flag(parameters, 'correct') else None
+
+    def search_boolean(self, query: str, correct: bool) -> tuple:
+        """Returns the preprocessed, or rewritten, terms of the query and the matching doc-ids"""
+        if WILDCARD in query or correct:
+            terms = rewrite_boolean_query(query, self.indexes.term_dictionary, correct)
+        else:
+            terms = preprocess_query(query)
+        return terms, search(terms, self.indexes.inverted_index)
+
+    async def boolean(self, parameters: dict) -> dict:
+        query = parameter(parameters, 'q')
+        # Searches run in a thread so that the event loop keeps serving the other connections
+        terms, result = await asyncio.get_running_loop().run_in_executor(
+            None, self.search_boolean, query, flag(parameters, 'correct'))
+        return {'query': query, 'terms': terms, 'documents': self.indexes.names(result, INVERTED_INDEX_PATH)}
+
+    async def bi_word(self, parameters: dict) -> dict:
+        query = parameter(parameters, 'q')
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, search_bi_word_index, query, self.indexes.bi_word_index)
+        return {'query': query, 'documents': self.indexes.names(result, BI_WORD_INDEX_PATH)}
+
+    async def phrase(self, parameters: dict) -> dict:
+        query = parameter(parameters, 'q')
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, search_phrase, query, self.indexes.positional_inverted_index, self.indexes.positional_index,
+            self.dictionary(parameters))
+        return {'query': query, 'documents': self.indexes.names(result, POSITIONAL_INDEX_PATH)}
+
+    async def proximity(self, parameters: dict) -> dict:
+        query = parameter(parameters, 'q')
+        proximity = int(parameter(parameters, 'k', str(DEFAULT_PROXIMITY)))
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, search_query, query, proximity, self.indexes.positional_inverted_index,
+            self.indexes.positional_index, flag(parameters, 'ordered'), self.dictionary(parameters))
+        return {'query': query, 'proximity': proximity,
+                'documents': self.indexes.names(result, POSITIONAL_INDEX_PATH)}
+
+    async def soundex(self, parameters: dict) -> dict:
+        query = parameter(parameters, 'q')
+        table = self.indexes.soundex_table
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, search_soundex_index, query, self.indexes.soundex_index, table)
+        expansions = expand_soundex_query(query, table) if table is not None else {}
+        return {'query': query, 'expansions': expansions,
+                'documents': self.indexes.names(result, SOUNDEX_INDEX_PATH)}
+
+    async def ranked(self, parameters: dict) -> dict:
+        query = parameter(parameters, 'q')
+        k = int(parameter(parameters, 'k', str(vector_spacing.TOP_K)))
+        budget_ms = parameters.get('budget_ms')
+        max_postings = parameters.get('max_postings')
+        loop = asyncio.get_running_loop()
+        response = {'query': query, 'k': k}
+        if budget_ms or max_postings:
+            if flag(parameters, 'pruning'):
+                # Budgeted queries stop early on impacts, MaxScore pruning does not apply to them
+                raise ValueError('pruning cannot be combined with budget_ms or max_postings')
+            results, response['terminated_early'] = await loop.run_in_executor(
+                self.pool, rank_within_budget, query, k, float(budget_ms[-1]) if budget_ms else None,
+                int(max_postings[-1]) if max_postings else None, flag(parameters, 'correct'))
+        else:
+            results = await loop.run_in_executor(self.pool, rank, query, k, flag(parameters, 'pruning'),
+                                                 flag(parameters, 'correct'))
+        response['results'] = [{'document': file, 'score': score} for file, score in results]
+        return response
+
+    async def stats(self, parameters: dict) -> dict:
+        return {'cache': cache_stats(), 'instrumentation': instrumentation_report()}
+
+    async def respond(self, method: str, target: str) -> tuple:
+        """Returns the status and the JSON body of the request"""
+        if method != GET:
+            return HTTP_METHOD_NOT_ALLOWED, {'error': f"Unsupported method: {method}"}
+        url = urlsplit(target)
+        handler = self.routes.get(url.path)
+        if handler is None:
+            return HTTP_NOT_FOUND, {'error': f"Unknown endpoint: {url.path}"}
+        try:
+            return HTTP_OK, await handler(parse_qs(url.query))
+        except (ValueError, IndexError) as error:
+            return HTTP_BAD_REQUEST, {'error': str(error)}
+        except Exception as error:
+            return HTTP_INTERNAL_ERROR, {'error': repr(error)}
+
+    @staticmethod
+    async def read_request(reader: asyncio.StreamReader) -> tuple:
+        """Returns the request line and whether the connection is kept alive, ValueError for overlong lines
+
+        Headers are read and ignored, queries only use the request target.
+        """
+        request_line = await reader.readline()
+        if len(request_line) > MAX_REQUEST_LINE:
+            raise ValueError('Request line too long')
+        keep_alive = True
+        while request_line:
+            header = await reader.readline()
+            if header in (b'\r\n', b'\n', b''):
+                break
+            if header.lower().startswith(b'connection:') and b'close' in header.lower():
+                keep_alive = False
+        return request_line, keep_alive
+
+    @staticmethod
+    async def write_response(writer: asyncio.StreamWriter, status: str, body: dict, keep_alive: bool):
+        payload = json.dumps(body).encode(UTF_8)
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(payload)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode(UTF_8) + payload)
+        await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serves the requests of a connection, one JSON response per request"""
+        try:
+            while True:
+                try:
+                    request_line, keep_alive = await self.read_request(reader)
+                except (ValueError, asyncio.LimitOverrunError) as error:
+                    # Lines over the stream limit raise ValueError in readline
+                    await self.write_response(writer, HTTP_BAD_REQUEST, {'error': str(error)}, False)
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, _ = request_line.decode(UTF_8).split()
+                except ValueError:
+                    status, body = HTTP_BAD_REQUEST, {'error': 'Malformed request line'}
+                    keep_alive = False
+                else:
+                    status, body = await self.respond(method, target)
+                await self.write_response(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = HOST, port: int = PORT):
+        await self.start_pool()
+        # Lines longer than the limit make readline raise instead of buffering them
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_REQUEST_LINE)
+        try:
+            async with server:
+                print(f"Serving queries on http://{host}:{port}")
+                await server.serve_forever()
+        finally:
+            self.close()
+
+
+def main():
+    """Loads the indexes once and serves queries until interrupted"""
+    server = QueryServer(QueryIndexes())
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
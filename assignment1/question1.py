@@ -1,8 +1,18 @@
 import os
+from ast import literal_eval
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from nltk.stem import WordNetLemmatizer, PorterStemmer
 from contractions import get_contraction
+from assignment1.index_store import write_binary_index, open_binary_index, binary_index_exists
+from assignment1.compact_index import CompactIndex
+from assignment1.document_table import save_document_table, load_document_table, document_table_exists
+from assignment1.query_cache import CachedIndex, cached_result, BOOLEAN_QUERY
+from assignment1.boolean_query import run_query, LEFT_PARENTHESIS, RIGHT_PARENTHESIS
+from assignment1.instrumentation import instrumented, traced_query, stage, count, ENABLED as INSTRUMENTED
 
 # import nltk
 # nltk.download('stopwords')
@@ -11,11 +21,17 @@ from contractions import get_contraction
 # nltk.download('wordnet')
 
 # Constants
-INVERTED_INDEX_FILE = 'inverted_index.txt'
+INDEX_TEXT_EXTENSION = '.txt'
+INVERTED_INDEX_PATH = 'inverted_index'
+EXPORT_TEXT_INDEX = False
+TOKEN_CACHE_SIZE = 2 ** 16
+WORKERS = 1
+CHUNK_SIZE = 64
 UTF_8 = 'utf-8'
 READ = 'r'
 WRITE = 'w'
 DOCUMENT_PATH = 'corpus/'
+DOCUMENT_EXTENSION = '.txt'
 AND = 'and'
 OR = 'or'
 NOT = 'not'
@@ -49,7 +65,7 @@ def case_fold(string: str) -> str:
 
 def remove_stopwords(string: str) -> str:
     """Removes the stopwords from the string using NLTK's stopwords"""
-    stop_words = set(stopwords.words('english'))
+    stop_words = get_preprocessor().stop_words
     return SPACE.join([word for word in string.split() if word not in stop_words])
 
 
@@ -60,7 +76,7 @@ def remove_punctuation(string: str) -> str:
 
 def expand_contractions(string: str) -> str:
     """Expands the contractions in the string"""
-    contraction = get_contraction()
+    contraction = get_preprocessor().contractions
     if APHO_IS in string:
         string = string.replace(APHO_IS, IS)
     if APHO_CAUSE in string:
@@ -69,23 +85,79 @@ def expand_contractions(string: str) -> str:
     return SPACE.join([contraction[word] if word in contraction else word for word in string.split()])
 
 
-def stem_string(tokens: list) -> list:
-    """Stems the tokens using Porter Stemmer"""
-    stemmer = PorterStemmer()
-    return [stemmer.stem(word) for word in tokens]
-
-
-def lemmatize(tokens: list) -> list:
-    """Lemmatizes the tokens using WordNet Lemmatizer"""
-    lemmatizer = WordNetLemmatizer()
-    return [lemmatizer.lemmatize(word) for word in tokens]
-
-
 def tokenize(string: str) -> list:
     """Tokenizes the string"""
     return word_tokenize(string)
 
 
+class Preprocessor:
+    """Preprocessing pipeline that loads the stopwords, contractions, stemmer and lemmatizer once"""
+
+    def __init__(self, cache_size: int = TOKEN_CACHE_SIZE):
+        self.stop_words = set(stopwords.words('english'))
+        self.contractions = get_contraction()
+        self.stemmer = PorterStemmer()
+        self.lemmatizer = WordNetLemmatizer()
+        # Token frequencies are Zipfian, most stem and lemma lookups hit the cache
+        self.normalize_token = lru_cache(maxsize=cache_size)(self.stem_and_lemmatize)
+
+    def stem_and_lemmatize(self, token: str) -> str:
+        """Stems the token and lemmatizes the stem"""
+        if INSTRUMENTED:
+            # Only reached on token cache misses
+            with stage('preprocess.stem'):
+                stem = self.stemmer.stem(token)
+            with stage('preprocess.lemmatize'):
+                return self.lemmatizer.lemmatize(stem)
+        return self.lemmatizer.lemmatize(self.stemmer.stem(token))
+
+    def clean(self, string: str) -> str:
+        """Case folds, expands contractions, removes punctuation and stopwords in one pass over the words"""
+        string = string.lower()
+        if APHO_IS in string:
+            string = string.replace(APHO_IS, IS)
+        if APHO_CAUSE in string:
+            string = string.replace(APHO_CAUSE, BECAUSE)
+
+        words = []
+        for word in string.split():
+            for part in self.contractions.get(word, word).split():
+                if not part.isalnum():
+                    part = EMPTY.join([char for char in part if char.isalnum()])
+                if part and part not in self.stop_words:
+                    words.append(part)
+        return SPACE.join(words)
+
+    def tokenize(self, string: str) -> list:
+        """Cleans and tokenizes the string, without stemming"""
+        return word_tokenize(self.clean(string))
+
+    def __call__(self, string: str) -> list:
+        if INSTRUMENTED:
+            return self.instrumented_call(string)
+        normalize_token = self.normalize_token
+        return [normalize_token(token) for token in self.tokenize(string)]
+
+    def instrumented_call(self, string: str) -> list:
+        """Preprocesses the string, timing the cleaning pass, tokenization and normalization as stages"""
+        with stage('preprocess'):
+            with stage('preprocess.clean'):
+                string = self.clean(string)
+            with stage('preprocess.tokenize'):
+                tokens = word_tokenize(string)
+            with stage('preprocess.normalize'):
+                normalize_token = self.normalize_token
+                tokens = [normalize_token(token) for token in tokens]
+        count('preprocess.tokens', len(tokens))
+        return tokens
+
+
+@lru_cache(maxsize=None)
+def get_preprocessor() -> Preprocessor:
+    """Returns the shared preprocessor, created on first use"""
+    return Preprocessor()
+
+
 def preprocess(string: str) -> list:
     """Preprocesses the string using the following steps:
     1. Case Folding
@@ -95,15 +167,9 @@ def preprocess(string: str) -> list:
     5. Tokenization
     6. Stemming
     7. Lemmatization
+    Steps 1-4 are fused into one pass and 6-7 are cached per unique token, see Preprocessor.
     """
-    string = case_fold(string)
-    string = expand_contractions(string)
-    string = remove_punctuation(string)
-    string = remove_stopwords(string)
-    tokens = tokenize(string)
-    tokens = stem_string(tokens)
-    tokens = lemmatize(tokens)
-    return tokens
+    return get_preprocessor()(string)
 
 
 # Document Processing Functions
@@ -118,11 +184,18 @@ def read_documents_as_strings(files: list) -> list:
     return [read_document_as_string(file) for file in files]
 
 
+def list_documents(dir_path: str) -> list:
+    """Returns the paths of the text files in the directory, sorted, the position of a file is its doc-id"""
+    return [dir_path + f for f in sorted(os.listdir(dir_path)) if f.endswith(DOCUMENT_EXTENSION)]
+
+
+@instrumented('read_dir')
 def read_dir(dir_path: str) -> list:
     """Reads the directory and returns the files in it"""
-    return read_documents_as_strings([dir_path + f for f in os.listdir(dir_path)])
+    return read_documents_as_strings(list_documents(dir_path))
 
 
+@instrumented('build.inverted')
 def create_inverted_index(documents: list) -> dict:
     """Creates the inverted index from the documents"""
     inverted_index = {}
@@ -135,11 +208,52 @@ def create_inverted_index(documents: list) -> dict:
     return dict(sorted(inverted_index.items()))
 
 
-def process_documents(path: str) -> list:
-    """Processes the data from the files"""
-    documents = read_dir(path)
-    processed_documents = [preprocess(document) for document in documents]
-    return processed_documents
+def shift_doc_ids(index: dict, offset: int) -> dict:
+    """Shifts the doc-ids of the index of a chunk by the chunk offset, doc-id sets become sorted lists"""
+    partial_index = {}
+    for term, postings in index.items():
+        if isinstance(postings, dict):
+            partial_index[term] = {doc_id + offset: positions for doc_id, positions in postings.items()}
+        else:
+            partial_index[term] = sorted(doc_id + offset for doc_id in postings)
+    return partial_index
+
+
+def build_partial_index(builder, preprocessor, files: list, offset: int) -> dict:
+    """Builds the index of a chunk of files, doc-ids are shifted by the chunk offset"""
+    documents = [preprocessor(read_document_as_string(file)) for file in files]
+    return shift_doc_ids(builder(documents), offset)
+
+
+def merge_partial_indexes(partial_indexes) -> dict:
+    """Merges partial indexes of consecutive chunks, given in chunk order"""
+    merged_index = {}
+    for partial_index in partial_indexes:
+        for term, postings in partial_index.items():
+            if term not in merged_index:
+                merged_index[term] = postings
+            elif isinstance(postings, dict):
+                merged_index[term].update(postings)
+            else:
+                merged_index[term].extend(postings)
+    # Doc-ids are added in increasing order, like the serial builders do
+    return dict(sorted((term, postings if isinstance(postings, dict) else set(postings))
+                       for term, postings in merged_index.items()))
+
+
+@instrumented('build_index')
+def build_index(builder, path: str, workers: int = WORKERS, preprocessor=preprocess,
+                chunk_size: int = CHUNK_SIZE) -> dict:
+    """Builds the index of the documents with builder, using a process pool when workers > 1"""
+    if workers <= 1:
+        return builder([preprocessor(document) for document in read_dir(path)])
+
+    files = list_documents(path)
+    offsets = range(0, len(files), chunk_size)
+    chunks = [files[offset:offset + chunk_size] for offset in offsets]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return merge_partial_indexes(pool.map(build_partial_index, repeat(builder), repeat(preprocessor),
+                                              chunks, offsets))
 
 
 def write_index_to_file(index: dict, file: str):
@@ -149,88 +263,144 @@ def write_index_to_file(index: dict, file: str):
     index_file.close()
 
 
+@instrumented('reconstruct_index_from_file')
 def reconstruct_index_from_file(file: str) -> dict:
-    """Reconstructs the bi-word index from the file"""
+    """Reconstructs the index from a text dump"""
     index_file = open(file, READ, encoding=UTF_8)
-    index = eval(index_file.read())
+    index = literal_eval(index_file.read())
     index_file.close()
     return index
 
 
-def index_documents() -> dict:
-    """Indexes the documents"""
+def save_index(index: dict, path: str, export_text: bool = EXPORT_TEXT_INDEX, files: list = None,
+               num_documents: int = None):
+    """Saves the index in the binary format, optionally also as a text dump
+
+    With the indexed files, their document table is saved with the index. The number of
+    documents, len(files) by default, bounds the doc-ids NOT is taken against, trailing
+    documents without terms included.
+    """
+    if num_documents is None and files is not None:
+        num_documents = len(files)
+    write_binary_index(index, path, num_documents=num_documents)
+    if export_text:
+        write_index_to_file(index, path + INDEX_TEXT_EXTENSION)
+    if files is not None:
+        save_document_table(files, path)
+
+
+def saved_index_exists(path: str) -> bool:
+    """Checks if the binary index was saved with its document table
+
+    Indexes saved without one numbered the documents in unsorted directory order, their
+    doc-ids cannot be mapped to file names and they are rebuilt.
+    """
+    return binary_index_exists(path) and document_table_exists(path)
+
 
-    if os.path.exists(INVERTED_INDEX_FILE):
-        inverted_index = reconstruct_index_from_file(INVERTED_INDEX_FILE)
+def saved_index_current(path: str, files: list) -> bool:
+    """Checks if the binary index was saved for the files as they are now, none added, changed or deleted"""
+    return saved_index_exists(path) and load_document_table(path).describes(files)
+
+
+@instrumented('load_index')
+def load_index(path: str):
+    """Opens the binary index, postings are read from disk on lookup"""
+    return open_binary_index(path)
+
+
+def load_or_build(path: str, build, dir_path: str = DOCUMENT_PATH):
+    """Opens the index saved at path, or builds and saves it with build once documents changed"""
+    return load_index(path) if saved_index_current(path, list_documents(dir_path)) else build()
+
+
+def index_documents(workers: int = WORKERS) -> dict:
+    """Indexes the documents, the saved index is reused until documents are added, changed or deleted"""
+    files = list_documents(DOCUMENT_PATH)
+    if saved_index_current(INVERTED_INDEX_PATH, files):
+        inverted_index = load_index(INVERTED_INDEX_PATH)
     else:
-        processed_documents = process_documents(DOCUMENT_PATH)
-        inverted_index = create_inverted_index(processed_documents)
+        inverted_index = build_index(create_inverted_index, DOCUMENT_PATH, workers)
 
-        write_index_to_file(inverted_index, INVERTED_INDEX_FILE)
+        save_index(inverted_index, INVERTED_INDEX_PATH, files=files)
+        # Queries run on a compact copy instead of the dict of sets, NOT covers trailing documents without terms
+        inverted_index = CompactIndex(inverted_index, len(files))
 
     return inverted_index
 
 
 # Query Processing Functions
+def split_query(query: str) -> list:
+    """Splits the query into words, operators and parentheses"""
+    return query.replace(LEFT_PARENTHESIS, SPACE + LEFT_PARENTHESIS + SPACE) \
+        .replace(RIGHT_PARENTHESIS, SPACE + RIGHT_PARENTHESIS + SPACE).split()
+
+
+def is_query_word(word: str) -> bool:
+    """Checks if the query token is a word rather than an operator or a parenthesis"""
+    return word.lower() not in [AND, OR, NOT] and word not in [LEFT_PARENTHESIS, RIGHT_PARENTHESIS]
+
+
+def query_term(word: str, preprocessor=preprocess) -> str:
+    """Returns the index term of the query word, ValueError when preprocessing leaves none, e.g. for a stopword"""
+    terms = preprocessor(word)
+    if not terms:
+        raise ValueError(f'Query word {word!r} has no index terms')
+    return terms[0]
+
+
 def preprocess_query(query: str) -> list:
     """Preprocesses the query"""
-    query = query.split()
+    query = split_query(query)
     for i in range(len(query)):
-        if query[i].lower() not in [AND, OR, NOT]:
-            query[i] = preprocess(query[i])[0]
+        if is_query_word(query[i]):
+            query[i] = query_term(query[i])
     return query
 
 
-def validate_query(query: list, inverted_index: dict) -> bool:
-    """Validates the query by looking if word exists in the inverted index"""
-    for i in range(len(query)):
-        if query[i].lower() not in [AND, OR, NOT]:
-            if query[i] not in inverted_index:
-                return False
-    return True
-
-
 # Search Functions
+@traced_query('boolean')
 def search(query: list, index: dict) -> set:
-    """Searches the query in the inverted index"""
-    if not validate_query(query, index):
-        return set()
-    result = set()
-    for i, word in enumerate(query):
-        if word.lower() == AND:
-            result = result.intersection(index[query[i + 1]])
-        elif word.lower() == OR:
-            result = result.union(index[query[i + 1]])
-        elif word.lower() == NOT:
-            result = result.difference(index[query[i + 1]])
-        elif i == 0:
-            result = index[word]
-        else:
-            pass
+    """Searches the query in the inverted index
+
+    The query is parsed with AND/OR/NOT precedence and parentheses, see boolean_query.
+    Missing words match no document and NOT is taken against all documents. Results of
+    repeated queries and the postings of hot terms are cached until the index changes.
+    """
+    key = (BOOLEAN_QUERY, tuple(word if is_query_word(word) else word.lower() for word in query))
+    return set(cached_result(index, key, lambda: frozenset(run_query(query, CachedIndex(index)))))
 
-    return result
 
+def document_names(indices, index_path: str = INVERTED_INDEX_PATH) -> list:
+    """Maps doc-ids to file names with the document table of the index"""
+    table = load_document_table(index_path)
+    if table is None:
+        raise ValueError(f'{index_path} has no document table, rebuild the index')
+    return table.names(indices)
 
-def get_documents_from_index(indices: set, directory: str):
-    """Prints the document names from the indices"""
-    files = os.listdir(directory)
-    for i in indices:
-        print(files[i])
+
+def get_documents_from_index(indices: set, directory: str, index_path: str = INVERTED_INDEX_PATH):
+    """Prints the names of the documents of the directory from the indices, read from the document table of the index"""
+    for name in document_names(indices, index_path):
+        print(name)
 
 
 def main():
+    """Opens or builds the index once and answers queries until interrupted"""
     inverted_index = index_documents()
-    query = input(INPUT_MESSAGE)
-    processed_query = preprocess_query(query)
-    result = search(processed_query, inverted_index)
-    if not result:
-        print(QUERY_FAILURE_MESSAGE)
-        return
-    else:
-        print(QUERY_SUCCESS_MESSAGE)
-        get_documents_from_index(result, DOCUMENT_PATH)
+    while True:
+        query = input(INPUT_MESSAGE)
+        try:
+            result = search(preprocess_query(query), inverted_index)
+        except ValueError as error:
+            print(error)
+            continue
+        if not result:
+            print(QUERY_FAILURE_MESSAGE)
+        else:
+            print(QUERY_SUCCESS_MESSAGE)
+            get_documents_from_index(result, DOCUMENT_PATH)
 
 
 if __name__ == '__main__':
-    while True:
-        main()
+    main()
@@ -1,16 +1,25 @@
-from assignment1.question1 import preprocess, get_documents_from_index, process_documents, \
-    reconstruct_index_from_file, write_index_to_file
-from assignment1.question1 import SPACE, DOCUMENT_PATH
+from assignment1.question1 import preprocess, get_documents_from_index, build_index, save_index, load_or_build, \
+    list_documents
+from assignment1.question1 import SPACE, DOCUMENT_PATH, WORKERS
+from assignment1.compact_index import CompactIndex
+from assignment1.spimi import build_index_streaming, MEMORY_BUDGET
+from assignment1.query_cache import cached_result, BI_WORD_QUERY
+from assignment1.instrumentation import instrumented, traced_query
 
-BI_WORD_INDEX_FILE = "bi_word_index.txt"
+BI_WORD_INDEX_PATH = "bi_word_index"
 
 
+def bi_words(document: list) -> list:
+    """Returns the bi-words of the document, in order"""
+    return [document[j] + SPACE + document[j + 1] for j in range(len(document) - 1)]
+
+
+@instrumented('build.bi_word')
 def create_bi_word_index(documents: list) -> dict:
     """Creates the bi-word index from the documents"""
     bi_word_index = {}
     for i, document in enumerate(documents):
-        for j in range(len(document) - 1):
-            bi_word = document[j] + " " + document[j + 1]
+        for bi_word in bi_words(document):
             if bi_word not in bi_word_index:
                 bi_word_index[bi_word] = {i}
             else:
@@ -18,14 +27,20 @@ def create_bi_word_index(documents: list) -> dict:
     return dict(sorted(bi_word_index.items()))
 
 
-def index_bi_words() -> dict:
+def index_bi_words(workers: int = WORKERS) -> dict:
     """Indexes the bi-words with the original documents"""
-    processed_documents = process_documents(DOCUMENT_PATH)
-    bi_word_index = create_bi_word_index(processed_documents)
+    files = list_documents(DOCUMENT_PATH)
+    bi_word_index = build_index(create_bi_word_index, DOCUMENT_PATH, workers)
+
+    save_index(bi_word_index, BI_WORD_INDEX_PATH, files=files)
+
+    return CompactIndex(bi_word_index, len(files))
 
-    write_index_to_file(bi_word_index, BI_WORD_INDEX_FILE)
 
-    return bi_word_index
+def index_bi_words_streaming(memory_budget: int = MEMORY_BUDGET):
+    """Indexes the bi-words with SPIMI, holding at most about memory_budget bytes of postings in memory"""
+    return build_index_streaming(DOCUMENT_PATH, BI_WORD_INDEX_PATH, term_extractor=bi_words,
+                                 memory_budget=memory_budget)
 
 
 def preprocess_bi_word_query(query: str) -> str:
@@ -33,30 +48,26 @@ def preprocess_bi_word_query(query: str) -> str:
     return SPACE.join(preprocess(query))
 
 
+@traced_query('bi-word')
 def search_bi_word_index(query: str, bi_word_index: dict) -> set:
     """Searches the bi-word index for the query"""
     query = preprocess_bi_word_query(query)
-    if query in bi_word_index:
-        return bi_word_index[query]
-    return set()
+    return set(cached_result(bi_word_index, (BI_WORD_QUERY, query),
+                             lambda: frozenset(bi_word_index[query]) if query in bi_word_index else frozenset()))
 
 
 def main():
-    """Main function"""
-    bi_word_index = index_bi_words()
-
-    # if os.path.exists(BI_WORD_INDEX_FILE):
-    #     bi_word_index = reconstruct_index_from_file(BI_WORD_INDEX_FILE)
-
-    query = input("Enter the bi-word query: ")
-    result = search_bi_word_index(query, bi_word_index)
+    """Opens or builds the bi-word index once and answers queries until interrupted"""
+    bi_word_index = load_or_build(BI_WORD_INDEX_PATH, index_bi_words)
+    while True:
+        query = input("Enter the bi-word query: ")
+        result = search_bi_word_index(query, bi_word_index)
 
-    if not result:
-        print("No results found!")
-    else:
-        get_documents_from_index(result, DOCUMENT_PATH)
+        if not result:
+            print("No results found!")
+        else:
+            get_documents_from_index(result, DOCUMENT_PATH, BI_WORD_INDEX_PATH)
 
 
 if __name__ == "__main__":
-    while True:
-        main()
+    main()
@@ -1,10 +1,17 @@
-from assignment1.question1 import preprocess, process_documents, create_inverted_index, search, \
-    get_documents_from_index, write_index_to_file, preprocess_query, AND, OR, SPACE
-from assignment1.question1 import DOCUMENT_PATH
+import heapq
+from assignment1.question1 import preprocess, build_index, get_documents_from_index, save_index, list_documents, \
+    load_index, saved_index_current
+from assignment1.question1 import DOCUMENT_PATH, WORKERS
+from assignment1.boolean_query import postings_of, position_lists_of, intersect
+from assignment1.compact_index import CompactIndex
+from assignment1.instrumentation import instrumented, traced_query, stage, count
+from assignment1.term_dictionary import correct_terms
 
-POSITIONAL_INDEX_FILE = "positional_index.txt"
+POSITIONAL_INDEX_PATH = "positional_index"
+QUOTE = '"'
 
 
+@instrumented('build.positional')
 def create_positional_index(documents: list) -> dict:
     """Creates the positional index from the documents"""
     positional_index = {}
@@ -20,44 +27,146 @@ def create_positional_index(documents: list) -> dict:
     return dict(sorted(positional_index.items()))
 
 
-def index_documents() -> tuple:
-    processed_documents = process_documents(DOCUMENT_PATH)
-    positional_index = create_positional_index(processed_documents)
-    inverted_index = create_inverted_index(processed_documents)
+def index_documents(workers: int = WORKERS) -> tuple:
+    files = list_documents(DOCUMENT_PATH)
+    positional_index = build_index(create_positional_index, DOCUMENT_PATH, workers)
 
-    write_index_to_file(positional_index, POSITIONAL_INDEX_FILE)
+    save_index(positional_index, POSITIONAL_INDEX_PATH, files=files)
 
-    return inverted_index, positional_index
+    # The doc-ids of the positional postings give the inverted index, both share one compact copy
+    positional_index = CompactIndex(positional_index, len(files))
+    return positional_index.document_index(), positional_index
 
 
-def search_query(query: str, proximity: int, inverted_index: dict, positional_index: dict) -> set:
-    query = preprocess_query(query)
-    common_docs = search(query, inverted_index)
-    query = preprocess(SPACE.join(query))
-    result = set()
-    for doc in common_docs:
-        for i in range(len(positional_index[query[0]][doc])):
-            for j in range(len(positional_index[query[1]][doc])):
-                if abs(positional_index[query[0]][doc][i] - positional_index[query[1]][doc][j]) <= proximity:
-                    result.add(doc)
-                    break
+def load_positional_index(workers: int = WORKERS) -> tuple:
+    """Opens the saved positional index, or builds it once documents changed, with its inverted index
 
+    The doc-ids of the saved positional postings are the inverted index of the phrase queries.
+    """
+    if saved_index_current(POSITIONAL_INDEX_PATH, list_documents(DOCUMENT_PATH)):
+        positional_index = load_index(POSITIONAL_INDEX_PATH)
+        return positional_index, positional_index
+    return index_documents(workers)
+
+
+def phrase_match(position_lists: list) -> bool:
+    """Checks if the terms occur at consecutive positions, by intersecting the position lists shifted by offset"""
+    candidates = position_lists[0]
+    for offset, positions in enumerate(position_lists[1:], 1):
+        candidates = intersect(candidates, [position - offset for position in positions])
+        if not candidates:
+            return False
+    return True
+
+
+def window_match(position_lists: list, proximity: int) -> bool:
+    """Checks if one position of every term falls within proximity of the others, in any order
+
+    The lists are merged with a heap holding one position per term, the window spans
+    from the smallest head to the largest one and only the smallest head advances.
+    """
+    heads = [(positions[0], i, 0) for i, positions in enumerate(position_lists)]
+    largest = max(position for position, _, _ in heads)
+    heapq.heapify(heads)
+    while True:
+        smallest, i, j = heads[0]
+        if largest - smallest <= proximity:
+            return True
+        if j + 1 == len(position_lists[i]):
+            return False
+        position = position_lists[i][j + 1]
+        largest = max(largest, position)
+        heapq.heapreplace(heads, (position, i, j + 1))
+
+
+def ordered_match(position_lists: list, proximity: int) -> bool:
+    """Checks if the terms occur in query order, each within proximity after the previous one
+
+    The reachable positions of a term are those within proximity after a reachable position
+    of the previous term. The closest one before a position is the only one to check, so
+    each pair of consecutive lists is merged once.
+    """
+    reachable = position_lists[0]
+    for positions in position_lists[1:]:
+        next_reachable = []
+        j = 0
+        previous = None
+        for position in positions:
+            while j < len(reachable) and reachable[j] < position:
+                previous = reachable[j]
+                j += 1
+            if previous is not None and position - previous <= proximity:
+                next_reachable.append(position)
+        if not next_reachable:
+            return False
+        reachable = next_reachable
+    return True
+
+
+@instrumented('positional.candidates')
+def candidate_documents(terms: list, inverted_index: dict) -> list:
+    """Returns the documents containing every term, intersecting the rarest postings first"""
+    postings_lists = sorted((postings_of(inverted_index, term) for term in set(terms)), key=len)
+    result = list(postings_lists[0])
+    for postings in postings_lists[1:]:
+        if not result:
+            break
+        result = intersect(result, postings)
     return result
 
 
+def match_documents(terms: list, inverted_index: dict, positional_index: dict, matcher) -> set:
+    """Returns the candidate documents whose position lists satisfy the matcher"""
+    if not terms or any(term not in positional_index for term in terms):
+        return set()
+    documents = candidate_documents(terms, inverted_index)
+    count('positional.documents_checked', len(documents))
+    with stage('positional.position_lists'):
+        postings = {term: position_lists_of(positional_index, term) for term in set(terms)}
+    with stage('positional.match'):
+        return {doc for doc in documents if matcher([postings[term][doc] for term in terms])}
+
+
+@traced_query('proximity')
+def search_query(query: str, proximity: int, inverted_index: dict, positional_index: dict,
+                 ordered: bool = False, dictionary=None) -> set:
+    """Searches the documents where all query terms occur within proximity of each other
+
+    With a term dictionary, terms missing from the index are replaced by their closest term.
+    """
+    terms = preprocess(query) if dictionary is None else correct_terms(preprocess(query), dictionary)
+    if ordered:
+        return match_documents(terms, inverted_index, positional_index,
+                               lambda position_lists: ordered_match(position_lists, proximity))
+    # Repeated terms match the same position when the order does not matter
+    terms = list(dict.fromkeys(terms))
+    return match_documents(terms, inverted_index, positional_index,
+                           lambda position_lists: window_match(position_lists, proximity))
+
+
+@traced_query('phrase')
+def search_phrase(query: str, inverted_index: dict, positional_index: dict, dictionary=None) -> set:
+    """Searches the documents containing the query terms as an exact phrase, corrected with the term dictionary"""
+    terms = preprocess(query) if dictionary is None else correct_terms(preprocess(query), dictionary)
+    return match_documents(terms, inverted_index, positional_index, phrase_match)
+
+
 def main():
-    """Main function"""
-    inverted_index, positional_index = index_documents()
-    proximity = int(input("Enter the proximity: "))
-    query = input("Enter the query: ")
+    """Opens or builds the positional index once and answers queries until interrupted"""
+    inverted_index, positional_index = load_positional_index()
+    while True:
+        query = input("Enter the query (quoted for a phrase): ")
 
-    result = search_query(query, proximity, inverted_index, positional_index)
-    if not result:
-        print("No results found!")
-    else:
-        get_documents_from_index(result, DOCUMENT_PATH)
+        if query.startswith(QUOTE) and query.endswith(QUOTE):
+            result = search_phrase(query.strip(QUOTE), inverted_index, positional_index)
+        else:
+            proximity = int(input("Enter the proximity: "))
+            result = search_query(query, proximity, inverted_index, positional_index)
+        if not result:
+            print("No results found!")
+        else:
+            get_documents_from_index(result, DOCUMENT_PATH, POSITIONAL_INDEX_PATH)
 
 
 if __name__ == "__main__":
-    while True:
-        main()
+    main()
@@ -1,114 +1,179 @@
+import json
+import os
 from assignment1.question1 import EMPTY, VOWELS_ZERO, ZERO, PHONETIC_DICTIONARY, FOUR, DOCUMENT_PATH, \
-    read_dir, case_fold, remove_punctuation, expand_contractions, tokenize, write_index_to_file, search, \
-    remove_stopwords, AND, OR, NOT, get_documents_from_index
+    build_index, save_index, load_or_build, search, split_query, is_query_word, get_documents_from_index, \
+    get_preprocessor, create_inverted_index, list_documents, query_term, WORKERS, READ, WRITE, UTF_8
+from assignment1.compact_index import CompactIndex
+from assignment1.instrumentation import instrumented, traced_query
 
-SOUNDEX_INDEX_FILE = 'soundex_index.txt'
-
-
-def replace_vowels(word: str) -> str:
-    """Replaces the vowels in the word with 0"""
-    return word[0] + EMPTY.join([ZERO if char in VOWELS_ZERO else char for char in word[1:]])
-
-
-def remove_consecutive_duplicates(word: str) -> str:
-    """Removes the consecutive duplicates in the word"""
-    result = word[0]
-    for i in range(1, len(word)):
-        if word[i] != word[i - 1]:
-            result += word[i]
-    return result
+SOUNDEX_INDEX_PATH = 'soundex_index'
+SOUNDEX_TABLE_FILE = SOUNDEX_INDEX_PATH + '.codes.json'
+# Code of every letter after the first one, vowels map to the 0 that is dropped from the code
+SOUNDEX_SYMBOLS = {**{vowel: ZERO for vowel in VOWELS_ZERO}, **PHONETIC_DICTIONARY}
+# Vocabulary terms listed for each query word that sound like it
+EXPANSION_LIMIT = 4
 
 
 def soundex(word: str, length: int) -> str:
-    """Returns the soundex code of the word"""
+    """Returns the soundex code of the word
+
+    Vowel replacement, coding, duplicate removal and zero removal are done in one pass:
+    a symbol equal to the previous one is skipped, zeros only separate duplicates and the
+    pass stops once the code is long enough.
+    """
     if word.isnumeric():
         return EMPTY
 
     word = word.upper()
-    word = replace_vowels(word)
+    previous = word[0]
+    code = [] if previous == ZERO else [previous]
+    for char in word[1:]:
+        if len(code) == length:
+            break
+        symbol = SOUNDEX_SYMBOLS.get(char, char)
+        if symbol == previous:
+            continue
+        previous = symbol
+        if symbol != ZERO:
+            code.append(symbol)
 
-    result = ""
-    result += word[0]
-    for i in range(1, len(word)):
-        if word[i] not in PHONETIC_DICTIONARY:
-            result += word[i]
-        else:
-            result += PHONETIC_DICTIONARY[word[i]]
-
-    result = remove_consecutive_duplicates(result)
-    result = result.replace(ZERO, EMPTY)
+    return EMPTY.join(code).ljust(length, ZERO)
 
-    if len(result) < length:
-        result += ZERO * (length - len(result))
-    else:
-        result = result[:length]
 
-    return result
+@instrumented('build.soundex_table')
+def create_soundex_table(vocabulary) -> dict:
+    """Encodes every distinct term once, returns the term -> soundex code table"""
+    return {term: soundex(term, FOUR) for term in vocabulary}
 
 
-def create_soundex_index(documents: list) -> dict:
-    """Creates the soundex index from the documents"""
+def create_soundex_index_from_terms(term_index: dict, table: dict) -> dict:
+    """Groups the postings of the terms by soundex code"""
     soundex_index = {}
-    for i, document in enumerate(documents):
-        for word in document:
-            soundex_code = soundex(word, FOUR)
-            if soundex_code not in soundex_index:
-                soundex_index[soundex_code] = {i}
-            else:
-                soundex_index[soundex_code].add(i)
+    for term, postings in term_index.items():
+        soundex_code = table[term]
+        if soundex_code not in soundex_index:
+            soundex_index[soundex_code] = set(postings)
+        else:
+            soundex_index[soundex_code].update(postings)
     return dict(sorted(soundex_index.items()))
 
 
+@instrumented('build.soundex')
+def create_soundex_index(documents: list) -> dict:
+    """Creates the soundex index from the documents, encoding each distinct word once"""
+    term_index = create_inverted_index(documents)
+    return create_soundex_index_from_terms(term_index, create_soundex_table(term_index))
+
+
+class SoundexTable:
+    """Soundex codes of the vocabulary and the code -> terms map used to expand phonetic queries
+
+    Terms sharing a code are ranked by decreasing document frequency, then alphabetically.
+    """
+
+    def __init__(self, codes: dict, frequencies: dict):
+        self.codes = codes
+        self.frequencies = frequencies
+        self.terms = {}
+        for term, soundex_code in codes.items():
+            self.terms.setdefault(soundex_code, []).append(term)
+        for terms in self.terms.values():
+            terms.sort(key=lambda term: (-frequencies.get(term, 0), term))
+
+    @classmethod
+    def from_term_index(cls, term_index: dict) -> 'SoundexTable':
+        """Builds the table of the terms of an inverted index, with their document frequencies"""
+        return cls(create_soundex_table(term_index), {term: len(postings) for term, postings in term_index.items()})
+
+    def code(self, word: str) -> str:
+        """Returns the soundex code of the word, from the table when it is a vocabulary term"""
+        soundex_code = self.codes.get(word)
+        return soundex_code if soundex_code is not None else soundex(word, FOUR)
+
+    def expand(self, word: str, limit: int = None) -> list:
+        """Returns the vocabulary terms that sound like the word, the most frequent first"""
+        terms = self.terms.get(self.code(word), [])
+        return terms[:limit] if limit is not None else list(terms)
+
+    def save(self, file: str = SOUNDEX_TABLE_FILE):
+        """Writes the table next to the soundex index"""
+        with open(file, WRITE, encoding=UTF_8) as f:
+            json.dump({'codes': self.codes, 'frequencies': self.frequencies}, f)
+
+    @classmethod
+    def load(cls, file: str = SOUNDEX_TABLE_FILE) -> 'SoundexTable':
+        """Reads the table written with the soundex index"""
+        with open(file, READ, encoding=UTF_8) as f:
+            data = json.load(f)
+        return cls(data['codes'], data['frequencies'])
+
+
 def preprocess_for_soundex(string: str) -> list:
-    """Preprocesses the string for soundex"""
-    string = case_fold(string)
-    string = expand_contractions(string)
-    string = remove_punctuation(string)
-    string = remove_stopwords(string)
-    return tokenize(string)
+    """Preprocesses the string for soundex, the shared pipeline without stemming and lemmatization"""
+    return get_preprocessor().tokenize(string)
 
 
-def index_soundex() -> dict:
-    documents = read_dir(DOCUMENT_PATH)
-    processed_documents = [preprocess_for_soundex(document) for document in documents]
+def index_soundex(workers: int = WORKERS) -> dict:
+    # Documents are indexed by term and each distinct term is encoded once, so encoding scales with the vocabulary
+    files = list_documents(DOCUMENT_PATH)
+    term_index = build_index(create_inverted_index, DOCUMENT_PATH, workers, preprocess_for_soundex)
+    table = SoundexTable.from_term_index(term_index)
+    soundex_index = create_soundex_index_from_terms(term_index, table.codes)
 
-    soundex_index = create_soundex_index(processed_documents)
+    save_index(soundex_index, SOUNDEX_INDEX_PATH, files=files)
+    table.save(SOUNDEX_TABLE_FILE)
 
-    write_index_to_file(soundex_index, SOUNDEX_INDEX_FILE)
+    return CompactIndex(soundex_index, len(files))
 
-    return soundex_index
+
+def load_soundex_table(file: str = SOUNDEX_TABLE_FILE):
+    """Loads the term -> code table saved with the soundex index, None when there is none"""
+    return SoundexTable.load(file) if os.path.exists(file) else None
 
 
 def preprocess_query(query: str) -> list:
     """Preprocesses the query"""
-    query = query.split()
+    query = split_query(query)
     for i in range(len(query)):
-        if query[i].lower() not in [AND, OR, NOT]:
-            query[i] = preprocess_for_soundex(query[i])[0]
+        if is_query_word(query[i]):
+            query[i] = query_term(query[i], preprocess_for_soundex)
     return query
 
 
-def search_soundex_index(query: str, soundex_index: dict) -> set:
+@traced_query('soundex')
+def search_soundex_index(query: str, soundex_index: dict, table: SoundexTable = None) -> set:
     """Searches the soundex index for the query"""
     query = preprocess_query(query)
-    # ig word is  "AND" or "OR" or "NOT" then it will not be converted to soundex
-    query = [soundex(word, FOUR) if word not in [AND, OR, NOT] else word for word in query]
+    encode = table.code if table is not None else lambda word: soundex(word, FOUR)
+    # if word is "AND" or "OR" or "NOT" or a parenthesis then it will not be converted to soundex
+    query = [encode(word) if is_query_word(word) else word for word in query]
     return search(query, soundex_index)
 
 
-def main():
-    """Main function"""
-    soundex_index = index_soundex()
+def expand_soundex_query(query: str, table: SoundexTable, limit: int = None) -> dict:
+    """Maps each query word to the vocabulary terms that sound like it, the most frequent first"""
+    return {word: table.expand(word, limit) for word in preprocess_query(query) if is_query_word(word)}
 
-    query = input("Enter the soundex query: ")
-    result = search_soundex_index(query, soundex_index)
 
-    if not result:
-        print("No results found!")
-    else:
-        get_documents_from_index(result, DOCUMENT_PATH)
+def main():
+    """Opens or builds the soundex index once and answers queries until interrupted"""
+    soundex_index = load_or_build(SOUNDEX_INDEX_PATH, index_soundex)
+    table = load_soundex_table()
+    while True:
+        query = input("Enter the soundex query: ")
+        try:
+            result = search_soundex_index(query, soundex_index, table)
+        except ValueError as error:
+            print(error)
+            continue
+
+        if not result:
+            print("No results found!")
+        else:
+            for word, terms in expand_soundex_query(query, table, EXPANSION_LIMIT).items():
+                print(f"{word}: {', '.join(terms)}")
+            get_documents_from_index(result, DOCUMENT_PATH, SOUNDEX_INDEX_PATH)
 
 
 if __name__ == '__main__':
-    while True:
-        main()
+    main()
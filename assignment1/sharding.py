@@ -0,0 +1,247 @@
+import argparse
+import heapq
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from assignment1.question1 import DOCUMENT_PATH, INVERTED_INDEX_PATH, WORKERS, CHUNK_SIZE, READ, WRITE, UTF_8, \
+    list_documents, load_index, preprocess_query, search
+from assignment1.question2a import BI_WORD_INDEX_PATH, search_bi_word_index
+from assignment1.question2b import POSITIONAL_INDEX_PATH, search_phrase, search_query
+from assignment1.question2c import SOUNDEX_INDEX_PATH, search_soundex_index
+from assignment1.multi_index import VECTOR, build_indexes_of_files
+from assignment1.document_table import DocumentTable
+from assignment2 import vector_spacing
+
+# Constants
+SHARD_DIRECTORY = 'shards'
+SHARD_PREFIX = 'shard'
+MANIFEST_NAME = 'shards'
+MANIFEST_EXTENSION = '.json'
+SHARDS = 4
+DEFAULT_PROXIMITY = 1
+BOOLEAN = 'boolean'
+BI_WORD = 'bi-word'
+PHRASE = 'phrase'
+PROXIMITY = 'proximity'
+SOUNDEX = 'soundex'
+RANKED = 'ranked'
+
+_shard = {}
+
+
+def manifest_path(directory: str) -> str:
+    """Returns the path of the manifest of the shards, their document table is saved next to it"""
+    return os.path.join(directory, MANIFEST_NAME)
+
+
+def partition(files: list, shards: int) -> list:
+    """Splits the files into contiguous ranges of nearly equal size, one per shard"""
+    shards = max(1, min(shards, len(files)))
+    size, extra = divmod(len(files), shards)
+    ranges = []
+    start = 0
+    for shard in range(shards):
+        end = start + size + (shard < extra)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+# Shard Building Functions
+def build_shard(files: list, directory: str, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Builds every index of the files of one shard, doc-ids are local to the shard
+
+    Returns the document frequencies of the vector space terms of the shard.
+    """
+    os.makedirs(directory, exist_ok=True)
+    indexes = build_indexes_of_files(files, 1, chunk_size, directory)
+    return indexes[VECTOR].doc_freqs
+
+
+def build_shards(dir_path: str = DOCUMENT_PATH, shards: int = SHARDS, workers: int = WORKERS,
+                 directory: str = SHARD_DIRECTORY) -> dict:
+    """Partitions the documents into shards of consecutive doc-ids and builds the indexes of each one
+
+    Shards are built in parallel when workers > 1. The manifest records the doc-id offset
+    of every shard and the collection-wide document frequencies of the vector space terms,
+    so that ranked queries are weighted like on a single index.
+    """
+    files = list_documents(dir_path)
+    ranges = partition(files, shards)
+    paths = [os.path.join(directory, f"{SHARD_PREFIX}{shard}") for shard in range(len(ranges))]
+    shard_files = [files[start:end] for start, end in ranges]
+    if workers <= 1:
+        shard_doc_freqs = list(map(build_shard, shard_files, paths))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shard_doc_freqs = list(pool.map(build_shard, shard_files, paths))
+
+    doc_freqs = {}
+    for shard in shard_doc_freqs:
+        for term, doc_freq in shard.items():
+            doc_freqs[term] = doc_freqs.get(term, 0) + doc_freq
+    manifest = {
+        'shards': [{'path': path, 'offset': start, 'documents': end - start} for path, (start, end) in zip(paths, ranges)],
+        'total_docs': len(files),
+        'doc_freqs': dict(sorted(doc_freqs.items())),
+    }
+    with open(manifest_path(directory) + MANIFEST_EXTENSION, WRITE, encoding=UTF_8) as f:
+        json.dump(manifest, f)
+    DocumentTable.from_files(files).save(manifest_path(directory))
+    return manifest
+
+
+def load_manifest(directory: str = SHARD_DIRECTORY) -> dict:
+    with open(manifest_path(directory) + MANIFEST_EXTENSION, READ, encoding=UTF_8) as f:
+        return json.load(f)
+
+
+# Shard Worker Functions
+def init_shard_worker(directory: str):
+    """Opens the indexes of the shard once per worker process"""
+    _shard[BOOLEAN] = load_index(os.path.join(directory, INVERTED_INDEX_PATH))
+    _shard[BI_WORD] = load_index(os.path.join(directory, BI_WORD_INDEX_PATH))
+    _shard[PHRASE] = load_index(os.path.join(directory, POSITIONAL_INDEX_PATH))
+    _shard[SOUNDEX] = load_index(os.path.join(directory, SOUNDEX_INDEX_PATH))
+    _shard[RANKED] = vector_spacing.VectorSpaceIndex.load(
+        os.path.join(directory, vector_spacing.VECTOR_INDEX_FILE)).compact()
+
+
+def shard_ready() -> bool:
+    return bool(_shard)
+
+
+def shard_boolean(tokens: list) -> list:
+    return sorted(search(tokens, _shard[BOOLEAN]))
+
+
+def shard_bi_word(query: str) -> list:
+    return sorted(search_bi_word_index(query, _shard[BI_WORD]))
+
+
+def shard_phrase(query: str) -> list:
+    # The doc-ids of the positional postings are the inverted index of the phrase queries
+    return sorted(search_phrase(query, _shard[PHRASE], _shard[PHRASE]))
+
+
+def shard_proximity(query: str, proximity: int, ordered: bool) -> list:
+    return sorted(search_query(query, proximity, _shard[PHRASE], _shard[PHRASE], ordered))
+
+
+def shard_soundex(query: str) -> list:
+    return sorted(search_soundex_index(query, _shard[SOUNDEX]))
+
+
+def shard_ranked(query_vector: dict, k: int, pruning: bool) -> list:
+    """Returns the k best documents of the shard for a query vector weighted with the collection statistics"""
+    index = _shard[RANKED]
+    # Terms absent from the shard add nothing, the others keep their order, so scores match a single index
+    query_vector = {term: weight for term, weight in query_vector.items() if term in index.inverted_index}
+    if pruning:
+        return vector_spacing.score_max_score(query_vector, index.inverted_index, index.doc_lengths,
+                                              index.max_weights, k)
+    return vector_spacing.score_term_at_a_time(query_vector, index.inverted_index, index.doc_lengths, k)
+
+
+# Coordinator
+class ShardCoordinator:
+    """Fans every query out to one worker process per shard and merges the shard results
+
+    Each shard has its own single-process pool, so its indexes are loaded once and stay in
+    that process. Document results are merged by union and ranked results by a global top k.
+    """
+
+    def __init__(self, directory: str = SHARD_DIRECTORY):
+        manifest = load_manifest(directory)
+        self.offsets = [shard['offset'] for shard in manifest['shards']]
+        self.total_docs = manifest['total_docs']
+        self.idf = {term: vector_spacing.calculate_idf(self.total_docs, doc_freq)
+                    for term, doc_freq in manifest['doc_freqs'].items()}
+        self.table = DocumentTable.load(manifest_path(directory))
+        self.pools = [ProcessPoolExecutor(max_workers=1, initializer=init_shard_worker, initargs=(shard['path'],))
+                      for shard in manifest['shards']]
+        self.scatter(shard_ready)
+
+    def scatter(self, function, *args) -> list:
+        """Runs the function on every shard in parallel, returns the results by shard"""
+        futures = [pool.submit(function, *args) for pool in self.pools]
+        return [future.result() for future in futures]
+
+    def gather_documents(self, function, *args) -> set:
+        """Returns the union of the documents found by the shards, with collection doc-ids"""
+        return {offset + doc_id for offset, doc_ids in zip(self.offsets, self.scatter(function, *args))
+                for doc_id in doc_ids}
+
+    def boolean(self, query: str) -> set:
+        return self.gather_documents(shard_boolean, preprocess_query(query))
+
+    def bi_word(self, query: str) -> set:
+        return self.gather_documents(shard_bi_word, query)
+
+    def phrase(self, query: str) -> set:
+        return self.gather_documents(shard_phrase, query)
+
+    def proximity(self, query: str, proximity: int = DEFAULT_PROXIMITY, ordered: bool = False) -> set:
+        return self.gather_documents(shard_proximity, query, proximity, ordered)
+
+    def soundex(self, query: str) -> set:
+        return self.gather_documents(shard_soundex, query)
+
+    def ranked(self, query: str, k: int = vector_spacing.TOP_K, pruning: bool = False) -> list:
+        """Returns the k best (doc-id, score) pairs of the collection
+
+        The query vector is weighted once with the collection idf, every shard ranks its
+        documents for it and the global top k is merged from the shard top k.
+        """
+        query_vector = vector_spacing.create_query_vector(vector_spacing.preprocess(query), self.idf,
+                                                          self.total_docs, self.idf)
+        shard_results = self.scatter(shard_ranked, query_vector, k, pruning)
+        return heapq.nsmallest(k, ((offset + doc_id, score) for offset, results in zip(self.offsets, shard_results)
+                                   for doc_id, score in results), key=vector_spacing.rank_key)
+
+    def names(self, doc_ids) -> list:
+        """Returns the file names of the documents, in doc-id order"""
+        return self.table.names(doc_ids)
+
+    def close(self):
+        for pool in self.pools:
+            pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Builds sharded indexes and searches them in parallel')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='partitions the corpus into shards and indexes each one')
+    build.add_argument('--shards', type=int, default=SHARDS)
+    build.add_argument('--workers', type=int, default=WORKERS)
+    query = commands.add_parser('search', help='searches every shard and merges the results')
+    query.add_argument('mode', choices=(BOOLEAN, BI_WORD, PHRASE, PROXIMITY, SOUNDEX, RANKED))
+    query.add_argument('query')
+    query.add_argument('--k', type=int, help='proximity, or the number of ranked results')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        manifest = build_shards(DOCUMENT_PATH, args.shards, args.workers)
+        print(f"Built {len(manifest['shards'])} shards of {manifest['total_docs']} documents")
+        return
+    with ShardCoordinator() as coordinator:
+        if args.mode == RANKED:
+            for doc_id, score in coordinator.ranked(args.query, args.k or vector_spacing.TOP_K):
+                print(f"Document ID: {coordinator.table.name(doc_id)}, Score: {score}")
+            return
+        if args.mode == PROXIMITY:
+            result = coordinator.proximity(args.query, args.k or DEFAULT_PROXIMITY)
+        else:
+            result = getattr(coordinator, args.mode.replace('-', '_'))(args.query)
+        for name in coordinator.names(result):
+            print(name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import heapq
+import os
+import shutil
+import tempfile
+from array import array
+from assignment1.index_store import IndexWriter, open_binary_index, iter_encoded_postings, remove_binary_index, \
+    to_bytes, transcode_postings, KIND_DOCUMENTS, KIND_POSITIONAL, DOC_ID_TYPE, DEFAULT_CODEC
+from assignment1.question1 import preprocess, list_documents, read_document_as_string, INVERTED_INDEX_PATH, \
+    DOCUMENT_PATH
+from assignment1.instrumentation import instrumented
+from assignment1.document_table import save_document_table
+
+# Constants
+MEMORY_BUDGET = 64 * 2 ** 20
+# Approximate memory held per term (dict slot, key string, arrays) and per posting or position entry
+TERM_COST = 300
+ENTRY_COST = 4
+RUN_SUFFIX = '.run'
+
+
+def iter_documents(files: list, preprocessor=preprocess):
+    """Yields the preprocessed documents one at a time"""
+    for file in files:
+        yield preprocessor(read_document_as_string(file))
+
+
+class SpimiIndexer:
+    """Single-pass in-memory indexer that flushes sorted runs to disk when the memory budget is reached
+
+    Each run covers a consecutive range of doc-ids, so merging the runs only concatenates postings.
+    Runs are written raw, postings are compressed with the codec when the final index is written.
+    """
+
+    def __init__(self, path: str, kind: int = KIND_DOCUMENTS, memory_budget: int = MEMORY_BUDGET,
+                 run_dir: str = None, codec: int = DEFAULT_CODEC):
+        self.path = path
+        self.kind = kind
+        self.codec = codec
+        self.memory_budget = memory_budget
+        self.run_dir = run_dir
+        # A temporary run directory is removed with the runs, a given one is only emptied
+        self.owns_run_dir = run_dir is None
+        self.runs = []
+        self.block = {}
+        self.block_entries = 0
+        self.num_documents = 0
+
+    def block_size(self) -> int:
+        """Estimates the memory held by the current block"""
+        return len(self.block) * TERM_COST + self.block_entries * ENTRY_COST
+
+    def add_document(self, doc_id: int, terms: list):
+        """Adds the terms of the document, doc-ids must be added in increasing order"""
+        block = self.block
+        if self.kind == KIND_DOCUMENTS:
+            for term in terms:
+                postings = block.get(term)
+                if postings is None:
+                    block[term] = array(DOC_ID_TYPE, [doc_id])
+                    self.block_entries += 1
+                elif postings[-1] != doc_id:
+                    postings.append(doc_id)
+                    self.block_entries += 1
+        else:
+            for position, term in enumerate(terms):
+                postings = block.get(term)
+                if postings is None:
+                    block[term] = (array(DOC_ID_TYPE, [doc_id]), array(DOC_ID_TYPE, [1]), array(DOC_ID_TYPE, [position]))
+                    self.block_entries += 3
+                    continue
+                doc_ids, counts, positions = postings
+                if doc_ids[-1] != doc_id:
+                    doc_ids.append(doc_id)
+                    counts.append(1)
+                    self.block_entries += 2
+                else:
+                    counts[-1] += 1
+                positions.append(position)
+                self.block_entries += 1
+        self.num_documents = doc_id + 1
+
+        if self.block_size() >= self.memory_budget:
+            self.flush()
+
+    def flush(self):
+        """Writes the current block as a sorted run"""
+        if not self.block:
+            return
+        if self.run_dir is None:
+            self.run_dir = tempfile.mkdtemp(prefix=os.path.basename(self.path) + RUN_SUFFIX)
+        run_path = os.path.join(self.run_dir, str(len(self.runs)) + RUN_SUFFIX)
+        # Recorded before writing so that a partly written run is removed too
+        self.runs.append(run_path)
+        with IndexWriter(run_path, self.kind) as writer:
+            for term in sorted(self.block):
+                postings = self.block[term]
+                if self.kind == KIND_DOCUMENTS:
+                    writer.add_encoded(term, to_bytes(postings), len(postings), postings[-1])
+                else:
+                    doc_ids, counts, positions = postings
+                    data = to_bytes(doc_ids) + to_bytes(counts) + to_bytes(positions)
+                    writer.add_encoded(term, data, len(doc_ids), doc_ids[-1])
+        self.block = {}
+        self.block_entries = 0
+
+    @staticmethod
+    def iter_run(run: int, run_path: str):
+        """Streams the postings of a run, tagged with the run number so equal terms merge in run order"""
+        for term, doc_freq, data in iter_encoded_postings(run_path):
+            yield term, run, doc_freq, data
+
+    def merge_postings(self, parts: list) -> bytes:
+        """Concatenates the encoded postings of one term from consecutive runs"""
+        if self.kind == KIND_DOCUMENTS:
+            return b''.join(data for _, data in parts)
+        doc_ids, counts, positions = [], [], []
+        for doc_freq, data in parts:
+            doc_ids.append(data[:4 * doc_freq])
+            counts.append(data[4 * doc_freq:8 * doc_freq])
+            positions.append(data[8 * doc_freq:])
+        return b''.join(doc_ids) + b''.join(counts) + b''.join(positions)
+
+    def write_term(self, writer: IndexWriter, term: str, parts: list):
+        """Writes the merged postings of one term in the codec of the final index"""
+        doc_freq = sum(df for df, _ in parts)
+        writer.add_encoded(term, transcode_postings(self.merge_postings(parts), doc_freq, self.kind, self.codec),
+                           doc_freq, -1)
+
+    def finish(self, num_documents: int = None):
+        """Flushes the last block and k-way merges the runs into the final index
+
+        num_documents defaults to the last added doc-id + 1, the runs are removed even when merging fails.
+        """
+        try:
+            self.flush()
+            streams = [self.iter_run(run, run_path) for run, run_path in enumerate(self.runs)]
+            num_documents = self.num_documents if num_documents is None else num_documents
+            with IndexWriter(self.path, self.kind, num_documents, self.codec) as writer:
+                current_term, parts = None, []
+                for term, _, doc_freq, data in heapq.merge(*streams):
+                    if term != current_term and parts:
+                        self.write_term(writer, current_term, parts)
+                        parts = []
+                    current_term = term
+                    parts.append((doc_freq, data))
+                if parts:
+                    self.write_term(writer, current_term, parts)
+        finally:
+            self.remove_runs()
+
+    def remove_runs(self):
+        """Deletes the runs written so far, with the run directory when the indexer created it"""
+        for run_path in self.runs:
+            remove_binary_index(run_path)
+        self.runs = []
+        if self.run_dir is not None and os.path.isdir(self.run_dir):
+            if self.owns_run_dir:
+                shutil.rmtree(self.run_dir, ignore_errors=True)
+                self.run_dir = None
+            elif not os.listdir(self.run_dir):
+                os.rmdir(self.run_dir)
+
+
+@instrumented('build.spimi')
+def build_index_streaming(dir_path: str, path: str, kind: int = KIND_DOCUMENTS, term_extractor=None,
+                          preprocessor=preprocess, memory_budget: int = MEMORY_BUDGET, codec: int = DEFAULT_CODEC):
+    """Streams the documents through a SPIMI indexer and opens the merged binary index"""
+    files = list_documents(dir_path)
+    indexer = SpimiIndexer(path, kind, memory_budget, codec=codec)
+    try:
+        for doc_id, document in enumerate(iter_documents(files, preprocessor)):
+            indexer.add_document(doc_id, term_extractor(document) if term_extractor else document)
+        indexer.finish(len(files))
+    finally:
+        # Runs flushed before a failure are not left in the temporary directory
+        indexer.remove_runs()
+    save_document_table(files, path)
+    return open_binary_index(path)
+
+
+def main():
+    """Builds the inverted, positional and bi-word indexes with bounded memory"""
+    from assignment1.question2a import index_bi_words_streaming
+    from assignment1.question2b import POSITIONAL_INDEX_PATH
+
+    build_index_streaming(DOCUMENT_PATH, INVERTED_INDEX_PATH).close()
+    build_index_streaming(DOCUMENT_PATH, POSITIONAL_INDEX_PATH, KIND_POSITIONAL).close()
+    index_bi_words_streaming().close()
+
+
+if __name__ == '__main__':
+    main()
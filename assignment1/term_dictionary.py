@@ -0,0 +1,288 @@
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+from assignment1.question1 import split_query, is_query_word, query_term, index_documents, search, \
+    get_documents_from_index, OR, SPACE, DOCUMENT_PATH, INPUT_MESSAGE, QUERY_SUCCESS_MESSAGE, QUERY_FAILURE_MESSAGE
+from assignment1.boolean_query import intersect, document_frequency, LEFT_PARENTHESIS, RIGHT_PARENTHESIS
+from assignment1.instrumentation import instrumented, count
+
+# Constants
+K_GRAM = 3
+BOUNDARY = '$'
+WILDCARD = '*'
+MAX_EDIT_DISTANCE = 2
+# k-grams a correction candidate needs among the shorter arrays, the longer ones are only probed
+SCANNED_HITS = 2
+CORRECTION_CACHE_SIZE = 2 ** 14
+TERM_ID_TYPE = 'I'
+EMPTY_POSTINGS = array(TERM_ID_TYPE)
+# Smallest code point above every term, closes the id range of a prefix
+MAX_CHARACTER = chr(sys.maxunicode)
+
+
+def k_grams(term: str, k: int = K_GRAM) -> set:
+    """Returns the distinct k-grams of the term padded with k - 1 boundary markers on each side"""
+    padded = BOUNDARY * (k - 1) + term + BOUNDARY * (k - 1)
+    return {padded[i:i + k] for i in range(len(padded) - k + 1)}
+
+
+def pattern_k_grams(pattern: str, k: int = K_GRAM) -> set:
+    """Returns the k-grams every match of the wildcard pattern contains"""
+    grams = set()
+    for piece in (BOUNDARY * (k - 1) + pattern + BOUNDARY * (k - 1)).split(WILDCARD):
+        grams.update(piece[i:i + k] for i in range(len(piece) - k + 1))
+    return grams
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Returns the Levenshtein distance of the strings, limit + 1 as soon as it is known to exceed limit"""
+    exceeded = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return exceeded
+    # Common prefixes and suffixes do not change the distance
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if not a or not b:
+        return min(len(a) + len(b), exceeded)
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        # Only the cells within limit of the diagonal can end within limit
+        current = [i if i <= limit else exceeded] + [exceeded] * len(b)
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            value = min(previous[j - 1] + (char_a != b[j - 1]), previous[j] + 1, current[j - 1] + 1)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return exceeded
+        previous = current
+    return min(previous[-1], exceeded)
+
+
+def contains(postings, term_id: int) -> bool:
+    i = bisect_left(postings, term_id)
+    return i < len(postings) and postings[i] == term_id
+
+
+class TermDictionary:
+    """Vocabulary of an index with a character k-gram index, for wildcard expansion and spelling correction
+
+    Term ids are the ranks of the terms in the sorted vocabulary, so the terms sharing a
+    prefix are a range of ids. The ids of the terms containing a k-gram are stored by term
+    length in sorted arrays: wildcards intersect the arrays of the k-grams of the pattern,
+    and corrections only read the arrays of the lengths within the edit distance.
+    """
+
+    def __init__(self, frequencies: dict, k: int = K_GRAM, cache_size: int = CORRECTION_CACHE_SIZE):
+        self.k = k
+        self.terms = tuple(sys.intern(term) for term in sorted(frequencies))
+        self.frequencies = array(TERM_ID_TYPE, (frequencies[term] for term in self.terms))
+        self.grams = {}
+        for term_id, term in enumerate(self.terms):
+            length = len(term)
+            for gram in k_grams(term, k):
+                by_length = self.grams.get(gram)
+                if by_length is None:
+                    by_length = self.grams[gram] = {}
+                postings = by_length.get(length)
+                if postings is None:
+                    postings = by_length[length] = array(TERM_ID_TYPE)
+                postings.append(term_id)
+        # Misspellings repeat across queries like the words they misspell
+        self.cached_corrections = lru_cache(maxsize=cache_size)(self.corrections)
+
+    @classmethod
+    def from_index(cls, index, k: int = K_GRAM) -> 'TermDictionary':
+        """Builds the dictionary of the terms of an index, with their document frequencies"""
+        return cls({term: document_frequency(index, term) for term in index}, k)
+
+    def term_id(self, term: str) -> int:
+        i = bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else -1
+
+    def prefix_range(self, prefix: str) -> tuple:
+        """Returns the range of the ids of the terms starting with the prefix"""
+        return bisect_left(self.terms, prefix), bisect_left(self.terms, prefix + MAX_CHARACTER)
+
+    def rank(self, term_ids) -> list:
+        """Returns the terms, the most frequent first, then alphabetically"""
+        frequencies = self.frequencies
+        term_ids = sorted(term_ids, key=lambda term_id: (-frequencies[term_id], term_id))
+        return [self.terms[term_id] for term_id in term_ids]
+
+    @instrumented('dictionary.wildcard')
+    def expand(self, pattern: str, limit: int = None) -> list:
+        """Returns the terms matching the wildcard pattern, where * matches any characters, the most frequent first
+
+        Candidates are the terms of the prefix range containing every k-gram of the pattern,
+        or the whole prefix range when it is smaller than the rarest k-gram. They are checked
+        against the pattern since k-grams lose their order.
+        """
+        if WILDCARD not in pattern:
+            return [pattern] if pattern in self else []
+        pieces = pattern.split(WILDCARD)
+        start, end = self.prefix_range(pieces[0])
+        by_gram = sorted((self.grams.get(gram, {}) for gram in pattern_k_grams(pattern, self.k)),
+                         key=lambda by_length: sum(map(len, by_length.values())))
+        if by_gram and sum(map(len, by_gram[0].values())) < end - start:
+            min_length = sum(map(len, pieces))
+            candidates = []
+            for length, postings in by_gram[0].items():
+                if length < min_length:
+                    continue
+                for by_length in by_gram[1:]:
+                    if not postings:
+                        break
+                    postings = intersect(postings, by_length.get(length, EMPTY_POSTINGS))
+                candidates.extend(term_id for term_id in postings if start <= term_id < end)
+        else:
+            # The prefix range is the smaller candidate set, patterns like *a* scan the whole vocabulary
+            candidates = range(start, end)
+        count('dictionary.wildcard_candidates', len(candidates))
+        matcher = re.compile('.*'.join(map(re.escape, pieces)), re.DOTALL)
+        terms = self.terms
+        matches = self.rank(term_id for term_id in candidates if matcher.fullmatch(terms[term_id]))
+        return matches[:limit] if limit is not None else matches
+
+    @instrumented('dictionary.correct')
+    def corrections(self, word: str, max_distance: int = MAX_EDIT_DISTANCE) -> tuple:
+        """Returns the terms at the smallest edit distance from the word, up to max_distance, the most frequent first
+
+        An edit changes at most k k-grams, so a term within edit distance d has all but k * d
+        of the k-grams of the word. For each term length within d, the arrays of the k-grams
+        of the word are counted, except the longest ones, which are probed by binary search
+        for the terms counted at least twice. The terms with enough k-grams are checked by
+        edit distance. Distances are tried from 1 up, the distance is bounded so that a term
+        needs at least one k-gram of the word.
+        """
+        if word in self:
+            return (word,)
+        grams = k_grams(word, self.k)
+        max_distance = min(max_distance, (len(grams) - 1) // self.k)
+        by_gram = [self.grams.get(gram, {}) for gram in grams]
+        terms = self.terms
+        for distance in range(1, max_distance + 1):
+            threshold = len(grams) - self.k * distance
+            skipped = max(threshold - SCANNED_HITS, 0)
+            matches = []
+            for length in range(max(len(word) - distance, 1), len(word) + distance + 1):
+                postings = sorted((by_length.get(length, EMPTY_POSTINGS) for by_length in by_gram), key=len)
+                long_postings = postings[len(postings) - skipped:] if skipped else []
+                hits = Counter()
+                for term_postings in postings[:len(postings) - skipped]:
+                    hits.update(term_postings)
+                count('dictionary.correction_candidates', len(hits))
+                for term_id, term_hits in hits.items():
+                    if term_hits + skipped < threshold:
+                        continue
+                    term_hits += sum(contains(term_postings, term_id) for term_postings in long_postings)
+                    if term_hits >= threshold and edit_distance(word, terms[term_id], distance) <= distance:
+                        matches.append(term_id)
+            if matches:
+                return tuple(self.rank(matches))
+        return ()
+
+    def correct(self, word: str, max_distance: int = MAX_EDIT_DISTANCE):
+        """Returns the most frequent closest term to the word, None when none is within max_distance"""
+        corrections = self.cached_corrections(word, max_distance)
+        return corrections[0] if corrections else None
+
+    def frequency(self, term: str) -> int:
+        term_id = self.term_id(term)
+        return self.frequencies[term_id] if term_id >= 0 else 0
+
+    def __contains__(self, term) -> bool:
+        return self.term_id(term) >= 0
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+
+# Query Rewriting Functions
+def resolve_term(term: str, dictionary: TermDictionary) -> str:
+    """Returns the term, or its correction when it is not in the vocabulary and one exists"""
+    if term in dictionary:
+        return term
+    correction = dictionary.correct(term)
+    return correction if correction is not None else term
+
+
+def rewrite_boolean_query(query: str, dictionary: TermDictionary, correct: bool = True, limit: int = None) -> list:
+    """question1.preprocess_query with wildcards expanded and, when correct, misspelled words corrected
+
+    A word with * becomes the OR of the vocabulary terms it matches, matched without
+    preprocessing since preprocessing drops the *. The other words are preprocessed and
+    replaced by their closest term when they are not in the vocabulary.
+    """
+    tokens = []
+    for word in split_query(query):
+        if not is_query_word(word):
+            tokens.append(word)
+        elif WILDCARD in word:
+            pattern = word.lower()
+            tokens.append(LEFT_PARENTHESIS)
+            for i, term in enumerate(dictionary.expand(pattern, limit) or [pattern]):
+                if i:
+                    tokens.append(OR)
+                tokens.append(term)
+            tokens.append(RIGHT_PARENTHESIS)
+        else:
+            term = query_term(word)
+            tokens.append(resolve_term(term, dictionary) if correct else term)
+    return tokens
+
+
+def correct_terms(terms: list, dictionary: TermDictionary) -> list:
+    """Replaces the terms that are not in the vocabulary by their closest term, for phrase queries"""
+    return [resolve_term(term, dictionary) for term in terms]
+
+
+def rewrite_ranked_query(query: str, dictionary: TermDictionary, preprocessor, correct: bool = True,
+                         limit: int = None) -> list:
+    """Returns the query tokens of the vector space model with wildcards expanded and misspelled words corrected
+
+    Every term matching a wildcard is a query token, so the matches all add to the query vector.
+    """
+    tokens = []
+    for word in query.split():
+        if WILDCARD in word:
+            tokens.extend(dictionary.expand(word.lower(), limit))
+        elif correct:
+            tokens.extend(resolve_term(token, dictionary) for token in preprocessor(word))
+        else:
+            tokens.extend(preprocessor(word))
+    return tokens
+
+
+def main():
+    """Boolean queries with wildcards and spelling correction, the dictionary is built once"""
+    inverted_index = index_documents()
+    dictionary = TermDictionary.from_index(inverted_index)
+    while True:
+        try:
+            terms = rewrite_boolean_query(input(INPUT_MESSAGE), dictionary)
+            print(f"Searching: {SPACE.join(terms)}")
+            result = search(terms, inverted_index)
+        except ValueError as error:
+            print(error)
+            continue
+        if not result:
+            print(QUERY_FAILURE_MESSAGE)
+        else:
+            print(QUERY_SUCCESS_MESSAGE)
+            get_documents_from_index(result, DOCUMENT_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+import random
+import sys
+import time
+from assignment2.vector_spacing import get_index, create_query_vector, score_term_at_a_time, score_max_score, \
+    score_tiered, TieredIndex, TOP_K
+from assignment2.impact_index import ImpactIndex, compare_rankings
+
+# Constants
+QUERY_LENGTHS = (2, 4, 8, 16)
+QUERIES_PER_LENGTH = 50
+SEED = 42
+# Tier layouts from fastest to most exhaustive, the recall / latency knob of the tiered index
+TIER_SIZES_SWEEP = ((10,), (25,), (50,), (100,), (25, 100))
+# Postings budgets of the impact-ordered index, from unlimited to tight, the recall knob of anytime ranking
+POSTINGS_BUDGETS = (None, 10000, 1000, 100)
+
+def generate_queries(index, length, count, rng) -> list:
+    # Long multi-term queries mixing rare and common terms, terms are drawn proportionally to their df
+    vocabulary = sorted(index.inverted_index)
+    doc_freqs = [index.doc_freqs[term] for term in vocabulary]
+    return [rng.choices(vocabulary, doc_freqs, k=length) for _ in range(count)]
+
+def time_engine(engine, query_vectors) -> tuple:
+    start = time.perf_counter()
+    results = [engine(query_vector) for query_vector in query_vectors]
+    return time.perf_counter() - start, results
+
+def benchmark(index, lengths=QUERY_LENGTHS, count=QUERIES_PER_LENGTH, k=TOP_K, seed=SEED) -> list:
+    rng = random.Random(seed)
+    report = []
+    for length in lengths:
+        query_vectors = [create_query_vector(tokens, index.inverted_index, index.total_docs, index.idf)
+                         for tokens in generate_queries(index, length, count, rng)]
+
+        exhaustive_time, _ = time_engine(
+            lambda vector: score_term_at_a_time(vector, index.inverted_index, index.doc_lengths, k), query_vectors)
+        pruned_time, _ = time_engine(
+            lambda vector: score_max_score(vector, index.inverted_index, index.doc_lengths, index.max_weights, k),
+            query_vectors)
+
+        report.append({
+            'query_length': length,
+            'queries': len(query_vectors),
+            'exhaustive_ms': 1000 * exhaustive_time / len(query_vectors),
+            'max_score_ms': 1000 * pruned_time / len(query_vectors),
+            'speedup': exhaustive_time / pruned_time if pruned_time > 0 else float('inf'),
+        })
+    return report
+
+def overlap(results, reference) -> float:
+    # Fraction of the exhaustive top k that the approximate ranking also returns
+    if not reference:
+        return 1.0
+    return len({doc_id for doc_id, _ in results} & {doc_id for doc_id, _ in reference}) / len(reference)
+
+def benchmark_tiers(index, tier_sizes_sweep=TIER_SIZES_SWEEP, lengths=QUERY_LENGTHS, count=QUERIES_PER_LENGTH,
+                    k=TOP_K, seed=SEED) -> list:
+    rng = random.Random(seed)
+    tiered_indexes = [TieredIndex(index, tier_sizes) for tier_sizes in tier_sizes_sweep]
+    report = []
+    for length in lengths:
+        query_vectors = [create_query_vector(tokens, index.inverted_index, index.total_docs, index.idf)
+                         for tokens in generate_queries(index, length, count, rng)]
+        exhaustive_time, exhaustive = time_engine(
+            lambda vector: score_term_at_a_time(vector, index.inverted_index, index.doc_lengths, k), query_vectors)
+        for tiered in tiered_indexes:
+            tiered_time, results = time_engine(
+                lambda vector: score_tiered(vector, index.inverted_index, index.doc_lengths, tiered.ordered,
+                                            tiered.bounds, k), query_vectors)
+            report.append({
+                'query_length': length,
+                'tier_sizes': list(tiered.tier_sizes),
+                'queries': len(query_vectors),
+                'exhaustive_ms': 1000 * exhaustive_time / len(query_vectors),
+                'tiered_ms': 1000 * tiered_time / len(query_vectors),
+                'speedup': exhaustive_time / tiered_time if tiered_time > 0 else float('inf'),
+                'overlap': sum(map(overlap, results, exhaustive)) / len(query_vectors),
+                'identical': sum(a == b for a, b in zip(results, exhaustive)) / len(query_vectors),
+            })
+    return report
+
+def benchmark_impact(index, budgets=POSTINGS_BUDGETS, lengths=QUERY_LENGTHS, count=QUERIES_PER_LENGTH, k=TOP_K,
+                     seed=SEED) -> list:
+    # Overlap of the budgeted score-at-a-time rankings with the exhaustive top k
+    rng = random.Random(seed)
+    impact_index = ImpactIndex(index)
+    report = []
+    for length in lengths:
+        token_lists = generate_queries(index, length, count, rng)
+        for max_postings in budgets:
+            comparison = compare_rankings(index, impact_index, token_lists, k, max_postings=max_postings)
+            report.append({'query_length': length, 'max_postings': max_postings, **comparison})
+    return report
+
+def main() -> None:
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else TOP_K
+    index = get_index()
+    print(f"{'terms':>5} {'queries':>7} {'exhaustive ms':>14} {'MaxScore ms':>12} {'speedup':>8}")
+    for row in benchmark(index, k=k):
+        print(f"{row['query_length']:>5} {row['queries']:>7} {row['exhaustive_ms']:>14.3f} "
+              f"{row['max_score_ms']:>12.3f} {row['speedup']:>7.2f}x")
+    print()
+    print(f"{'terms':>5} {'tiers':>10} {'exhaustive ms':>14} {'tiered ms':>10} {'speedup':>8} "
+          f"{f'overlap@{k}':>10} {'identical':>9}")
+    for row in benchmark_tiers(index, k=k):
+        tiers = '/'.join(map(str, row['tier_sizes']))
+        print(f"{row['query_length']:>5} {tiers:>10} {row['exhaustive_ms']:>14.3f} {row['tiered_ms']:>10.3f} "
+              f"{row['speedup']:>7.2f}x {row['overlap']:>10.3f} {row['identical']:>9.3f}")
+    print()
+    print(f"{'terms':>5} {'postings':>10} {f'overlap@{k}':>10} {'stopped early':>13}")
+    for row in benchmark_impact(index, k=k):
+        budget = 'all' if row['max_postings'] is None else row['max_postings']
+        stopped = f"{row['terminated_early']}/{row['queries']}"
+        print(f"{row['query_length']:>5} {budget:>10} {row['overlap']:>10.3f} {stopped:>13}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import heapq
+import math
+import time
+from array import array
+from assignment2.vector_spacing import get_index, preprocess, create_query_vector, score_term_at_a_time, rank_key, \
+    TOP_K, DOC_ID_TYPE
+
+# Constants
+IMPACT_BITS = 8
+# Postings scored between two checks of the deadline and the postings budget
+CHECK_INTERVAL = 1024
+
+# Impact-ordered index for anytime ranking
+def quantize(weight, max_weight, max_impact) -> int:
+    # Uniform quantization of (0, max_weight] into 1..max_impact, every posting keeps a non-zero impact
+    return max(1, math.ceil(weight / max_weight * max_impact))
+
+def score_at_a_time(query_vector, segments, scale, k=TOP_K, deadline=None, max_postings=None) -> dict:
+    # Segments of every query term are scored by decreasing query weight x impact, so the postings that
+    # add the most to the scores come first and stopping at the deadline or budget keeps the best
+    # ranking found so far. Budgets are checked every CHECK_INTERVAL postings.
+    ordered = sorted(((weight * impact, doc_ids) for term, weight in query_vector.items() if weight > 0
+                      for impact, doc_ids in segments[term]), key=lambda segment: -segment[0])
+    accumulators = {}
+    scored = 0
+    terminated_early = False
+    for contribution, doc_ids in ordered:
+        for start in range(0, len(doc_ids), CHECK_INTERVAL):
+            if (deadline is not None and time.perf_counter() >= deadline) or \
+                    (max_postings is not None and scored >= max_postings):
+                terminated_early = True
+                break
+            chunk = doc_ids[start:start + CHECK_INTERVAL]
+            if max_postings is not None:
+                chunk = chunk[:max_postings - scored]
+            for doc_id in chunk:
+                accumulators[doc_id] = accumulators.get(doc_id, 0) + contribution
+            scored += len(chunk)
+        if terminated_early:
+            break
+
+    results = heapq.nsmallest(k, ((doc_id, score * scale) for doc_id, score in accumulators.items()), key=rank_key)
+    return {'results': results, 'terminated_early': terminated_early, 'postings_scored': scored,
+            'postings_total': sum(len(doc_ids) for _, doc_ids in ordered)}
+
+class ImpactIndex:
+    """Normalized document weights quantized to integer impacts, the postings of each term in impact-descending segments
+
+    The normalized weight of a posting is its doc_vectors weight, the tf weight divided by the
+    document length. Scores are the sums of query weight x impact scaled back to cosine units,
+    they approximate the exact scores within the quantization step.
+    """
+
+    def __init__(self, index, bits=IMPACT_BITS):
+        self.index = index
+        self.max_impact = 2 ** bits - 1
+        self.build()
+
+    def build(self) -> None:
+        index = self.index
+        max_weight = max(index.max_weights.values(), default=1.0)
+        self.scale = max_weight / self.max_impact
+        self.segments = {}
+        for term, postings in index.inverted_index.items():
+            by_impact = {}
+            for doc_id, tf_weight in postings.items():
+                impact = quantize(tf_weight / index.doc_lengths[doc_id], max_weight, self.max_impact)
+                by_impact.setdefault(impact, []).append(doc_id)
+            self.segments[term] = [(impact, array(DOC_ID_TYPE, sorted(doc_ids)))
+                                   for impact, doc_ids in sorted(by_impact.items(), reverse=True)]
+        self.source_version = index.version
+
+    def process_query_tokens(self, query_tokens, k=TOP_K, budget_ms=None, max_postings=None) -> dict:
+        # The deadline is budget_ms after the call, the results report whether scoring stopped before the end
+        deadline = time.perf_counter() + budget_ms / 1000 if budget_ms is not None else None
+        if self.source_version != self.index.version:
+            # The index was updated since its impacts were computed
+            self.build()
+        index = self.index
+        query_vector = create_query_vector(query_tokens, index.inverted_index, index.total_docs, index.idf)
+        return score_at_a_time(query_vector, self.segments, self.scale, k, deadline, max_postings)
+
+    def process_query(self, query, k=TOP_K, budget_ms=None, max_postings=None) -> dict:
+        return self.process_query_tokens(preprocess(query), k, budget_ms, max_postings)
+
+def compare_rankings(index, impact_index, token_lists, k=TOP_K, budget_ms=None, max_postings=None) -> dict:
+    # Overlap of the budgeted impact rankings with the exhaustive top k, and how often the budget stopped scoring
+    overlap = 0.0
+    terminated_early = 0
+    for tokens in token_lists:
+        query_vector = create_query_vector(tokens, index.inverted_index, index.total_docs, index.idf)
+        exhaustive = {doc_id for doc_id, _ in score_term_at_a_time(query_vector, index.inverted_index,
+                                                                   index.doc_lengths, k)}
+        response = impact_index.process_query_tokens(tokens, k, budget_ms, max_postings)
+        found = {doc_id for doc_id, _ in response['results']}
+        overlap += len(found & exhaustive) / len(exhaustive) if exhaustive else 1.0
+        terminated_early += response['terminated_early']
+    return {'queries': len(token_lists), 'overlap': overlap / len(token_lists) if token_lists else 1.0,
+            'terminated_early': terminated_early}
+
+def main() -> None:
+    # Run from the repository root: python -m assignment2.impact_index [--budget-ms MS] [--max-postings N]
+    parser = argparse.ArgumentParser(description='Ranks the documents score-at-a-time on quantized impacts')
+    parser.add_argument('--budget-ms', type=float, help='time budget of the query, unlimited by default')
+    parser.add_argument('--max-postings', type=int, help='postings budget of the query, unlimited by default')
+    parser.add_argument('--k', type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    index = get_index()
+    impact_index = ImpactIndex(index)
+    query = input("Enter your query: ")
+    response = impact_index.process_query(query, args.k, args.budget_ms, args.max_postings)
+
+    print(f"Top {args.k} relevant documents for your query:")
+    for doc_id, score in response['results']:
+        print(f"Document ID: {index.doc_ids[doc_id]}, Score: {score}")
+    if response['terminated_early']:
+        print(f"Stopped at the budget after {response['postings_scored']} of "
+              f"{response['postings_total']} postings")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import time
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError as error:
+    raise ImportError('the sparse matrix backend needs numpy and scipy: '
+                      'pip install -r requirements-sparse.txt') from error
+from assignment2.vector_spacing import get_index, preprocess, create_query_vector, score_term_at_a_time, TOP_K
+
+# Constants
+SCORE_TOLERANCE = 1e-9
+BATCH_SIZE = 1024
+
+# CSR term-document matrix backend for scoring many queries at once
+class SparseMatrixIndex:
+    """Normalized document vectors as a CSR term-document matrix over a fixed vocabulary"""
+
+    def __init__(self, index):
+        self.index = index
+        self.vocabulary = sorted(index.inverted_index)
+        self.term_ids = {term: i for i, term in enumerate(self.vocabulary)}
+        self.column_doc_ids = np.array(sorted(index.doc_lengths), dtype=np.int64)
+        columns = {doc_id: j for j, doc_id in enumerate(self.column_doc_ids.tolist())}
+
+        rows, cols, weights = [], [], []
+        for term, postings in index.inverted_index.items():
+            term_id = self.term_ids[term]
+            for doc_id, tf_weight in postings.items():
+                rows.append(term_id)
+                cols.append(columns[doc_id])
+                weights.append(tf_weight / index.doc_lengths[doc_id])
+        self.matrix = sparse.csr_matrix((weights, (rows, cols)),
+                                        shape=(len(self.vocabulary), len(self.column_doc_ids)), dtype=np.float64)
+
+    def query_matrix(self, token_lists) -> sparse.csr_matrix:
+        # One row per query, weighted and normalized exactly like the dict engine
+        rows, cols, weights = [], [], []
+        for row, tokens in enumerate(token_lists):
+            query_vector = create_query_vector(tokens, self.index.inverted_index, self.index.total_docs,
+                                               self.index.idf)
+            for term, weight in query_vector.items():
+                rows.append(row)
+                cols.append(self.term_ids[term])
+                weights.append(weight)
+        return sparse.csr_matrix((weights, (rows, cols)), shape=(len(token_lists), len(self.vocabulary)),
+                                 dtype=np.float64)
+
+    def top_k(self, doc_columns, scores, k=TOP_K) -> list:
+        # argpartition selects the k best scores, boundary ties are kept and ordered like the dict engine
+        positive = scores > 0
+        doc_columns, scores = doc_columns[positive], scores[positive]
+        if len(scores) > k:
+            kth_score = scores[np.argpartition(-scores, k - 1)[k - 1]]
+            selected = scores >= kth_score
+            doc_columns, scores = doc_columns[selected], scores[selected]
+        doc_ids = self.column_doc_ids[doc_columns]
+        order = np.lexsort((doc_ids, -scores))[:k]
+        return [(int(doc_ids[i]), float(scores[i])) for i in order]
+
+    def score_token_batch(self, token_lists, k=TOP_K) -> list:
+        results = []
+        for start in range(0, len(token_lists), BATCH_SIZE):
+            batch = token_lists[start:start + BATCH_SIZE]
+            scores = (self.query_matrix(batch) @ self.matrix).tocsr()
+            for row in range(len(batch)):
+                row_start, row_end = scores.indptr[row], scores.indptr[row + 1]
+                results.append(self.top_k(scores.indices[row_start:row_end], scores.data[row_start:row_end], k))
+        return results
+
+    def score_batch(self, queries, k=TOP_K) -> list:
+        return self.score_token_batch([preprocess(query) for query in queries], k)
+
+def results_match(expected, actual, tolerance=SCORE_TOLERANCE) -> bool:
+    # Rankings agree up to float tolerance, documents with near-equal scores may swap places
+    if len(expected) != len(actual):
+        return False
+    for (expected_doc, expected_score), (actual_doc, actual_score) in zip(expected, actual):
+        if abs(expected_score - actual_score) > tolerance:
+            return False
+    expected_docs = {doc_id for doc_id, _ in expected}
+    return all(doc_id in expected_docs or abs(score - expected[-1][1]) <= tolerance for doc_id, score in actual)
+
+def compare_throughput(index, token_lists, k=TOP_K) -> dict:
+    start = time.perf_counter()
+    dict_results = [score_term_at_a_time(create_query_vector(tokens, index.inverted_index, index.total_docs,
+                                                             index.idf), index.inverted_index, index.doc_lengths, k)
+                    for tokens in token_lists]
+    dict_time = time.perf_counter() - start
+
+    matrix_index = SparseMatrixIndex(index)
+    start = time.perf_counter()
+    matrix_results = matrix_index.score_token_batch(token_lists, k)
+    matrix_time = time.perf_counter() - start
+
+    mismatches = sum(not results_match(expected, actual) for expected, actual in zip(dict_results, matrix_results))
+    return {
+        'queries': len(token_lists),
+        'dict_qps': len(token_lists) / dict_time if dict_time > 0 else float('inf'),
+        'sparse_qps': len(token_lists) / matrix_time if matrix_time > 0 else float('inf'),
+        'mismatches': mismatches,
+    }
+
+def main() -> None:
+    """Run from the repository root: python -m assignment2.sparse_backend queries.txt"""
+    parser = argparse.ArgumentParser(description='Compares the ranked throughput of the dict engine and the '
+                                                 'sparse matrix backend')
+    parser.add_argument('queries', help='file of queries, one per line')
+    parser.add_argument('--k', type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    with open(args.queries, encoding='utf-8') as f:
+        token_lists = [preprocess(line) for line in f if line.strip()]
+    report = compare_throughput(get_index(), token_lists, args.k)
+    print(f"{report['queries']} queries: dict engine {report['dict_qps']:.1f} q/s, "
+          f"sparse backend {report['sparse_qps']:.1f} q/s, {report['mismatches']} mismatching rankings")
+
+if __name__ == "__main__":
+    main()
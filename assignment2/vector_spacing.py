@@ -1,21 +1,56 @@
 import os
 import math
+import heapq
+import itertools
+import json
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
+from assignment1.instrumentation import instrumented, traced_query, count, ENABLED as INSTRUMENTED
+from assignment1.document_table import file_hash
+from assignment1.query_cache import Cache, register_cache, LRU
 
 # Constants
 SPACE = ' '
 EMPTY = ''
 READ = 'r'
+WRITE = 'w'
 UTF_8 = 'utf-8'
 CORPUS = 'corpus/'
+VECTOR_INDEX_FILE = 'vector_space_index.json'
+TEMPORARY_EXTENSION = '.tmp'
+TOP_K = 10
+# Format of the saved vector space index, saved indexes of another format are rebuilt
+VECTOR_INDEX_FORMAT = 3
+FORMAT_KEY = 'format'
+WORKERS = 1
+CHUNK_SIZE = 64
+PRUNING_EPSILON = 1e-9
+DOC_ID_TYPE = 'I'
+# Double precision keeps the scores, and so the rankings, identical to the dict index
+WEIGHT_TYPE = 'd'
+QUERY_CACHE_SIZE = 1024
+# Postings per term in the champion lists, the first tier, the next tiers follow in TIER_SIZES
+CHAMPION_LIST_SIZE = 50
+TIER_SIZES = (CHAMPION_LIST_SIZE,)
 
 # Preprocessing Functions
 def case_fold(string: str) -> str:
     return string.lower()
 
+@lru_cache(maxsize=None)
+def get_stop_words() -> frozenset:
+    # Loaded once instead of on every call
+    return frozenset(stopwords.words('english'))
+
 def remove_stopwords(string: str) -> str:
-    stop_words = set(stopwords.words('english'))
+    stop_words = get_stop_words()
     return SPACE.join([word for word in word_tokenize(string) if word not in stop_words])
 
 def remove_punctuation(string: str) -> str:
@@ -27,32 +62,53 @@ def expand_contractions(string: str) -> str:
 def tokenize(string: str) -> list:
     return word_tokenize(string)
 
+@instrumented('vector.preprocess')
 def preprocess(string: str) -> list:
-    string = case_fold(string)
-    string = expand_contractions(string)
-    string = remove_stopwords(string)
-    string = remove_punctuation(string)
-    return tokenize(string)
+    # Stopword and punctuation removal fused into one pass over the first tokenization
+    stop_words = get_stop_words()
+    words = []
+    for word in tokenize(expand_contractions(case_fold(string))):
+        if word in stop_words:
+            continue
+        if not word.isalnum():
+            word = EMPTY.join([char for char in word if char.isalnum()])
+        if word:
+            words.append(word)
+    return tokenize(SPACE.join(words))
 
 # Document Processing Functions
 def read_document_as_tokens(file: str) -> list:
     with open(file, READ, encoding=UTF_8) as f:
         return preprocess(f.read())
 
-def read_documents(directory: str) -> tuple:
+@instrumented('read_dir')
+def read_documents(directory: str, workers: int = WORKERS) -> tuple:
     documents = {}
     doc_ids = {}
 
     for i, file in enumerate(os.listdir(directory)):
         if file.endswith('.txt'):
             doc_ids[i] = file
-            file_path = os.path.join(directory, file)
-            documents[i] = read_document_as_tokens(file_path)
+
+    file_paths = [os.path.join(directory, file) for file in doc_ids.values()]
+    if workers <= 1:
+        token_lists = map(read_document_as_tokens, file_paths)
+    else:
+        # Documents are preprocessed in chunks by a process pool, map keeps the doc-id order
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            token_lists = list(pool.map(read_document_as_tokens, file_paths, chunksize=CHUNK_SIZE))
+    for doc_id, tokens in zip(doc_ids, token_lists):
+        documents[doc_id] = tokens
     return documents, doc_ids
 
 # Inverted Index and Document Length Calculation
-def create_index_with_tf_df_and_lengths() -> tuple:
-    documents, doc_ids = read_documents(CORPUS)
+@instrumented('build.vector')
+def create_index_with_tf_df_and_lengths(directory: str = CORPUS, workers: int = WORKERS) -> tuple:
+    documents, doc_ids = read_documents(directory, workers)
+    return create_index_from_documents(documents, doc_ids)
+
+def create_index_from_documents(documents, doc_ids) -> tuple:
+    # documents maps each doc-id to its preprocessed tokens
     inverted_index = {}
     doc_vectors = {}
     doc_lengths = {}
@@ -91,50 +147,478 @@ def calculate_document_length(doc_vector) -> float:
     return math.sqrt(sum(weight ** 2 for weight in doc_vector.values()))
 
 
+def calculate_max_weights(index, doc_lengths) -> dict:
+    # Largest normalized weight of each term, the per-term score upper bound used for pruning
+    return {term: max(tf_weight / doc_lengths[doc_id] for doc_id, tf_weight in postings.items())
+            for term, postings in index.items()}
+
+
 def calculate_cosine_similarity(query_vector, doc_vector) -> float:
     dot_product = sum(query_vector[term] * doc_vector.get(term, 0) for term in query_vector)
     return dot_product
 
 # Query Processing and Ranked Retrieval
-def process_query(query, index, doc_lengths, doc_vectors, total_docs) -> list:
-    query_tokens = preprocess(query)
-
+@instrumented('ranked.query_vector')
+def create_query_vector(query_tokens, index, total_docs, idf=None) -> dict:
     # Create query vector with tf-idf weighting
     query_vector = {}
-    for term in query_tokens:
+    for term, tf in Counter(query_tokens).items():
         if term in index:
-            df = len(index[term])
-            tf = query_tokens.count(term)
-            query_vector[term] = calculate_tf(tf) * calculate_idf(total_docs, df)
+            term_idf = idf[term] if idf is not None else calculate_idf(total_docs, len(index[term]))
+            query_vector[term] = calculate_tf(tf) * term_idf
 
     # Normalize the query vector
     query_length = calculate_document_length(query_vector)
     if query_length > 0:
         query_vector = {term: weight / query_length for term, weight in query_vector.items()}
-
-    # Compute cosine similarity scores for all documents
-    scores = {}
-    for doc_id, doc_vector in doc_vectors.items():
-        similarity = calculate_cosine_similarity(query_vector, doc_vector)
-        scores[doc_id] = similarity
-
-    ranked_docs = [(doc_id, score) for doc_id, score in scores.items() if score > 0]
-    ranked_docs.sort(key=lambda x: (-x[1], x[0]))
-
-    return ranked_docs[:10]
+    return query_vector
+
+def rank_key(result) -> tuple:
+    return -result[1], result[0]
+
+@instrumented('ranked.score')
+def score_term_at_a_time(query_vector, index, doc_lengths, k=TOP_K) -> list:
+    # Only documents sharing a term with the query get an accumulator
+    accumulators = {}
+    for term, query_weight in query_vector.items():
+        for doc_id, tf_weight in index[term].items():
+            accumulators[doc_id] = accumulators.get(doc_id, 0) + query_weight * (tf_weight / doc_lengths[doc_id])
+    if INSTRUMENTED:
+        count('ranked.postings', sum(len(index[term]) for term in query_vector))
+        count('ranked.documents_scored', len(accumulators))
+
+    # Bounded heap selection of the k best documents
+    return heapq.nsmallest(k, ((doc_id, score) for doc_id, score in accumulators.items() if score > 0), key=rank_key)
+
+def score_document(query_vector, index, doc_lengths, doc_id) -> float:
+    # Same summation order as score_term_at_a_time so that scores are bit-identical
+    score = 0
+    for term, query_weight in query_vector.items():
+        postings = index[term]
+        if doc_id in postings:
+            score = score + query_weight * (postings[doc_id] / doc_lengths[doc_id])
+    return score
+
+@instrumented('ranked.score_max_score')
+def score_max_score(query_vector, index, doc_lengths, max_weights, k=TOP_K) -> list:
+    # Term-at-a-time MaxScore: terms are processed by decreasing score upper bound. Once the bounds
+    # of the remaining terms cannot lift a new document above the current k-th partial score, no new
+    # accumulators are created and the remaining (common) terms only update surviving candidates.
+    terms = sorted((term for term, weight in query_vector.items() if weight > 0),
+                   key=lambda term: query_vector[term] * max_weights[term], reverse=True)
+    remaining_bounds = []
+    total = 0
+    for term in reversed(terms):
+        total += query_vector[term] * max_weights[term]
+        remaining_bounds.append(total)
+    remaining_bounds.reverse()
+
+    accumulators = {}
+    for i, term in enumerate(terms):
+        query_weight = query_vector[term]
+        postings = index[term]
+        threshold = heapq.nlargest(k, accumulators.values())[-1] if len(accumulators) >= k else 0
+        if len(accumulators) < k or remaining_bounds[i] >= threshold - PRUNING_EPSILON:
+            for doc_id, tf_weight in postings.items():
+                accumulators[doc_id] = accumulators.get(doc_id, 0) + query_weight * (tf_weight / doc_lengths[doc_id])
+            continue
+
+        # Candidates that cannot reach the k-th partial score even with every remaining term are dropped
+        accumulators = {doc_id: score for doc_id, score in accumulators.items()
+                        if score + remaining_bounds[i] >= threshold - PRUNING_EPSILON}
+        if len(accumulators) < len(postings):
+            for doc_id in accumulators:
+                if doc_id in postings:
+                    accumulators[doc_id] += query_weight * (postings[doc_id] / doc_lengths[doc_id])
+        else:
+            for doc_id, tf_weight in postings.items():
+                if doc_id in accumulators:
+                    accumulators[doc_id] += query_weight * (tf_weight / doc_lengths[doc_id])
+
+    if INSTRUMENTED:
+        count('ranked.postings', sum(len(index[term]) for term in terms))
+        count('ranked.documents_scored', len(accumulators))
+    if not accumulators:
+        return []
+    # Finalists are rescored in query order so that scores are bit-identical to exhaustive scoring
+    threshold = heapq.nlargest(k, accumulators.values())[-1]
+    finalists = ((doc_id, score_document(query_vector, index, doc_lengths, doc_id))
+                 for doc_id, score in accumulators.items() if score >= threshold - PRUNING_EPSILON)
+    return heapq.nsmallest(k, ((doc_id, score) for doc_id, score in finalists if score > 0), key=rank_key)
+
+def impact_order(postings, doc_lengths) -> array:
+    # Doc-ids by decreasing normalized tf weight, the order of their contributions to the scores
+    return array(DOC_ID_TYPE, [doc_id for doc_id, _ in sorted(
+        postings.items(), key=lambda posting: (-posting[1] / doc_lengths[posting[0]], posting[0]))])
+
+@instrumented('ranked.score_tiered')
+def score_tiered(query_vector, index, doc_lengths, ordered, bounds, k=TOP_K) -> list:
+    # Candidates are gathered tier by tier from the impact-ordered postings, the champion lists first,
+    # and lower tiers are only read while fewer than k candidates are found. Candidates are scored
+    # on the full postings, so their scores are bit-identical to exhaustive scoring, but documents
+    # only found in unread tiers are missed.
+    terms = [term for term, weight in query_vector.items() if weight > 0]
+    candidates = set()
+    start = 0
+    tiers = 0
+    for end in bounds + (None,):
+        tiers += 1
+        for term in terms:
+            candidates.update(ordered[term][start:end])
+        if end is None or len(candidates) >= k or all(len(ordered[term]) <= end for term in terms):
+            break
+        start = end
+    if INSTRUMENTED:
+        count('ranked.tiers', tiers)
+        count('ranked.documents_scored', len(candidates))
+    scores = ((doc_id, score_document(query_vector, index, doc_lengths, doc_id)) for doc_id in candidates)
+    return heapq.nsmallest(k, ((doc_id, score) for doc_id, score in scores if score > 0), key=rank_key)
+
+@traced_query('ranked')
+def process_query(query, index, doc_lengths, doc_vectors, total_docs, idf=None, k=TOP_K, max_weights=None) -> list:
+    return process_query_tokens(preprocess(query), index, doc_lengths, total_docs, idf, k, max_weights)
+
+@traced_query('ranked')
+def process_query_tokens(query_tokens, index, doc_lengths, total_docs, idf=None, k=TOP_K, max_weights=None) -> list:
+    query_vector = create_query_vector(query_tokens, index, total_docs, idf)
+    if max_weights is not None:
+        return score_max_score(query_vector, index, doc_lengths, max_weights, k)
+    return score_term_at_a_time(query_vector, index, doc_lengths, k)
+
+@traced_query('ranked')
+def process_query_tiered(query_tokens, tiered, k=TOP_K) -> list:
+    if tiered.source_version != tiered.index.version:
+        # The index was updated since its tiers were built
+        tiered.build()
+    index = tiered.index
+    query_vector = create_query_vector(query_tokens, index.inverted_index, index.total_docs, index.idf)
+    return score_tiered(query_vector, index.inverted_index, index.doc_lengths, tiered.ordered, tiered.bounds, k)
+
+# Persistent Vector Space Index
+class VectorSpaceIndex:
+    """Tf weights, df/idf, document lengths and normalized vectors, built once and reused across queries"""
+
+    def __init__(self, inverted_index, doc_ids, doc_lengths, doc_vectors):
+        self.inverted_index = inverted_index
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.doc_vectors = doc_vectors
+        self.total_docs = len(doc_ids)
+        self.doc_freqs = {term: len(postings) for term, postings in inverted_index.items()}
+        self.idf = {term: calculate_idf(self.total_docs, df) for term, df in self.doc_freqs.items()}
+        self.max_weights = calculate_max_weights(inverted_index, doc_lengths)
+        self.file_stats = {}
+        self.version = next(_versions)
+
+    @classmethod
+    def build(cls, directory: str = CORPUS, workers: int = WORKERS) -> 'VectorSpaceIndex':
+        index = cls(*create_index_with_tf_df_and_lengths(directory, workers))
+        for file in index.doc_ids.values():
+            index.file_stats[file] = file_stats(os.path.join(directory, file))
+        return index
+
+    @classmethod
+    def from_documents(cls, documents, doc_ids, stats) -> 'VectorSpaceIndex':
+        # For documents preprocessed elsewhere, stats maps each file to its (mtime, sha1) for refresh
+        index = cls(*create_index_from_documents(documents, doc_ids))
+        index.file_stats = dict(stats)
+        return index
+
+    # Incremental updates
+    def add_document(self, file, tokens) -> int:
+        self.version = next(_versions)
+        doc_id = max(self.doc_ids, default=-1) + 1
+        term_freqs = Counter(tokens)
+        doc_vector = {term: calculate_tf(freq) for term, freq in term_freqs.items()}
+        doc_length = calculate_document_length(doc_vector)
+
+        for term, tf_weight in doc_vector.items():
+            self.inverted_index.setdefault(term, {})[doc_id] = tf_weight
+            self.doc_freqs[term] = len(self.inverted_index[term])
+            self.max_weights[term] = max(self.max_weights.get(term, 0), tf_weight / doc_length)
+        self.doc_ids[doc_id] = file
+        self.doc_lengths[doc_id] = doc_length
+        self.doc_vectors[doc_id] = {term: weight / doc_length for term, weight in doc_vector.items()}
+        return doc_id
+
+    def remove_document(self, doc_id) -> None:
+        self.version = next(_versions)
+        for term in self.doc_vectors.pop(doc_id):
+            postings = self.inverted_index[term]
+            del postings[doc_id]
+            if postings:
+                self.doc_freqs[term] = len(postings)
+                self.max_weights[term] = max(tf_weight / self.doc_lengths[other_id]
+                                             for other_id, tf_weight in postings.items())
+            else:
+                del self.inverted_index[term], self.doc_freqs[term], self.max_weights[term]
+        del self.doc_ids[doc_id], self.doc_lengths[doc_id]
+
+    def update_statistics(self) -> None:
+        # idf depends on the collection size, so it is recomputed for every term after an update
+        self.total_docs = len(self.doc_ids)
+        self.idf = {term: calculate_idf(self.total_docs, df) for term, df in self.doc_freqs.items()}
+
+    def refresh(self, directory: str = CORPUS) -> tuple:
+        # Only new or changed files (by mtime, then content hash) are re-read, deleted files are removed
+        file_ids = {file: doc_id for doc_id, file in self.doc_ids.items()}
+        files = [file for file in sorted(os.listdir(directory)) if file.endswith('.txt')]
+        changed = []
+        for file in files:
+            file_path = os.path.join(directory, file)
+            mtime = os.stat(file_path).st_mtime
+            known = self.file_stats.get(file)
+            if known is not None and known[0] == mtime:
+                continue
+            stats = file_stats(file_path)
+            if known is not None and known[1] == stats[1]:
+                self.file_stats[file] = stats
+                continue
+            changed.append((file, stats))
+        present = set(files)
+        removed = [file for file in file_ids if file not in present]
+
+        for file in removed:
+            self.remove_document(file_ids[file])
+            del self.file_stats[file]
+        for file, stats in changed:
+            if file in file_ids:
+                self.remove_document(file_ids[file])
+            self.add_document(file, read_document_as_tokens(os.path.join(directory, file)))
+            self.file_stats[file] = stats
+        if changed or removed:
+            self.update_statistics()
+        return len(changed), len(removed)
+
+    @classmethod
+    def load(cls, file: str = VECTOR_INDEX_FILE) -> 'VectorSpaceIndex':
+        # Raises ValueError for a truncated or corrupt file and for one saved in another format
+        try:
+            with open(file, READ, encoding=UTF_8) as f:
+                state = json.load(f)
+            if state.get(FORMAT_KEY) != VECTOR_INDEX_FORMAT:
+                raise ValueError(f'format {state.get(FORMAT_KEY)}')
+            index = cls.__new__(cls)
+            index.doc_ids = {doc_id: name for doc_id, name, _ in state['documents']}
+            index.doc_lengths = {doc_id: length for doc_id, _, length in state['documents']}
+            index.inverted_index = {term: dict(zip(doc_ids, weights))
+                                    for term, (doc_ids, weights) in state['inverted_index'].items()}
+            index.total_docs = state['total_docs']
+            index.doc_freqs = state['doc_freqs']
+            index.idf = state['idf']
+            index.max_weights = state['max_weights']
+            index.file_stats = {name: tuple(stats) for name, stats in state['file_stats'].items()}
+            # The normalized vectors are the tf weights over the lengths, they are not stored twice
+            index.doc_vectors = {doc_id: {} for doc_id in index.doc_ids}
+            for term, postings in index.inverted_index.items():
+                for doc_id, tf_weight in postings.items():
+                    index.doc_vectors[doc_id][term] = tf_weight / index.doc_lengths[doc_id]
+        except (AttributeError, KeyError, TypeError, ValueError) as error:
+            raise ValueError(f'{file} is not a format {VECTOR_INDEX_FORMAT} vector space index') from error
+        # Versions are only unique within a process
+        index.version = next(_versions)
+        return index
+
+    def save(self, file: str = VECTOR_INDEX_FILE) -> None:
+        # Plain JSON values, like the binary indexes of assignment1 loading it runs no code. The file is
+        # replaced atomically, so an interrupted save leaves the previous index
+        state = {
+            FORMAT_KEY: VECTOR_INDEX_FORMAT,
+            'documents': [[doc_id, name, self.doc_lengths[doc_id]] for doc_id, name in self.doc_ids.items()],
+            'inverted_index': {term: [list(postings), list(postings.values())]
+                               for term, postings in self.inverted_index.items()},
+            'total_docs': self.total_docs,
+            'doc_freqs': self.doc_freqs,
+            'idf': self.idf,
+            'max_weights': self.max_weights,
+            'file_stats': self.file_stats,
+        }
+        with open(file + TEMPORARY_EXTENSION, WRITE, encoding=UTF_8) as f:
+            json.dump(state, f)
+        os.replace(file + TEMPORARY_EXTENSION, file)
+
+    def process_query(self, query, k=TOP_K, pruning=False) -> list:
+        # With pruning, top-k documents are found with MaxScore and the ranking is identical to exhaustive scoring
+        return cached_query(self, query, k, pruning)
+
+    def tiered(self, tier_sizes=TIER_SIZES) -> 'TieredIndex':
+        return TieredIndex(self, tier_sizes)
+
+    def compact(self) -> 'CompactVectorIndex':
+        return CompactVectorIndex(self)
+
+# Compact Vector Space Index
+class CompactPostings(Mapping):
+    """Doc-id -> tf weight view on one term's slice of the compact index arrays"""
+
+    __slots__ = ('doc_ids', 'weights')
+
+    def __init__(self, doc_ids, weights):
+        self.doc_ids = doc_ids
+        self.weights = weights
+
+    def position(self, doc_id) -> int:
+        i = bisect_left(self.doc_ids, doc_id)
+        return i if i < len(self.doc_ids) and self.doc_ids[i] == doc_id else -1
+
+    def __getitem__(self, doc_id) -> float:
+        i = self.position(doc_id)
+        if i < 0:
+            raise KeyError(doc_id)
+        return self.weights[i]
+
+    def __contains__(self, doc_id) -> bool:
+        return self.position(doc_id) >= 0
+
+    def __iter__(self):
+        return iter(self.doc_ids)
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def items(self):
+        return zip(self.doc_ids, self.weights)
+
+class CompactTermIndex(Mapping):
+    """Term -> postings index stored as a sorted term table and contiguous doc-id and tf weight arrays"""
+
+    def __init__(self, inverted_index):
+        # Terms are interned so that they are shared with the query tokens and the per-term statistics
+        self.terms = tuple(sys.intern(term) for term in sorted(inverted_index))
+        self.offsets = array(DOC_ID_TYPE, [0])
+        self.doc_ids = array(DOC_ID_TYPE)
+        self.weights = array(WEIGHT_TYPE)
+        for term in self.terms:
+            postings = inverted_index[term]
+            for doc_id in sorted(postings):
+                self.doc_ids.append(doc_id)
+                self.weights.append(postings[doc_id])
+            self.offsets.append(len(self.doc_ids))
+
+    def term_number(self, term) -> int:
+        i = bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else -1
+
+    def __getitem__(self, term) -> CompactPostings:
+        i = self.term_number(term)
+        if i < 0:
+            raise KeyError(term)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        # Memoryview slices do not copy the arrays
+        return CompactPostings(memoryview(self.doc_ids)[start:end], memoryview(self.weights)[start:end])
+
+    def __contains__(self, term) -> bool:
+        return self.term_number(term) >= 0
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.terms) + sum(sys.getsizeof(term) for term in self.terms) + \
+            sys.getsizeof(self.offsets) + sys.getsizeof(self.doc_ids) + sys.getsizeof(self.weights)
+
+class CompactVectorIndex:
+    """Read-only VectorSpaceIndex for serving queries, each tf weight is stored once in a contiguous array
+
+    The normalized document vectors are not kept, they duplicate the inverted index weights
+    divided by the document lengths.
+    """
+
+    def __init__(self, index: VectorSpaceIndex):
+        self.inverted_index = CompactTermIndex(index.inverted_index)
+        self.doc_ids = index.doc_ids
+        # Document lengths are indexed by doc-id, removed documents leave unused slots
+        self.doc_lengths = array(WEIGHT_TYPE, [index.doc_lengths.get(doc_id, 0.0)
+                                               for doc_id in range(max(index.doc_lengths, default=-1) + 1)])
+        self.total_docs = index.total_docs
+        self.doc_freqs = {term: index.doc_freqs[term] for term in self.inverted_index}
+        self.idf = {term: index.idf[term] for term in self.inverted_index}
+        self.max_weights = {term: index.max_weights[term] for term in self.inverted_index}
+        self.version = next(_versions)
+
+    def process_query(self, query, k=TOP_K, pruning=False) -> list:
+        return cached_query(self, query, k, pruning)
+
+# Tiered Vector Space Index
+class TieredIndex:
+    """Impact-ordered postings of a vector space index split into tiers, the champion lists of each term first
+
+    Tier i holds the next tier_sizes[i] postings of each term by normalized tf weight and the
+    last tier holds the rest. Smaller tiers read fewer postings per query and miss more of
+    the exhaustive top k.
+    """
+
+    def __init__(self, index, tier_sizes=TIER_SIZES):
+        self.index = index
+        self.tier_sizes = tuple(tier_sizes)
+        self.bounds = tuple(itertools.accumulate(self.tier_sizes))
+        self.build()
+
+    def build(self) -> None:
+        index = self.index
+        self.ordered = {term: impact_order(postings, index.doc_lengths)
+                        for term, postings in index.inverted_index.items()}
+        self.source_version = index.version
+
+    def process_query(self, query, k=TOP_K) -> list:
+        return process_query_tiered(preprocess(query), self, k)
+
+_vector_space_index = None
+# Every index, and every update of an index, gets a new version so that cached results are not reused
+_versions = itertools.count(1)
+# Ranked results share the cache registry of assignment1, so they are reported and cleared with the other caches
+_query_cache = register_cache('ranked', Cache(max_entries=QUERY_CACHE_SIZE, policy=LRU))
+
+@traced_query('ranked', 1)
+def cached_query(index, query, k=TOP_K, pruning=False) -> list:
+    # Results are cached per normalized query in LRU order, entries of an older index version are dropped
+    query_tokens = tuple(preprocess(query))
+    def compute():
+        return tuple(process_query_tokens(query_tokens, index.inverted_index, index.doc_lengths, index.total_docs,
+                                          index.idf, k, index.max_weights if pruning else None))
+
+    return list(_query_cache.get_or_compute((id(index), query_tokens, k, pruning), compute, index.version))
+
+def file_stats(file: str) -> tuple:
+    # The content is hashed block by block, large files are not read into memory
+    return os.stat(file).st_mtime, file_hash(file)
+
+def get_index(file: str = VECTOR_INDEX_FILE, directory: str = CORPUS, refresh: bool = False) -> VectorSpaceIndex:
+    # Loaded on first use, built and saved only when no index in the current format exists on disk.
+    # With refresh, new, changed and deleted documents are applied, to a loaded index too, and saved
+    global _vector_space_index
+    if _vector_space_index is None:
+        if os.path.exists(file):
+            try:
+                _vector_space_index = VectorSpaceIndex.load(file)
+            except ValueError:
+                # Corrupt or saved in another format, rebuilt below
+                pass
+        if _vector_space_index is None:
+            _vector_space_index = VectorSpaceIndex.build(directory)
+            _vector_space_index.save(file)
+            return _vector_space_index
+    if refresh and any(_vector_space_index.refresh(directory)):
+        _vector_space_index.save(file)
+    return _vector_space_index
 
 # Main Search Function
 def search(query) -> None:
-    index, doc_ids, doc_lengths, doc_vectors = create_index_with_tf_df_and_lengths()
-    total_docs = len(doc_ids)
+    index = get_index()
 
-    ranked_results = process_query(query, index, doc_lengths, doc_vectors, total_docs)
+    ranked_results = index.process_query(query)
 
     print("Top 10 relevant documents for your query:")
     for doc_id, score in ranked_results:
-        print(f"Document ID: {doc_ids[doc_id]}, Score: {score}")
+        print(f"Document ID: {index.doc_ids[doc_id]}, Score: {score}")
 
 def main() -> None:
+    # Run from the repository root: python -m assignment2.vector_spacing
+    # Documents added, changed or deleted since the index was saved are applied before searching
+    get_index(refresh=True)
     query = input("Enter your query: ")
     search(query)
 
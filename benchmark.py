@@ -0,0 +1,552 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+from assignment1.question1 import preprocess, build_index, save_index, create_inverted_index, preprocess_query, \
+    search, get_preprocessor, list_documents, DOCUMENT_PATH, INVERTED_INDEX_PATH, UTF_8, WRITE, READ, WORKERS
+from assignment1.question2a import index_bi_words, search_bi_word_index, BI_WORD_INDEX_PATH
+from assignment1.question2b import search_phrase, search_query, POSITIONAL_INDEX_PATH
+from assignment1.question2b import index_documents as index_positions
+from assignment1.question2c import index_soundex, search_soundex_index, load_soundex_table, SOUNDEX_INDEX_PATH
+from assignment1.index_store import write_binary_index, open_binary_index, KIND_DOCUMENTS, KIND_POSITIONAL, \
+    CODEC_RAW
+from assignment1.compact_index import CompactIndex
+from assignment1.spimi import build_index_streaming
+from assignment1.incremental import SegmentedIndex, index_documents_incrementally
+from assignment1.query_cache import clear_caches, cache_stats
+from assignment1.query_server import QueryServer, QueryIndexes, HTTP_OK
+from assignment1.multi_index import build_all_indexes
+from assignment1.batch_queries import search_boolean_batch, search_ranked_batch, new_stats, throughput
+from assignment1.sharding import build_shards, ShardCoordinator, SHARDS
+from assignment1 import codec_report
+from assignment2 import vector_spacing, benchmark_pruning
+
+# Constants
+DOCUMENTS = 1000
+DOCUMENT_LENGTH = 200
+VOCABULARY_SIZE = 5000
+ZIPF_EXPONENT = 1.1
+QUERIES = 200
+SEED = 42
+# Samples drawn per query before giving up on finding enough usable windows
+MAX_ATTEMPTS = 100
+PERCENTILES = (50, 95, 99)
+PROXIMITY = 5
+RANKED_QUERY_LENGTHS = (2, 8)
+SERVER_CONCURRENCY = 8
+RANKING_WORKERS = 2
+RESULTS_FILE = 'benchmark_results.json'
+CONSONANTS = 'bcdfgklmnprstvz'
+VOWELS = 'aeiou'
+DOCUMENT_EXTENSION = '.txt'
+RAW_INVERTED_INDEX_PATH = 'raw_inverted_index'
+SPIMI_INVERTED_INDEX_PATH = 'spimi_inverted_index'
+SPIMI_POSITIONAL_INDEX_PATH = 'spimi_positional_index'
+SEGMENTED_INDEX_PATH = 'segmented_inverted_index'
+SHARD_DIRECTORY = 'benchmark_shards'
+
+
+# Corpus Functions
+def make_word(rng: random.Random) -> str:
+    """Returns a pronounceable pseudo-word of two to four syllables"""
+    return ''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(rng.randint(2, 4)))
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list:
+    """Returns distinct pseudo-words, the position of a word is its frequency rank"""
+    vocabulary = {}
+    while len(vocabulary) < size:
+        vocabulary[make_word(rng)] = None
+    return list(vocabulary)
+
+
+def generate_corpus(dir_path: str, documents: int = DOCUMENTS, length: int = DOCUMENT_LENGTH,
+                    vocabulary_size: int = VOCABULARY_SIZE, exponent: float = ZIPF_EXPONENT, seed: int = SEED):
+    """Writes documents whose words follow a Zipf distribution over a synthetic vocabulary"""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size, rng)
+    cumulative_weights = []
+    total = 0.0
+    for rank in range(1, vocabulary_size + 1):
+        total += 1 / rank ** exponent
+        cumulative_weights.append(total)
+    os.makedirs(dir_path, exist_ok=True)
+    width = len(str(documents))
+    for i in range(documents):
+        words = rng.choices(vocabulary, cum_weights=cumulative_weights, k=rng.randint(length // 2, length * 3 // 2))
+        with open(os.path.join(dir_path, f"doc{i:0{width}}{DOCUMENT_EXTENSION}"), WRITE, encoding=UTF_8) as f:
+            f.write(' '.join(words))
+
+
+def read_raw_documents(dir_path: str) -> list:
+    """Returns the whitespace separated words of every document"""
+    documents = []
+    for file in sorted(os.listdir(dir_path)):
+        with open(os.path.join(dir_path, file), READ, encoding=UTF_8) as f:
+            documents.append(f.read().split())
+    return documents
+
+
+def describe_corpus(dir_path: str, documents: list) -> dict:
+    files = [os.path.join(dir_path, file) for file in os.listdir(dir_path)]
+    return {'documents': len(documents), 'words': sum(len(document) for document in documents),
+            'bytes': sum(os.path.getsize(file) for file in files)}
+
+
+# Measurement Functions
+def timed(function, *args) -> tuple:
+    """Returns the result of the call and its elapsed seconds"""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def peak_memory(function, *args) -> int:
+    """Returns the peak bytes allocated by Python during the call, traced in a separate run"""
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def percentile(sorted_values: list, rank: int) -> float:
+    """Returns the nearest-rank percentile of the sorted values"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, -(-rank * len(sorted_values) // 100) - 1)]
+
+
+def summarize(latencies: list) -> dict:
+    """Returns the count, mean and percentiles of the latencies, in milliseconds"""
+    values = sorted(1000 * latency for latency in latencies)
+    summary = {'count': len(values), 'mean_ms': sum(values) / len(values) if values else 0.0}
+    for rank in PERCENTILES:
+        summary[f"p{rank}_ms"] = percentile(values, rank)
+    return summary
+
+
+def measure_latency(function, queries: list) -> dict:
+    """Times every query, returns the latency summary"""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        function(query)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def measure_passes(function, queries: list) -> dict:
+    """Runs the workload twice, the first pass on empty query caches and the second one on warm caches
+
+    The counters of the caches are those of this workload alone, they are cleared before it.
+    """
+    clear_caches()
+    result = {'cold': measure_latency(function, queries), 'warm': measure_latency(function, queries)}
+    result['cache'] = cache_stats()
+    return result
+
+
+def disk_size(path: str) -> int:
+    """Returns the bytes of every file of the index stored at path"""
+    directory = os.path.dirname(path) or '.'
+    prefix = os.path.basename(path)
+    return sum(os.path.getsize(os.path.join(directory, file)) for file in os.listdir(directory)
+               if file == prefix or file.startswith(prefix + '.'))
+
+
+# Query Workload Functions
+class Workload:
+    """Raw query strings sampled from the documents, so every query type preprocesses them like the documents"""
+
+    def __init__(self, documents: list, count: int = QUERIES, seed: int = SEED):
+        self.documents = [document for document in documents if document]
+        self.count = count
+        self.rng = random.Random(seed)
+        preprocessor = get_preprocessor()
+        self.words = sorted({word for document in self.documents for word in document
+                             if word.isalnum() and preprocessor(word)})
+
+    def window(self, length: int) -> str:
+        """Returns consecutive words of a random document"""
+        document = self.rng.choice(self.documents)
+        start = self.rng.randrange(max(1, len(document) - length + 1))
+        return ' '.join(document[start:start + length])
+
+    def windows(self, length: int, min_terms: int = 1) -> list:
+        queries = []
+        for _ in range(self.count * MAX_ATTEMPTS):
+            if len(queries) == self.count:
+                break
+            query = self.window(length)
+            if len(preprocess(query)) >= min_terms:
+                queries.append(query)
+        return queries
+
+    def boolean(self) -> list:
+        """Returns AND, OR and AND NOT queries over words of the documents"""
+        templates = ('{} AND {}', '{} OR {} OR {}', '{} AND NOT {}', '({} OR {}) AND {}')
+        queries = []
+        for i in range(self.count):
+            template = templates[i % len(templates)]
+            queries.append(template.format(*self.rng.sample(self.words, template.count('{}'))))
+        return queries
+
+    def misspelled(self) -> list:
+        """Returns words of the documents with one vowel replaced, as phonetic queries"""
+        queries = []
+        for word in self.rng.choices(self.words, k=self.count):
+            vowels = [i for i, char in enumerate(word) if char in VOWELS]
+            if vowels:
+                i = self.rng.choice(vowels)
+                word = word[:i] + self.rng.choice(VOWELS) + word[i + 1:]
+            queries.append(word)
+        return queries
+
+    def build(self) -> dict:
+        workload = {
+            'boolean': self.boolean(),
+            'bi-word': self.windows(2, 2),
+            'phrase': self.windows(3, 2),
+            'proximity': self.windows(2, 2),
+            'soundex': self.misspelled(),
+        }
+        for length in RANKED_QUERY_LENGTHS:
+            workload[f"ranked-{length}"] = self.windows(length)
+        return workload
+
+
+# Index Benchmarks
+def build_inverted_index(workers: int):
+    save_index(build_index(create_inverted_index, DOCUMENT_PATH, workers), INVERTED_INDEX_PATH,
+               files=list_documents(DOCUMENT_PATH))
+
+
+def build_raw_inverted_index(workers: int):
+    write_binary_index(build_index(create_inverted_index, DOCUMENT_PATH, workers), RAW_INVERTED_INDEX_PATH,
+                       KIND_DOCUMENTS, len(list_documents(DOCUMENT_PATH)), codec=CODEC_RAW)
+
+
+def build_segmented_index(workers: int):
+    for file in os.listdir('.'):
+        if file.startswith(SEGMENTED_INDEX_PATH + '.'):
+            os.remove(file)
+    index_documents_incrementally(SEGMENTED_INDEX_PATH).close()
+
+
+# Name, path, kind, builder and opener of every index, the builders write the index to path
+INDEXES = (
+    ('inverted', INVERTED_INDEX_PATH, KIND_DOCUMENTS, build_inverted_index, open_binary_index),
+    ('inverted-raw', RAW_INVERTED_INDEX_PATH, KIND_DOCUMENTS, build_raw_inverted_index, open_binary_index),
+    ('inverted-spimi', SPIMI_INVERTED_INDEX_PATH, KIND_DOCUMENTS,
+     lambda workers: build_index_streaming(DOCUMENT_PATH, SPIMI_INVERTED_INDEX_PATH).close(), open_binary_index),
+    ('inverted-segmented', SEGMENTED_INDEX_PATH, KIND_DOCUMENTS, build_segmented_index, SegmentedIndex),
+    ('bi-word', BI_WORD_INDEX_PATH, KIND_DOCUMENTS, index_bi_words, open_binary_index),
+    ('positional', POSITIONAL_INDEX_PATH, KIND_POSITIONAL, index_positions, open_binary_index),
+    ('positional-spimi', SPIMI_POSITIONAL_INDEX_PATH, KIND_POSITIONAL,
+     lambda workers: build_index_streaming(DOCUMENT_PATH, SPIMI_POSITIONAL_INDEX_PATH, KIND_POSITIONAL).close(),
+     open_binary_index),
+    ('soundex', SOUNDEX_INDEX_PATH, KIND_DOCUMENTS, index_soundex, open_binary_index),
+)
+
+
+def load_index_fully(opener, path: str, kind: int) -> float:
+    """Opens the index and decodes every postings list, returns the elapsed seconds"""
+    start = time.perf_counter()
+    index = opener(path)
+    codec_report.decode_index(index, kind)
+    index.close()
+    return time.perf_counter() - start
+
+
+def benchmark_index(path: str, kind: int, builder, opener, workers: int) -> dict:
+    """Measures the build time, peak memory, on-disk size and cold and warm load of an index
+
+    The cold load is the first one in the process with the query caches cleared, the OS
+    page cache still holds the files that were just written.
+    """
+    _, build_seconds = timed(builder, workers)
+    result = {'build_seconds': build_seconds, 'peak_memory_bytes': peak_memory(builder, workers),
+              'disk_bytes': disk_size(path)}
+    clear_caches()
+    result['cold_load_seconds'] = load_index_fully(opener, path, kind)
+    result['warm_load_seconds'] = load_index_fully(opener, path, kind)
+    return result
+
+
+def benchmark_vector_index(workers: int) -> dict:
+    file = vector_spacing.VECTOR_INDEX_FILE
+    index, build_seconds = timed(vector_spacing.VectorSpaceIndex.build, DOCUMENT_PATH, workers)
+    index.save(file)
+    _, cold_load_seconds = timed(vector_spacing.VectorSpaceIndex.load, file)
+    _, warm_load_seconds = timed(vector_spacing.VectorSpaceIndex.load, file)
+    return {'build_seconds': build_seconds,
+            'peak_memory_bytes': peak_memory(vector_spacing.VectorSpaceIndex.build, DOCUMENT_PATH, workers),
+            'disk_bytes': disk_size(file), 'cold_load_seconds': cold_load_seconds,
+            'warm_load_seconds': warm_load_seconds}
+
+
+def benchmark_multi_index(workers: int) -> dict:
+    """Measures building and saving every index in one corpus pass, to compare with the single index builds"""
+    _, build_seconds = timed(build_all_indexes, DOCUMENT_PATH, workers)
+    return {'build_seconds': build_seconds, 'peak_memory_bytes': peak_memory(build_all_indexes, DOCUMENT_PATH, workers)}
+
+
+def benchmark_preprocessing(dir_path: str) -> dict:
+    """Measures the shared preprocessing pipeline and the vector space one over every document"""
+    texts = []
+    for file in os.listdir(dir_path):
+        with open(os.path.join(dir_path, file), READ, encoding=UTF_8) as f:
+            texts.append(f.read())
+    result = {}
+    for name, preprocessor in (('boolean', preprocess), ('vector', vector_spacing.preprocess)):
+        tokens, seconds = timed(lambda: sum(len(preprocessor(text)) for text in texts))
+        result[name] = {'seconds': seconds, 'tokens': tokens,
+                        'tokens_per_second': tokens / seconds if seconds > 0 else float('inf')}
+    return result
+
+
+# Query Benchmarks
+def benchmark_queries(workload: dict) -> dict:
+    """Measures the latency of every query type against freshly opened indexes"""
+    results = {}
+    inverted_index = open_binary_index(INVERTED_INDEX_PATH)
+    compact_index = CompactIndex(dict(inverted_index), inverted_index.num_documents)
+    segmented_index = SegmentedIndex(SEGMENTED_INDEX_PATH)
+    for name, index in (('boolean', inverted_index), ('boolean-compact', compact_index),
+                        ('boolean-segmented', segmented_index)):
+        results[name] = measure_passes(lambda query: search(preprocess_query(query), index), workload['boolean'])
+    segmented_index.close()
+
+    with open_binary_index(BI_WORD_INDEX_PATH) as bi_word_index:
+        results['bi-word'] = measure_passes(lambda query: search_bi_word_index(query, bi_word_index),
+                                            workload['bi-word'])
+    with open_binary_index(POSITIONAL_INDEX_PATH) as positional_index:
+        results['phrase'] = measure_passes(
+            lambda query: search_phrase(query, positional_index, positional_index), workload['phrase'])
+        results['proximity'] = measure_passes(
+            lambda query: search_query(query, PROXIMITY, positional_index, positional_index), workload['proximity'])
+    table = load_soundex_table()
+    with open_binary_index(SOUNDEX_INDEX_PATH) as soundex_index:
+        results['soundex'] = measure_passes(lambda query: search_soundex_index(query, soundex_index, table),
+                                            workload['soundex'])
+
+    vector_index = vector_spacing.VectorSpaceIndex.load(vector_spacing.VECTOR_INDEX_FILE)
+    compact_vector_index = vector_index.compact()
+    for length in RANKED_QUERY_LENGTHS:
+        queries = workload[f"ranked-{length}"]
+        for name, index, pruning in (('ranked', vector_index, False), ('ranked-max-score', vector_index, True),
+                                     ('ranked-compact', compact_vector_index, False)):
+            results[f"{name}-{length}"] = measure_passes(
+                lambda query: index.process_query(query, pruning=pruning), queries)
+    inverted_index.close()
+    return results
+
+
+def benchmark_batches(workload: dict) -> dict:
+    """Measures the throughput of the Boolean and ranked workloads evaluated as batches"""
+    results = {}
+    with open_binary_index(INVERTED_INDEX_PATH) as inverted_index:
+        clear_caches()
+        stats = new_stats()
+        for _ in search_boolean_batch(workload['boolean'], inverted_index, stats):
+            pass
+        results['boolean'] = throughput(stats)
+    vector_index = vector_spacing.VectorSpaceIndex.load(vector_spacing.VECTOR_INDEX_FILE).compact()
+    for length in RANKED_QUERY_LENGTHS:
+        stats = new_stats()
+        for _ in search_ranked_batch(workload[f"ranked-{length}"], vector_index, stats=stats):
+            pass
+        results[f"ranked-{length}"] = throughput(stats)
+    return results
+
+
+def benchmark_shards(workload: dict, workers: int, shards: int = SHARDS) -> dict:
+    """Measures building the shards and the latency of queries fanned out to them
+
+    The shard workers keep their own query caches, every workload runs once.
+    """
+    _, build_seconds = timed(build_shards, DOCUMENT_PATH, shards, workers, SHARD_DIRECTORY)
+    results = {'shards': shards, 'build_seconds': build_seconds}
+    with ShardCoordinator(SHARD_DIRECTORY) as coordinator:
+        results['boolean'] = measure_latency(coordinator.boolean, workload['boolean'])
+        results['bi-word'] = measure_latency(coordinator.bi_word, workload['bi-word'])
+        results['phrase'] = measure_latency(coordinator.phrase, workload['phrase'])
+        results['proximity'] = measure_latency(lambda query: coordinator.proximity(query, PROXIMITY),
+                                               workload['proximity'])
+        results['soundex'] = measure_latency(coordinator.soundex, workload['soundex'])
+        for length in RANKED_QUERY_LENGTHS:
+            results[f"ranked-{length}"] = measure_latency(coordinator.ranked, workload[f"ranked-{length}"])
+    return results
+
+
+def benchmark_sparse_backend(workload: dict) -> dict:
+    """Measures the batch throughput of the SciPy backend, when NumPy and SciPy are installed"""
+    try:
+        from assignment2.sparse_backend import compare_throughput
+    except ImportError as error:
+        return {'skipped': str(error)}
+    queries = [query for length in RANKED_QUERY_LENGTHS for query in workload[f"ranked-{length}"]]
+    index = vector_spacing.VectorSpaceIndex.load(vector_spacing.VECTOR_INDEX_FILE)
+    return compare_throughput(index, [vector_spacing.preprocess(query) for query in queries])
+
+
+async def benchmark_server(workload: dict, concurrency: int = SERVER_CONCURRENCY,
+                           ranking_workers: int = RANKING_WORKERS) -> dict:
+    """Measures the startup of the query server and the latency of its endpoints under concurrent requests
+
+    Requests go through the request routing of the server without the HTTP framing. Only
+    successful requests are latency samples, the others are counted as errors.
+    """
+    start = time.perf_counter()
+    server = QueryServer(QueryIndexes(), ranking_workers)
+    await server.start_pool()
+    results = {'startup_seconds': time.perf_counter() - start}
+    endpoints = (('/boolean', 'boolean', {}), ('/phrase', 'phrase', {}),
+                 ('/proximity', 'proximity', {'k': PROXIMITY}), ('/soundex', 'soundex', {}),
+                 ('/ranked', f"ranked-{RANKED_QUERY_LENGTHS[-1]}", {}))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request(target: str) -> tuple:
+        async with semaphore:
+            request_start = time.perf_counter()
+            status, _ = await server.respond('GET', target)
+            return status, time.perf_counter() - request_start
+
+    try:
+        clear_caches()
+        for endpoint, queries, parameters in endpoints:
+            targets = [endpoint + '?' + urlencode({'q': query, **parameters}) for query in workload[queries]]
+            pass_start = time.perf_counter()
+            responses = await asyncio.gather(*(request(target) for target in targets))
+            seconds = time.perf_counter() - pass_start
+            latencies = [latency for status, latency in responses if status == HTTP_OK]
+            results[endpoint] = {**summarize(latencies), 'errors': len(responses) - len(latencies),
+                                 'requests_per_second': len(targets) / seconds}
+        # Ranked queries are cached in the worker processes, these are the caches of the other endpoints
+        results['cache'] = cache_stats()
+    finally:
+        server.close()
+    return results
+
+
+# Report Functions
+def environment() -> dict:
+    return {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'timestamp': datetime.now(timezone.utc).isoformat()}
+
+
+def run(corpus: str = None, documents: int = DOCUMENTS, length: int = DOCUMENT_LENGTH,
+        vocabulary_size: int = VOCABULARY_SIZE, exponent: float = ZIPF_EXPONENT, queries: int = QUERIES,
+        seed: int = SEED, workers: int = WORKERS) -> dict:
+    """Runs every benchmark in a scratch directory, on a copy of corpus or on a synthetic Zipfian corpus
+
+    The indexes are written under their usual names in the scratch directory, so the
+    query server finds them like it does next to the real corpus.
+    """
+    config = {'corpus': corpus, 'documents': documents, 'document_length': length,
+              'vocabulary_size': vocabulary_size, 'zipf_exponent': exponent, 'queries': queries, 'seed': seed,
+              'workers': workers}
+    if corpus is not None:
+        for key in ('documents', 'document_length', 'vocabulary_size', 'zipf_exponent'):
+            config[key] = None
+    results = {'environment': environment(), 'config': config}
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        if corpus is not None:
+            shutil.copytree(corpus, os.path.join(work_dir, DOCUMENT_PATH))
+        else:
+            generate_corpus(os.path.join(work_dir, DOCUMENT_PATH), documents, length, vocabulary_size, exponent,
+                            seed)
+        os.chdir(work_dir)
+        try:
+            raw_documents = read_raw_documents(DOCUMENT_PATH)
+            results['corpus'] = describe_corpus(DOCUMENT_PATH, raw_documents)
+            results['preprocessing'] = benchmark_preprocessing(DOCUMENT_PATH)
+            results['indexes'] = {name: benchmark_index(path, kind, builder, opener, workers)
+                                  for name, path, kind, builder, opener in INDEXES}
+            results['indexes']['vector'] = benchmark_vector_index(workers)
+            results['indexes']['all'] = benchmark_multi_index(workers)
+            results['codecs'] = codec_report.report(DOCUMENT_PATH)
+
+            workload = Workload(raw_documents, queries, seed).build()
+            results['queries'] = benchmark_queries(workload)
+            results['batches'] = benchmark_batches(workload)
+            results['shards'] = benchmark_shards(workload, workers)
+            vector_index = vector_spacing.VectorSpaceIndex.load(vector_spacing.VECTOR_INDEX_FILE)
+            results['pruning'] = benchmark_pruning.benchmark(vector_index, count=queries, seed=seed)
+            results['tiers'] = benchmark_pruning.benchmark_tiers(vector_index, count=queries, seed=seed)
+            results['sparse_backend'] = benchmark_sparse_backend(workload)
+            results['server'] = asyncio.run(benchmark_server(workload))
+        finally:
+            os.chdir(working_directory)
+    return results
+
+
+def flatten(results, prefix: str = '') -> dict:
+    """Returns the numeric results keyed by their dotted path"""
+    if isinstance(results, dict):
+        items = results.items()
+    elif isinstance(results, list):
+        items = enumerate(results)
+    else:
+        return {prefix: results} if isinstance(results, (int, float)) and not isinstance(results, bool) else {}
+    flat = {}
+    for key, value in items:
+        flat.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+def compare(baseline: dict, results: dict) -> list:
+    """Returns (metric, baseline, current, ratio) for every numeric result of both runs"""
+    baseline, results = flatten(baseline), flatten(results)
+    rows = []
+    for metric in sorted(baseline.keys() & results.keys()):
+        if metric.startswith(('environment.', 'config.')):
+            continue
+        old, new = baseline[metric], results[metric]
+        rows.append((metric, old, new, new / old if old else float('inf') if new else 1.0))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks indexing and query latency of both assignments')
+    parser.add_argument('--corpus', help='directory of documents to use instead of a synthetic corpus')
+    parser.add_argument('--documents', type=int, default=DOCUMENTS)
+    parser.add_argument('--length', type=int, default=DOCUMENT_LENGTH, help='mean words per document')
+    parser.add_argument('--vocabulary', type=int, default=VOCABULARY_SIZE)
+    parser.add_argument('--exponent', type=float, default=ZIPF_EXPONENT, help='exponent of the Zipf distribution')
+    parser.add_argument('--queries', type=int, default=QUERIES, help='queries per query type')
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument('--compare', help='results of an earlier run to compare with')
+    args = parser.parse_args()
+
+    corpus = os.path.abspath(args.corpus) if args.corpus else None
+    results = run(corpus, args.documents, args.length, args.vocabulary, args.exponent, args.queries, args.seed,
+                  args.workers)
+    with open(args.output, WRITE, encoding=UTF_8) as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, READ, encoding=UTF_8) as f:
+            baseline = json.load(f)
+        print(f"{'metric':<60} {'baseline':>14} {'current':>14} {'ratio':>8}")
+        for metric, old, new, ratio in compare(baseline, results):
+            print(f"{metric:<60} {old:>14.4f} {new:>14.4f} {ratio:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
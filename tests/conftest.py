@@ -0,0 +1,38 @@
+import os
+import sys
+from types import SimpleNamespace
+import pytest
+
+# The modules import each other as assignment1.x and assignment2.x, and contractions as a top-level module
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, 'assignment1')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Imported once the paths are set up
+from assignment1 import question1  # noqa: E402
+from assignment2 import vector_spacing  # noqa: E402
+
+STOP_WORDS = ('the', 'and', 'of')
+
+
+class IdentityLemmatizer:
+    def lemmatize(self, word):
+        return word
+
+
+@pytest.fixture
+def whitespace_pipeline(monkeypatch):
+    """Swaps the NLTK tokenizer, stopwords and lemmatizer, whose data may not be installed, for plain stand-ins
+
+    Process pools forked after the swap preprocess the same way.
+    """
+    stopwords = SimpleNamespace(words=lambda language: list(STOP_WORDS))
+    monkeypatch.setattr(question1, 'stopwords', stopwords)
+    monkeypatch.setattr(question1, 'word_tokenize', str.split)
+    monkeypatch.setattr(question1, 'WordNetLemmatizer', IdentityLemmatizer)
+    monkeypatch.setattr(vector_spacing, 'get_stop_words', lambda: frozenset(STOP_WORDS))
+    monkeypatch.setattr(vector_spacing, 'word_tokenize', str.split)
+    question1.get_preprocessor.cache_clear()
+    yield
+    question1.get_preprocessor.cache_clear()
@@ -0,0 +1,37 @@
+import os
+import pytest
+from assignment1 import batch_queries
+from assignment1.question1 import save_index, load_index
+
+
+@pytest.fixture
+def saved_index(tmp_path):
+    corpus = tmp_path / 'corpus'
+    corpus.mkdir()
+    for name in ('a.txt', 'b.txt', 'c.txt'):
+        (corpus / name).write_text(name)
+    path = str(tmp_path / 'inverted_index')
+    save_index({'apple': {0, 2}, 'banana': {1, 2}, 'cherry': {0}}, path, export_text=False,
+               files=[str(corpus / name) for name in sorted(os.listdir(corpus))])
+    index = load_index(path)
+    yield index, path
+    index.close()
+
+
+def test_boolean_records_name_documents(saved_index, monkeypatch):
+    index, path = saved_index
+    monkeypatch.setattr(batch_queries, 'preprocess', lambda word: [word.lower()])
+    stats = batch_queries.new_stats()
+    queries = ['apple AND banana', 'apple OR cherry', 'NOT apple', 'apple AND banana']
+    records = sorted(batch_queries.search_boolean_batch(queries, index, stats, path), key=lambda record: record['id'])
+    assert [record['documents'] for record in records] == [['c.txt'], ['a.txt', 'c.txt'], ['b.txt'], ['c.txt']]
+    assert stats['queries'] == 4 and stats['unique_queries'] == 3
+
+
+def test_document_frequency_does_not_decode(saved_index):
+    index, _ = saved_index
+    stats = batch_queries.new_stats()
+    batch_index = batch_queries.BatchPostings(index, batch_queries.Counter(), stats)
+    assert batch_index.document_frequency('apple') == 2
+    assert batch_index.document_frequency('missing') == 0
+    assert stats['postings_fetched'] == 0
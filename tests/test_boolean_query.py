@@ -0,0 +1,68 @@
+import random
+import pytest
+from assignment1.boolean_query import run_query, parse_query, intersect, AND, OR, NOT, TERM
+from assignment1.compact_index import CompactIndex
+from assignment1.question1 import query_term
+
+INDEX = {'apple': {0, 1, 4}, 'banana': {1, 2}, 'cherry': {2, 3, 4}, 'date': {4}, 'elder': {0, 2, 3}}
+UNIVERSE = set(range(5))
+
+
+def evaluate(tokens: list) -> set:
+    """Evaluates the query as a Python expression on sets, the reference for run_query"""
+    expression = []
+    for token in tokens:
+        if token.lower() == AND:
+            expression.append('&')
+        elif token.lower() == OR:
+            expression.append('|')
+        elif token.lower() == NOT:
+            expression.append('UNIVERSE -')
+        elif token in ('(', ')'):
+            expression.append(token)
+        else:
+            expression.append(f'INDEX.get({token!r}, set())')
+    return eval(' '.join(expression), {'INDEX': INDEX, 'UNIVERSE': UNIVERSE})
+
+
+def random_query(rng, depth: int = 0) -> list:
+    if depth > 2 or rng.random() < 0.4:
+        term = [rng.choice(sorted(INDEX) + ['missing'])]
+        return ['NOT', '('] + term + [')'] if rng.random() < 0.2 else term
+    left, right = random_query(rng, depth + 1), random_query(rng, depth + 1)
+    return ['('] + left + [rng.choice(('AND', 'or'))] + right + [')']
+
+
+def test_parse_precedence():
+    assert parse_query(['a', 'or', 'b', 'and', 'not', 'c']) == \
+        (OR, [(TERM, 'a'), (AND, [(TERM, 'b'), (NOT, (TERM, 'c'))])])
+    # Adjacent operands are ANDed
+    assert parse_query(['a', 'b']) == (AND, [(TERM, 'a'), (TERM, 'b')])
+
+
+@pytest.mark.parametrize('tokens', (['a', 'and'], ['(', 'a'], ['a', ')'], ['and', 'a'], []))
+def test_malformed_queries_raise(tokens):
+    with pytest.raises(ValueError):
+        parse_query(tokens)
+
+
+@pytest.mark.parametrize('index', (INDEX, CompactIndex(INDEX)))
+def test_run_query_matches_set_evaluation(index):
+    rng = random.Random(7)
+    for _ in range(300):
+        tokens = random_query(rng)
+        assert set(run_query(tokens, index)) == evaluate(tokens), tokens
+
+
+def test_intersect_matches_sets():
+    rng = random.Random(3)
+    for _ in range(200):
+        a = sorted(rng.sample(range(1000), rng.randint(0, 50)))
+        b = sorted(rng.sample(range(1000), rng.randint(0, 400)))
+        assert list(intersect(a, b)) == sorted(set(a) & set(b))
+
+
+def test_query_term_rejects_words_without_terms():
+    assert query_term('Apples', lambda word: [word.lower()[:-1]]) == 'apple'
+    with pytest.raises(ValueError):
+        query_term('the', lambda word: [])
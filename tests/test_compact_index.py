@@ -0,0 +1,74 @@
+import os
+import random
+from assignment1.compact_index import CompactIndex
+from assignment1.index_store import write_binary_index, open_binary_index, BinaryIndex, KIND_DOCUMENTS, \
+    KIND_POSITIONAL
+from assignment1.question1 import index_documents, preprocess_query, search, list_documents, DOCUMENT_PATH, \
+    INVERTED_INDEX_PATH
+from assignment1.question2a import BI_WORD_INDEX_PATH
+from assignment1.question2b import POSITIONAL_INDEX_PATH
+from assignment1.question2c import SOUNDEX_INDEX_PATH
+from assignment1.multi_index import build_indexes_of_files, INVERTED, BI_WORD, POSITIONAL, SOUNDEX
+
+
+def random_positional(rng, terms=40, documents=60):
+    index = {}
+    for term in range(terms):
+        doc_ids = rng.sample(range(documents), rng.randint(1, documents // 4))
+        index[f'term{term}'] = {doc_id: sorted(rng.sample(range(500), rng.randint(1, 5))) for doc_id in doc_ids}
+    return index
+
+
+def test_compact_index_matches_dict_index():
+    positional = random_positional(random.Random(0))
+    documents = {term: set(postings) for term, postings in positional.items()}
+    compact_positional = CompactIndex(positional, 60)
+    compact_documents = CompactIndex(documents)
+
+    assert compact_positional.kind == KIND_POSITIONAL and compact_documents.kind == KIND_DOCUMENTS
+    assert dict(compact_positional) == positional
+    assert dict(compact_documents) == documents
+    assert dict(compact_positional.document_index()) == documents
+    assert compact_positional.universe() == range(60)
+    assert compact_documents.universe() == range(max(map(max, documents.values())) + 1)
+    for term, postings in positional.items():
+        assert list(compact_positional.postings(term)) == sorted(postings)
+        assert compact_positional.document_frequency(term) == len(postings)
+        assert all(compact_positional.positions(term, doc_id) == positions for doc_id, positions in postings.items())
+        assert compact_positional.positions(term, max(postings) + 1) == []
+    assert 'missing' not in compact_positional
+    assert list(compact_positional.postings('missing')) == []
+    assert compact_positional.document_frequency('missing') == 0
+
+
+def test_compact_index_of_binary_index(tmp_path):
+    positional = random_positional(random.Random(1))
+    write_binary_index(positional, str(tmp_path / 'positional'), num_documents=75)
+    with open_binary_index(str(tmp_path / 'positional')) as index:
+        compact = CompactIndex(index)
+    assert compact.kind == KIND_POSITIONAL
+    assert compact.num_documents == 75
+    assert dict(compact) == positional
+
+
+def test_not_counts_trailing_documents_without_terms(whitespace_pipeline, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir(DOCUMENT_PATH)
+    for name, text in (('a.txt', 'apple banana'), ('b.txt', 'banana'), ('c.txt', 'the of')):
+        with open(DOCUMENT_PATH + name, 'w') as f:
+            f.write(text)
+    query = preprocess_query('not banana')
+
+    built = index_documents()
+    assert isinstance(built, CompactIndex)
+    loaded = index_documents()
+    assert isinstance(loaded, BinaryIndex)
+    assert built.num_documents == loaded.num_documents == 3
+    assert search(query, built) == search(query, loaded) == {2}
+    loaded.close()
+
+    built = build_indexes_of_files(list_documents(DOCUMENT_PATH))
+    for kind, path in ((INVERTED, INVERTED_INDEX_PATH), (BI_WORD, BI_WORD_INDEX_PATH),
+                       (POSITIONAL, POSITIONAL_INDEX_PATH), (SOUNDEX, SOUNDEX_INDEX_PATH)):
+        with open_binary_index(path) as loaded:
+            assert built[kind].universe() == loaded.universe() == range(3)
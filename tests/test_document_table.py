@@ -0,0 +1,48 @@
+import os
+import pytest
+from assignment1.document_table import DocumentTable, document_table_path
+from assignment1.index_store import write_binary_index
+from assignment1.question1 import saved_index_exists, saved_index_current, document_names, save_index
+
+
+def test_index_saved_without_table_is_not_reused(tmp_path):
+    path = str(tmp_path / 'inverted_index')
+    write_binary_index({'apple': {0, 1}}, path)
+    assert not saved_index_exists(path)
+    with pytest.raises(ValueError):
+        document_names({0}, path)
+
+
+def test_names_come_from_the_table(tmp_path):
+    corpus = tmp_path / 'corpus'
+    corpus.mkdir()
+    for name in ('b.txt', 'a.txt', 'c.txt'):
+        (corpus / name).write_text(name)
+    files = [str(corpus / name) for name in sorted(os.listdir(corpus))]
+    path = str(tmp_path / 'inverted_index')
+    save_index({'apple': {0, 2}}, path, export_text=False, files=files)
+    assert saved_index_exists(path)
+    assert document_names({2, 0}, path) == ['a.txt', 'c.txt']
+    assert DocumentTable.load(path).name(1) == 'b.txt'
+    assert os.path.exists(document_table_path(path))
+
+
+def test_saved_index_is_stale_once_documents_change(tmp_path):
+    corpus = tmp_path / 'corpus'
+    corpus.mkdir()
+    for name in ('a.txt', 'b.txt'):
+        (corpus / name).write_text(name)
+    files = [str(corpus / name) for name in ('a.txt', 'b.txt')]
+    path = str(tmp_path / 'inverted_index')
+    save_index({'apple': {0}}, path, export_text=False, files=files)
+    assert saved_index_current(path, files)
+
+    # A newer modification time alone is checked against the content hash
+    os.utime(files[0], (0, 0))
+    assert saved_index_current(path, files)
+    (corpus / 'a.txt').write_text('changed')
+    assert not saved_index_current(path, files)
+    save_index({'apple': {0}}, path, export_text=False, files=files)
+    (corpus / 'c.txt').write_text('c.txt')
+    assert not saved_index_current(path, files + [str(corpus / 'c.txt')])
+    assert not saved_index_current(path, files[:1])
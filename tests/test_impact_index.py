@@ -0,0 +1,94 @@
+import random
+import pytest
+from assignment2 import vector_spacing
+from assignment2.vector_spacing import VectorSpaceIndex
+from assignment2.impact_index import ImpactIndex, quantize, compare_rankings, IMPACT_BITS
+
+VOCABULARY = [f'term{i}' for i in range(30)]
+DOCUMENTS = 200
+MAX_IMPACT = 2 ** IMPACT_BITS - 1
+
+
+@pytest.fixture(scope='module')
+def index():
+    rng = random.Random(0)
+    # Skewed term frequencies give postings lists of very different lengths and many distinct weights
+    documents = {doc_id: rng.choices(VOCABULARY, [1 / (i + 1) for i in range(len(VOCABULARY))], k=rng.randint(1, 40))
+                 for doc_id in range(DOCUMENTS)}
+    return VectorSpaceIndex.from_documents(documents, {doc_id: f'{doc_id}.txt' for doc_id in documents}, {})
+
+
+@pytest.fixture(scope='module')
+def queries():
+    rng = random.Random(1)
+    return [rng.sample(VOCABULARY, rng.randint(1, 6)) for _ in range(50)]
+
+
+def exact_scores(index, query_vector) -> dict:
+    return dict(vector_spacing.score_term_at_a_time(query_vector, index.inverted_index, index.doc_lengths,
+                                                    len(index.doc_ids)))
+
+
+def test_quantize_keeps_every_posting_and_the_order():
+    impacts = [quantize(weight, 1.0, MAX_IMPACT) for weight in (1e-9, 0.1, 0.5, 0.5000001, 0.99, 1.0)]
+    assert impacts == sorted(impacts)
+    assert impacts[0] == 1 and impacts[-1] == MAX_IMPACT
+    assert all(1 <= impact <= MAX_IMPACT for impact in impacts)
+
+
+@pytest.mark.parametrize('k', (1, 3, 10))
+def test_unlimited_budget_matches_exhaustive_ranking_within_quantization(index, queries, k):
+    impact_index = ImpactIndex(index)
+    for tokens in queries:
+        query_vector = vector_spacing.create_query_vector(tokens, index.inverted_index, index.total_docs, index.idf)
+        exact = exact_scores(index, query_vector)
+        # Impacts round every normalized weight up by less than one quantization step
+        step = impact_index.scale * sum(query_vector.values())
+        response = impact_index.process_query_tokens(tokens, k)
+        assert not response['terminated_early']
+        assert response['postings_scored'] == response['postings_total'] == \
+            sum(len(index.inverted_index[term]) for term in set(tokens))
+
+        results = response['results']
+        assert len(results) == min(k, len(exact))
+        for doc_id, score in results:
+            assert exact[doc_id] - 1e-12 <= score <= exact[doc_id] + step
+        for (first, _), (second, _) in zip(results, results[1:]):
+            assert exact[first] >= exact[second] - step
+        found = {doc_id for doc_id, _ in results}
+        lowest = min(exact[doc_id] for doc_id in found)
+        assert all(score <= lowest + step for doc_id, score in exact.items() if doc_id not in found)
+
+
+def test_tiny_budgets_terminate_early(index, queries):
+    impact_index = ImpactIndex(index)
+    tokens = max(queries, key=len)
+    response = impact_index.process_query_tokens(tokens, 10, max_postings=1)
+    assert response['terminated_early']
+    assert response['postings_scored'] == 1 and len(response['results']) == 1
+
+    response = impact_index.process_query_tokens(tokens, 10, budget_ms=0)
+    assert response['terminated_early']
+    assert response['postings_scored'] == 0 and response['results'] == []
+
+    total = impact_index.process_query_tokens(tokens, 10)['postings_total']
+    assert not impact_index.process_query_tokens(tokens, 10, max_postings=total)['terminated_early']
+
+
+def test_compare_rankings_counts_early_stops(index, queries):
+    impact_index = ImpactIndex(index)
+    unlimited = compare_rankings(index, impact_index, queries, 10)
+    assert unlimited['queries'] == len(queries) and unlimited['terminated_early'] == 0
+    assert unlimited['overlap'] > 0.9
+    budgeted = compare_rankings(index, impact_index, queries, 10, max_postings=1)
+    assert budgeted['terminated_early'] == len(queries)
+    assert budgeted['overlap'] < unlimited['overlap']
+
+
+def test_impacts_follow_index_updates():
+    index = VectorSpaceIndex.from_documents({0: ['apple'], 1: ['banana']}, {0: '0.txt', 1: '1.txt'}, {})
+    impact_index = ImpactIndex(index)
+    assert impact_index.process_query_tokens(['cherry'])['results'] == []
+    index.add_document('2.txt', ['cherry'])
+    index.update_statistics()
+    assert [doc_id for doc_id, _ in impact_index.process_query_tokens(['cherry'])['results']] == [2]
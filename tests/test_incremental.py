@@ -0,0 +1,27 @@
+from assignment1.incremental import SegmentedIndex
+from assignment1.question1 import create_inverted_index
+
+
+def write_documents(directory, documents):
+    for name, text in documents.items():
+        (directory / name).write_text(text)
+
+
+def test_membership_follows_tombstones(tmp_path):
+    corpus = tmp_path / 'corpus'
+    corpus.mkdir()
+    write_documents(corpus, {'a.txt': 'apple banana', 'b.txt': 'banana cherry'})
+    index = SegmentedIndex(str(tmp_path / 'index'), create_inverted_index, str.split)
+    try:
+        index.refresh(str(corpus))
+        assert 'apple' in index and 'cherry' in index and 'date' not in index
+
+        (corpus / 'a.txt').unlink()
+        write_documents(corpus, {'c.txt': 'cherry date'})
+        index.refresh(str(corpus))
+        assert 'apple' not in index
+        assert 'banana' in index and 'date' in index
+        assert sorted(index) == ['banana', 'cherry', 'date']
+        assert index.document_names(index['cherry']) == ['b.txt', 'c.txt']
+    finally:
+        index.close()
@@ -0,0 +1,39 @@
+import os
+import random
+import pytest
+from assignment1.question1 import build_index, create_inverted_index
+from assignment1.question2a import create_bi_word_index
+from assignment1.question2b import create_positional_index
+from assignment1.question2c import preprocess_for_soundex, create_soundex_index_from_terms, SoundexTable
+from tests.conftest import STOP_WORDS
+
+WORDS = 'apple banana cherry robert rupert smith smyth ashcraft tymczak pfister'.split()
+DOCUMENTS = 13
+# Chunks of a few documents split the corpus across every worker
+CHUNK_SIZE = 2
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    rng = random.Random(0)
+    for i in range(DOCUMENTS):
+        words = rng.choices(WORDS + list(STOP_WORDS), k=rng.randint(0, 20))
+        (tmp_path / f'{i:02}.txt').write_text(' '.join(words))
+    return str(tmp_path) + os.sep
+
+
+@pytest.mark.parametrize('builder', (create_inverted_index, create_positional_index, create_bi_word_index))
+def test_parallel_build_equals_serial_build(whitespace_pipeline, corpus, builder):
+    serial = build_index(builder, corpus, 1)
+    parallel = build_index(builder, corpus, 3, chunk_size=CHUNK_SIZE)
+    assert serial and parallel == serial
+    assert list(parallel) == list(serial)
+
+
+def test_parallel_soundex_build_equals_serial_build(whitespace_pipeline, corpus):
+    serial = build_index(create_inverted_index, corpus, 1, preprocess_for_soundex)
+    parallel = build_index(create_inverted_index, corpus, 3, preprocess_for_soundex, CHUNK_SIZE)
+    assert serial and parallel == serial
+    table = SoundexTable.from_term_index(parallel)
+    assert create_soundex_index_from_terms(parallel, table.codes) == \
+        create_soundex_index_from_terms(serial, SoundexTable.from_term_index(serial).codes)
@@ -0,0 +1,37 @@
+import random
+from itertools import product
+import pytest
+from assignment1.question2b import phrase_match, window_match, ordered_match
+
+
+def brute_force_ordered(position_lists, proximity):
+    return any(all(0 < b - a <= proximity for a, b in zip(chosen, chosen[1:]))
+               for chosen in product(*position_lists))
+
+
+def brute_force_window(position_lists, proximity):
+    return any(max(chosen) - min(chosen) <= proximity for chosen in product(*position_lists))
+
+
+def brute_force_phrase(position_lists):
+    return any(all(b - a == 1 for a, b in zip(chosen, chosen[1:])) for chosen in product(*position_lists))
+
+
+def random_position_lists(rng, terms):
+    return [sorted(rng.sample(range(30), rng.randint(1, 5))) for _ in range(terms)]
+
+
+def test_ordered_match_retries_later_positions():
+    assert ordered_match([[0], [1, 2], [4]], 2)
+    assert not ordered_match([[0], [1, 2], [5]], 2)
+
+
+@pytest.mark.parametrize('terms', (1, 2, 3, 4))
+def test_matchers_agree_with_brute_force(terms):
+    rng = random.Random(terms)
+    for _ in range(500):
+        position_lists = random_position_lists(rng, terms)
+        proximity = rng.randint(1, 6)
+        assert ordered_match(position_lists, proximity) == brute_force_ordered(position_lists, proximity)
+        assert window_match(position_lists, proximity) == brute_force_window(position_lists, proximity)
+        assert phrase_match(position_lists) == brute_force_phrase(position_lists)
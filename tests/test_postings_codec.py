@@ -0,0 +1,105 @@
+import random
+import pytest
+from assignment1.postings_codec import CompressedPostings, BLOCK_SIZE, encode, vbyte_encode, vbyte_decode
+from assignment1.index_store import write_binary_index, open_binary_index, encode_postings, transcode_postings, \
+    KIND_DOCUMENTS, KIND_POSITIONAL, CODEC_RAW, CODEC_VBYTE
+from assignment1.boolean_query import intersect
+from assignment1.query_cache import Cache, CachedIndex
+
+# A single posting, one block, and lists ending on and past a block boundary
+DOC_FREQS = (1, 5, BLOCK_SIZE, BLOCK_SIZE + 1, 3 * BLOCK_SIZE + 17)
+
+
+def random_doc_ids(rng, doc_freq):
+    # Large gaps take several VByte bytes
+    return sorted(rng.sample(range(2 ** 21), doc_freq))
+
+
+def random_positional(rng, doc_freq):
+    return {doc_id: sorted(rng.sample(range(2 ** 16), rng.randint(1, 6))) for doc_id in random_doc_ids(rng, doc_freq)}
+
+
+def test_vbyte_round_trip():
+    values = [0, 1, 127, 128, 255, 16383, 16384, 2 ** 32 - 1]
+    output = bytearray()
+    vbyte_encode(values, output)
+    assert vbyte_decode(output, 0, len(values)) == (values, len(output))
+
+
+@pytest.mark.parametrize('doc_freq', DOC_FREQS)
+def test_compressed_postings_round_trip(doc_freq):
+    rng = random.Random(doc_freq)
+    doc_ids = random_doc_ids(rng, doc_freq)
+    postings = CompressedPostings(encode(doc_ids), doc_freq)
+    assert list(postings) == doc_ids
+    assert [postings[i] for i in range(doc_freq)] == doc_ids
+    assert postings[-1] == doc_ids[-1]
+    assert all(doc_id in postings for doc_id in doc_ids)
+    absent = {doc_id + 1 for doc_id in doc_ids} - set(doc_ids)
+    assert not any(doc_id in postings for doc_id in absent)
+
+
+@pytest.mark.parametrize('doc_freq', DOC_FREQS)
+def test_compressed_positional_postings_round_trip(doc_freq):
+    rng = random.Random(doc_freq)
+    index = random_positional(rng, doc_freq)
+    doc_ids = sorted(index)
+    counts = [len(index[doc_id]) for doc_id in doc_ids]
+    positions = [position for doc_id in doc_ids for position in index[doc_id]]
+    postings = CompressedPostings(encode(doc_ids, counts, positions), doc_freq, positional=True)
+    assert list(postings) == doc_ids
+    assert dict(postings.items()) == index
+    assert all(postings.positions(doc_id) == index[doc_id] for doc_id in doc_ids)
+    assert postings.positions(doc_ids[-1] + 1) == []
+
+
+@pytest.mark.parametrize('codec', (CODEC_RAW, CODEC_VBYTE))
+def test_binary_index_round_trip(tmp_path, codec):
+    rng = random.Random(codec)
+    documents = {f'term{i}': set(random_doc_ids(rng, doc_freq)) for i, doc_freq in enumerate(DOC_FREQS)}
+    positional = {f'term{i}': random_positional(rng, doc_freq) for i, doc_freq in enumerate(DOC_FREQS)}
+    write_binary_index(documents, str(tmp_path / 'documents'), codec=codec)
+    write_binary_index(positional, str(tmp_path / 'positional'), codec=codec)
+
+    with open_binary_index(str(tmp_path / 'documents')) as index:
+        assert index.kind == KIND_DOCUMENTS and index.codec == codec
+        assert dict(index) == documents
+        assert all(list(index.postings(term)) == sorted(documents[term]) for term in documents)
+        assert all(index.document_frequency(term) == len(documents[term]) for term in documents)
+    with open_binary_index(str(tmp_path / 'positional')) as index:
+        assert index.kind == KIND_POSITIONAL and index.codec == codec
+        assert dict(index) == positional
+        for term, postings in positional.items():
+            assert all(index.positions(term, doc_id) == positions for doc_id, positions in postings.items())
+
+
+@pytest.mark.parametrize('kind', (KIND_DOCUMENTS, KIND_POSITIONAL))
+def test_transcoded_raw_postings_match_vbyte_encoding(kind):
+    rng = random.Random(kind)
+    postings = random_positional(rng, 2 * BLOCK_SIZE + 3)
+    if kind == KIND_DOCUMENTS:
+        postings = set(postings)
+    raw, doc_freq = encode_postings(postings, kind, CODEC_RAW)
+    assert transcode_postings(raw, doc_freq, kind, CODEC_VBYTE) == encode_postings(postings, kind, CODEC_VBYTE)[0]
+
+
+def test_cached_postings_stay_compressed(tmp_path):
+    rng = random.Random(2)
+    doc_freq = 8 * BLOCK_SIZE
+    long_term = random_doc_ids(rng, doc_freq)
+    short_term = sorted(rng.sample(long_term, 3))
+    write_binary_index({'long': set(long_term), 'short': set(short_term)}, str(tmp_path / 'documents'),
+                       codec=CODEC_VBYTE)
+    cache = Cache(max_bytes=2 ** 20)
+    with open_binary_index(str(tmp_path / 'documents')) as index:
+        cached = CachedIndex(index, cache)
+        postings = cached.postings('long')
+        assert isinstance(postings, CompressedPostings)
+        assert intersect(cached.postings('short'), postings) == short_term
+        # Galloping to three doc-ids decodes at most their blocks and the ones probed on the way
+        assert len(postings.blocks) < postings.num_blocks
+        assert cached.postings('long') is postings
+        assert cache.stats()['hits'] == 1 and cache.bytes >= doc_freq
+    # Cached postings do not keep the memory map of the closed index alive
+    assert index.buffer.closed
+    assert list(postings) == long_term
@@ -0,0 +1,51 @@
+import pytest
+from assignment1 import question1
+from assignment2 import vector_spacing
+
+TEXTS = [
+    'The Quick, brown fox -- and the lazy dog!',
+    "It's 2024: don't stop 'cause we're at 3.14 of 100%",
+    'Running runners ran; RUN, run... running?',
+    'e-mail ad-hoc C++ node.js x86_64 well-being',
+    'the and of , . !',
+    '',
+]
+
+
+def multi_pass_preprocess(string):
+    # The pipeline before the cleaning passes were fused, one pass over the string per step
+    string = question1.case_fold(string)
+    string = question1.expand_contractions(string)
+    string = question1.remove_punctuation(string)
+    string = question1.remove_stopwords(string)
+    preprocessor = question1.get_preprocessor()
+    return [preprocessor.lemmatizer.lemmatize(preprocessor.stemmer.stem(token))
+            for token in question1.tokenize(string)]
+
+
+def multi_pass_vector_preprocess(string):
+    string = vector_spacing.case_fold(string)
+    string = vector_spacing.expand_contractions(string)
+    string = vector_spacing.remove_stopwords(string)
+    string = vector_spacing.remove_punctuation(string)
+    return vector_spacing.tokenize(string)
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_fused_pipeline_equals_multi_pass_pipeline(whitespace_pipeline, text):
+    expected = multi_pass_preprocess(text)
+    assert question1.preprocess(text) == expected
+    assert question1.get_preprocessor().instrumented_call(text) == expected
+    assert vector_spacing.preprocess(text) == multi_pass_vector_preprocess(text)
+
+
+def test_uncached_token_after_cache_hits(whitespace_pipeline):
+    preprocessor = question1.Preprocessor(cache_size=2)
+    assert preprocessor('running runs') == multi_pass_preprocess('running runs')
+    assert preprocessor('running runs') == multi_pass_preprocess('running runs')
+    assert preprocessor.normalize_token.cache_info().hits == 2
+    # A token never seen before is normalized, not answered from the cache
+    assert preprocessor('running generously') == multi_pass_preprocess('running generously')
+    assert preprocessor.normalize_token.cache_info().misses == 3
+    # Evicted tokens are normalized again the same way
+    assert preprocessor('runs flies') == multi_pass_preprocess('runs flies')
@@ -0,0 +1,32 @@
+import asyncio
+import pytest
+from assignment1.query_server import QueryServer, MAX_REQUEST_LINE
+
+
+async def exchange(request: bytes) -> bytes:
+    server = QueryServer(indexes=None)
+    tcp = await asyncio.start_server(server.handle, '127.0.0.1', 0, limit=MAX_REQUEST_LINE)
+    port = tcp.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(request)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return response.split(b'\r\n', 1)[0]
+    finally:
+        tcp.close()
+        await tcp.wait_closed()
+
+
+@pytest.mark.parametrize('request_bytes', (
+    b'GET /boolean?q=' + b'a' * (4 * MAX_REQUEST_LINE) + b' HTTP/1.1\r\n\r\n',
+    b'GET /boolean?q=a HTTP/1.1\r\nX-Padding: ' + b'a' * (4 * MAX_REQUEST_LINE) + b'\r\n\r\n',
+    b'NONSENSE\r\n\r\n',
+))
+def test_bad_requests_get_a_response(request_bytes):
+    assert asyncio.run(exchange(request_bytes)) == b'HTTP/1.1 400 Bad Request'
+
+
+def test_unknown_endpoint():
+    assert asyncio.run(exchange(b'GET /missing HTTP/1.1\r\nConnection: close\r\n\r\n')) == b'HTTP/1.1 404 Not Found'
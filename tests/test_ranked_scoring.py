@@ -0,0 +1,62 @@
+import random
+import pytest
+from assignment2 import vector_spacing
+from assignment2.vector_spacing import VectorSpaceIndex
+
+VOCABULARY = [f'term{i}' for i in range(20)]
+DOCUMENTS = 80
+# Scores summed in another order differ in the last bits
+SCORE_TOLERANCE = 1e-12
+
+
+@pytest.fixture(scope='module')
+def index():
+    rng = random.Random(0)
+    documents = {doc_id: rng.choices(VOCABULARY, [1 / (i + 1) for i in range(len(VOCABULARY))], k=rng.randint(1, 25))
+                 for doc_id in range(DOCUMENTS)}
+    return VectorSpaceIndex.from_documents(documents, {doc_id: f'{doc_id}.txt' for doc_id in documents}, {})
+
+
+@pytest.fixture(scope='module')
+def queries():
+    rng = random.Random(1)
+    # Repeated terms and terms outside the vocabulary are weighted like the documents or dropped
+    return [' '.join(rng.choices(VOCABULARY + ['unknown'], k=rng.randint(1, 8))) for _ in range(60)] + ['unknown']
+
+
+def cosine_ranking(index, query, k):
+    # The full scan of every document vector that ranked queries used before term-at-a-time scoring
+    query_vector = vector_spacing.create_query_vector(query.split(), index.inverted_index, index.total_docs, index.idf)
+    scores = [(doc_id, vector_spacing.calculate_cosine_similarity(query_vector, doc_vector))
+              for doc_id, doc_vector in index.doc_vectors.items()]
+    return sorted((result for result in scores if result[1] > 0), key=vector_spacing.rank_key)[:k]
+
+
+def assert_same_ranking(expected, actual):
+    # Documents tied with the k-th score may be swapped by rounding
+    assert [score for _, score in actual] == pytest.approx([score for _, score in expected], abs=SCORE_TOLERANCE)
+    expected_docs = {doc_id for doc_id, _ in expected}
+    assert all(doc_id in expected_docs or abs(score - expected[-1][1]) <= SCORE_TOLERANCE for doc_id, score in actual)
+
+
+@pytest.mark.parametrize('k', (1, 3, 10))
+def test_term_at_a_time_matches_the_full_scan(whitespace_pipeline, index, queries, k):
+    for query in queries:
+        results = vector_spacing.process_query(query, index.inverted_index, index.doc_lengths, index.doc_vectors,
+                                               index.total_docs, index.idf, k)
+        assert_same_ranking(cosine_ranking(index, query, k), results)
+        query_vector = vector_spacing.create_query_vector(query.split(), index.inverted_index, index.total_docs,
+                                                          index.idf)
+        assert results == vector_spacing.score_term_at_a_time(query_vector, index.inverted_index, index.doc_lengths, k)
+
+
+@pytest.mark.parametrize('k', (1, 3, 10))
+def test_max_score_equals_term_at_a_time(whitespace_pipeline, index, queries, k):
+    for query in queries:
+        exhaustive = vector_spacing.process_query(query, index.inverted_index, index.doc_lengths, index.doc_vectors,
+                                                  index.total_docs, index.idf, k)
+        pruned = vector_spacing.process_query(query, index.inverted_index, index.doc_lengths, index.doc_vectors,
+                                              index.total_docs, index.idf, k, index.max_weights)
+        # Finalists are rescored in query order, so the scores are bit-identical
+        assert pruned == exhaustive, query
+        assert index.process_query(query, k, pruning=True) == exhaustive
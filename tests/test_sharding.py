@@ -0,0 +1,57 @@
+import os
+import random
+import pytest
+from assignment1 import sharding
+from assignment1.question1 import list_documents, preprocess_query, search
+from assignment1.question2a import search_bi_word_index
+from assignment1.question2b import search_phrase, search_query
+from assignment1.question2c import search_soundex_index
+from assignment1.multi_index import build_indexes_of_files, INVERTED, POSITIONAL, BI_WORD, SOUNDEX, VECTOR
+from assignment2 import vector_spacing
+from tests.conftest import STOP_WORDS
+
+WORDS = ('apple banana cherry date elderberry fig grape honeydew kiwi lemon mango nectarine orange papaya '
+         'quince raspberry robert rupert smith smyth').split()
+DOCUMENTS = 13
+SHARDS = 3
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    rng = random.Random(0)
+    directory = tmp_path / 'corpus'
+    directory.mkdir()
+    for i in range(DOCUMENTS):
+        words = rng.choices(WORDS + list(STOP_WORDS), k=rng.randint(3, 30))
+        (directory / f'{i:02}.txt').write_text(' '.join(words))
+    return str(directory) + os.sep
+
+
+def test_shards_answer_like_a_single_index(whitespace_pipeline, corpus, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    files = list_documents(corpus)
+    os.mkdir('single')
+    single = build_indexes_of_files(files, 1, 4, 'single')
+    manifest = sharding.build_shards(corpus, SHARDS, 1, 'shards')
+    assert [shard['documents'] for shard in manifest['shards']] == [5, 4, 4]
+
+    vector = single[VECTOR].compact()
+    rng = random.Random(1)
+    with sharding.ShardCoordinator('shards') as coordinator:
+        for _ in range(20):
+            a, b, c = rng.sample(WORDS, 3)
+            for query in (f'{a} and {b}', f'{a} or not {b}', f'not {a}', f'( {a} or {b} ) and not {c}'):
+                assert coordinator.boolean(query) == search(preprocess_query(query), single[INVERTED]), query
+            query = f'{a} {b}'
+            assert coordinator.bi_word(query) == search_bi_word_index(query, single[BI_WORD])
+            assert coordinator.phrase(query) == search_phrase(query, single[POSITIONAL], single[POSITIONAL])
+            assert coordinator.proximity(query, 3) == search_query(query, 3, single[POSITIONAL], single[POSITIONAL])
+            assert coordinator.soundex(a) == search_soundex_index(a, single[SOUNDEX])
+
+            query = f'{a} {b} {c} {a}'
+            query_vector = vector_spacing.create_query_vector(vector_spacing.preprocess(query), vector.inverted_index,
+                                                              vector.total_docs, vector.idf)
+            expected = vector_spacing.score_term_at_a_time(query_vector, vector.inverted_index, vector.doc_lengths, 5)
+            for pruning in (False, True):
+                assert coordinator.ranked(query, 5, pruning) == expected, (query, pruning)
+        assert coordinator.names(range(DOCUMENTS)) == [os.path.basename(file) for file in files]
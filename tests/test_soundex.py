@@ -0,0 +1,10 @@
+import pytest
+from assignment1.question2c import soundex
+from assignment1.question1 import FOUR
+
+
+@pytest.mark.parametrize('word, code', (('Robert', 'R163'), ('Rupert', 'R163'), ('Rubin', 'R150'),
+                                        ('Ashcraft', 'A226'), ('Tymczak', 'T522'),
+                                        ('Lee', 'L000')))
+def test_soundex_codes(word, code):
+    assert soundex(word, FOUR) == code
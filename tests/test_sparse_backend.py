@@ -0,0 +1,49 @@
+import random
+import pytest
+from assignment2 import vector_spacing
+from assignment2.vector_spacing import VectorSpaceIndex
+
+pytest.importorskip('scipy')
+from assignment2.sparse_backend import SparseMatrixIndex, results_match, compare_throughput  # noqa: E402
+
+VOCABULARY = [f'term{i}' for i in range(25)]
+DOCUMENTS = 150
+
+
+@pytest.fixture(scope='module')
+def index():
+    rng = random.Random(0)
+    documents = {doc_id: rng.choices(VOCABULARY, [1 / (i + 1) for i in range(len(VOCABULARY))], k=rng.randint(1, 30))
+                 for doc_id in range(DOCUMENTS)}
+    return VectorSpaceIndex.from_documents(documents, {doc_id: f'{doc_id}.txt' for doc_id in documents}, {})
+
+
+@pytest.fixture(scope='module')
+def token_lists():
+    rng = random.Random(1)
+    # Repeated and unknown terms exercise the query weighting
+    return [rng.choices(VOCABULARY + ['unknown'], k=rng.randint(1, 6)) for _ in range(80)] + [[], ['unknown']]
+
+
+@pytest.mark.parametrize('k', (1, 3, 10))
+def test_top_k_matches_vector_space_scoring(index, token_lists, k):
+    matrix_index = SparseMatrixIndex(index)
+    results = matrix_index.score_token_batch(token_lists, k)
+    assert len(results) == len(token_lists)
+    for tokens, actual in zip(token_lists, results):
+        query_vector = vector_spacing.create_query_vector(tokens, index.inverted_index, index.total_docs, index.idf)
+        expected = vector_spacing.score_term_at_a_time(query_vector, index.inverted_index, index.doc_lengths, k)
+        assert results_match(expected, actual), tokens
+        assert all(isinstance(doc_id, int) for doc_id, _ in actual)
+
+
+def test_batches_larger_than_batch_size(index, token_lists, monkeypatch):
+    monkeypatch.setattr('assignment2.sparse_backend.BATCH_SIZE', 7)
+    assert compare_throughput(index, token_lists, 5)['mismatches'] == 0
+
+
+def test_results_match_allows_ties_only_at_the_boundary():
+    expected = [(0, 0.9), (1, 0.5), (2, 0.5)]
+    assert results_match(expected, [(0, 0.9), (1, 0.5), (3, 0.5)])
+    assert not results_match(expected, [(3, 0.9), (1, 0.5), (2, 0.5)])
+    assert not results_match(expected, [(0, 0.9), (1, 0.5)])
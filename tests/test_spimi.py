@@ -0,0 +1,60 @@
+import os
+import tempfile
+import pytest
+from assignment1 import spimi
+from assignment1.index_store import dictionary_path, postings_path, KIND_DOCUMENTS, KIND_POSITIONAL
+from assignment1.question1 import build_index, create_inverted_index, save_index, list_documents
+from assignment1.question2a import create_bi_word_index, bi_words
+from assignment1.question2b import create_positional_index
+
+DOCUMENTS = {
+    'a.txt': 'apple banana apple cherry',
+    'b.txt': 'banana date',
+    'c.txt': 'cherry apple elderberry fig',
+    'd.txt': '',
+}
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    directory = tmp_path / 'corpus'
+    directory.mkdir()
+    for name, text in DOCUMENTS.items():
+        (directory / name).write_text(text)
+    return str(directory) + os.sep
+
+
+def read_index_files(path):
+    with open(dictionary_path(path), 'rb') as dictionary, open(postings_path(path), 'rb') as postings:
+        return dictionary.read(), postings.read()
+
+
+@pytest.mark.parametrize('kind, builder, term_extractor', ((KIND_DOCUMENTS, create_inverted_index, None),
+                                                           (KIND_POSITIONAL, create_positional_index, None),
+                                                           (KIND_DOCUMENTS, create_bi_word_index, bi_words)))
+def test_streaming_index_matches_save_index(corpus, tmp_path, kind, builder, term_extractor):
+    streamed_path = str(tmp_path / 'streamed')
+    saved_path = str(tmp_path / 'saved')
+    # A budget of one byte flushes a run after every document
+    with spimi.build_index_streaming(corpus, streamed_path, kind, term_extractor, str.split, memory_budget=1) as index:
+        # The trailing document without terms is part of the universe NOT is taken against
+        assert len(index.universe()) == len(DOCUMENTS)
+    save_index(build_index(builder, corpus, preprocessor=str.split), saved_path, export_text=False,
+               files=list_documents(corpus))
+    assert read_index_files(streamed_path) == read_index_files(saved_path)
+
+
+def test_runs_are_removed_when_indexing_fails(corpus, tmp_path, monkeypatch):
+    created = []
+    make_run_dir = tempfile.mkdtemp
+    monkeypatch.setattr(spimi.tempfile, 'mkdtemp', lambda **kwargs: created.append(make_run_dir(**kwargs)) or created[-1])
+
+    def failing_preprocessor(text):
+        if text.startswith('cherry'):
+            raise RuntimeError('unreadable document')
+        return text.split()
+
+    with pytest.raises(RuntimeError):
+        spimi.build_index_streaming(corpus, str(tmp_path / 'index'), preprocessor=failing_preprocessor,
+                                    memory_budget=1)
+    assert created and not any(os.path.exists(run_dir) for run_dir in created)
@@ -0,0 +1,80 @@
+import random
+import re
+import pytest
+from assignment1.term_dictionary import TermDictionary, edit_distance, k_grams, MAX_EDIT_DISTANCE, WILDCARD
+
+# A small alphabet makes near misses and shared k-grams common
+ALPHABET = 'abcd'
+
+
+def random_word(rng, min_length=1, max_length=8):
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(min_length, max_length)))
+
+
+def levenshtein(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j - 1] + (char_a != char_b), previous[j] + 1, current[j - 1] + 1))
+        previous = current
+    return previous[-1]
+
+
+def ranked(frequencies, terms):
+    return sorted(terms, key=lambda term: (-frequencies[term], term))
+
+
+@pytest.fixture(scope='module')
+def vocabulary():
+    rng = random.Random(0)
+    return {random_word(rng): rng.randint(1, 5) for _ in range(400)}
+
+
+@pytest.fixture(scope='module')
+def dictionary(vocabulary):
+    return TermDictionary(vocabulary)
+
+
+def test_edit_distance_matches_levenshtein():
+    rng = random.Random(1)
+    for _ in range(2000):
+        a, b = random_word(rng, 0), random_word(rng, 0)
+        limit = rng.randint(0, 3)
+        assert edit_distance(a, b, limit) == min(levenshtein(a, b), limit + 1)
+
+
+def test_expand_matches_regex_scan(dictionary, vocabulary):
+    rng = random.Random(2)
+    patterns = ['*', 'a*', '*d', 'ab*cd', '*bc*', 'a*b*c'] + \
+               [random_word(rng, 1, 3) + WILDCARD + random_word(rng, 0, 3) for _ in range(100)]
+    for pattern in patterns:
+        matcher = re.compile('.*'.join(map(re.escape, pattern.split(WILDCARD))))
+        expected = ranked(vocabulary, [term for term in vocabulary if matcher.fullmatch(term)])
+        assert dictionary.expand(pattern) == expected, pattern
+        assert dictionary.expand(pattern, 3) == expected[:3]
+
+
+def test_expand_without_wildcard_is_a_lookup(dictionary, vocabulary):
+    term = next(iter(vocabulary))
+    assert dictionary.expand(term) == [term]
+    assert dictionary.expand('e') == []
+
+
+def test_corrections_match_brute_force(dictionary, vocabulary):
+    rng = random.Random(3)
+    for _ in range(300):
+        word = random_word(rng, 2, 9)
+        if word in vocabulary:
+            assert dictionary.corrections(word) == (word,)
+            continue
+        # Beyond this distance a term may share no k-gram with the word
+        max_distance = min(MAX_EDIT_DISTANCE, (len(k_grams(word)) - 1) // dictionary.k)
+        expected = ()
+        for distance in range(1, max_distance + 1):
+            matches = [term for term in vocabulary if levenshtein(word, term) == distance]
+            if matches:
+                expected = tuple(ranked(vocabulary, matches))
+                break
+        assert dictionary.corrections(word) == expected, word
+        assert dictionary.correct(word) == (expected[0] if expected else None)
@@ -0,0 +1,83 @@
+import random
+import pytest
+from assignment2 import vector_spacing
+from assignment2.vector_spacing import VectorSpaceIndex, TieredIndex
+
+VOCABULARY = [f'term{i}' for i in range(20)]
+DOCUMENTS = 120
+
+
+class RecordingPostings:
+    """Impact-ordered postings of a term that remember the furthest position read"""
+
+    def __init__(self, doc_ids, reads):
+        self.doc_ids = doc_ids
+        self.reads = reads
+
+    def __getitem__(self, tier):
+        self.reads.append(tier.stop)
+        return self.doc_ids[tier]
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+
+@pytest.fixture(scope='module')
+def index():
+    rng = random.Random(0)
+    documents = {doc_id: rng.choices(VOCABULARY, [1 / (i + 1) for i in range(len(VOCABULARY))], k=rng.randint(1, 25))
+                 for doc_id in range(DOCUMENTS)}
+    return VectorSpaceIndex.from_documents(documents, {doc_id: f'{doc_id}.txt' for doc_id in documents}, {})
+
+
+@pytest.fixture(scope='module')
+def query_vectors(index):
+    rng = random.Random(1)
+    return [vector_spacing.create_query_vector(rng.sample(VOCABULARY, rng.randint(1, 5)), index.inverted_index,
+                                               index.total_docs, index.idf) for _ in range(60)]
+
+
+def exhaustive(index, query_vector, k):
+    return vector_spacing.score_term_at_a_time(query_vector, index.inverted_index, index.doc_lengths, k)
+
+
+@pytest.mark.parametrize('k', (1, 3, 10))
+@pytest.mark.parametrize('tier_sizes', ((), (DOCUMENTS,)))
+def test_single_full_tier_equals_exhaustive_scoring(index, query_vectors, tier_sizes, k):
+    tiered = TieredIndex(index, tier_sizes)
+    for query_vector in query_vectors:
+        assert vector_spacing.score_tiered(query_vector, index.inverted_index, index.doc_lengths, tiered.ordered,
+                                           tiered.bounds, k) == exhaustive(index, query_vector, k)
+
+
+@pytest.mark.parametrize('k', (1, 3, 10))
+def test_tiers_are_read_until_k_candidates_are_found(index, query_vectors, k):
+    tiered = TieredIndex(index, (1, 1, 2, 4))
+    for query_vector in query_vectors:
+        reads = []
+        ordered = {term: RecordingPostings(tiered.ordered[term], reads) for term in query_vector}
+        results = vector_spacing.score_tiered(query_vector, index.inverted_index, index.doc_lengths, ordered,
+                                              tiered.bounds, k)
+
+        # The first tier, in order, holding k candidates, or the last one
+        expected_end = None
+        for end in tiered.bounds:
+            candidates = {doc_id for term in query_vector for doc_id in tiered.ordered[term][:end]}
+            if len(candidates) >= k or all(len(tiered.ordered[term]) <= end for term in query_vector):
+                expected_end = end
+                break
+        assert max(reads, key=lambda end: float('inf') if end is None else end) == expected_end
+
+        exact = dict(exhaustive(index, query_vector, len(index.doc_ids)))
+        assert len(results) == min(k, len(exact))
+        assert all(score == exact[doc_id] for doc_id, score in results)
+        assert results == sorted(results, key=vector_spacing.rank_key)
+
+
+def test_process_query_rebuilds_stale_tiers():
+    index = VectorSpaceIndex.from_documents({0: ['apple'], 1: ['banana']}, {0: '0.txt', 1: '1.txt'}, {})
+    tiered = index.tiered((1,))
+    assert vector_spacing.process_query_tiered(['cherry'], tiered) == []
+    index.add_document('2.txt', ['cherry'])
+    index.update_statistics()
+    assert [doc_id for doc_id, _ in vector_spacing.process_query_tiered(['cherry'], tiered)] == [2]
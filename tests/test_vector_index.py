@@ -0,0 +1,86 @@
+import os
+import pickle
+import pytest
+from assignment2 import vector_spacing
+from assignment2.vector_spacing import VectorSpaceIndex
+
+DOCUMENTS = {0: ['apple', 'banana', 'apple'], 1: ['banana', 'cherry'], 2: ['cherry', 'date', 'apple']}
+
+
+def make_index():
+    doc_ids = {doc_id: f'doc{doc_id}.txt' for doc_id in DOCUMENTS}
+    return VectorSpaceIndex.from_documents(DOCUMENTS, doc_ids, {name: (0.0, '') for name in doc_ids.values()})
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = make_index()
+    index.file_stats = {'doc0.txt': (1.5, 'hash')}
+    file = str(tmp_path / vector_spacing.VECTOR_INDEX_FILE)
+    index.save(file)
+    loaded = VectorSpaceIndex.load(file)
+    for name in ('inverted_index', 'doc_ids', 'doc_lengths', 'doc_vectors', 'total_docs', 'doc_freqs', 'idf',
+                 'max_weights', 'file_stats'):
+        assert getattr(loaded, name) == getattr(index, name)
+    query_vector = vector_spacing.create_query_vector(['apple', 'cherry'], loaded.inverted_index, loaded.total_docs,
+                                                      loaded.idf)
+    assert vector_spacing.score_term_at_a_time(query_vector, loaded.inverted_index, loaded.doc_lengths) == \
+        vector_spacing.score_term_at_a_time(query_vector, index.inverted_index, index.doc_lengths)
+
+
+@pytest.mark.parametrize('corrupt', (
+    lambda data: data[:len(data) // 2],
+    lambda data: b'',
+    lambda data: pickle.dumps({'format': 2}),
+    lambda data: data.replace(b'"format": 3', b'"format": 2'),
+    lambda data: b'[]',
+))
+def test_corrupt_or_other_format_files_are_rejected(tmp_path, corrupt):
+    file = tmp_path / vector_spacing.VECTOR_INDEX_FILE
+    make_index().save(str(file))
+    file.write_bytes(corrupt(file.read_bytes()))
+    with pytest.raises(ValueError):
+        VectorSpaceIndex.load(str(file))
+
+
+def test_get_index_rebuilds_a_truncated_file(whitespace_pipeline, tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_spacing, '_vector_space_index', None)
+    corpus = tmp_path / 'corpus'
+    corpus.mkdir()
+    (corpus / 'a.txt').write_text('apple banana')
+    file = tmp_path / vector_spacing.VECTOR_INDEX_FILE
+    file.write_text('{"format": 3, "documents": [[0, "a.tx')
+    assert vector_spacing.get_index(str(file), str(corpus) + os.sep).doc_ids == {0: 'a.txt'}
+    assert VectorSpaceIndex.load(str(file)).doc_ids == {0: 'a.txt'}
+
+
+def test_ranked_results_use_the_shared_cache(monkeypatch):
+    from assignment1.query_cache import cache_stats, clear_caches
+    monkeypatch.setattr(vector_spacing, 'preprocess', str.split)
+    index = make_index()
+    clear_caches()
+    first = index.process_query('apple cherry')
+    assert index.process_query('apple cherry') == first
+    assert cache_stats()['ranked']['hits'] == 1
+    clear_caches()
+    assert cache_stats()['ranked']['entries'] == 0
+    index.add_document('doc3.txt', ['apple'])
+    index.update_statistics()
+    assert index.process_query('apple cherry') != first
+
+
+def test_get_index_refreshes_a_loaded_index(whitespace_pipeline, tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_spacing, '_vector_space_index', None)
+    corpus = tmp_path / 'corpus'
+    corpus.mkdir()
+    (corpus / 'a.txt').write_text('apple banana')
+    (corpus / 'b.txt').write_text('banana cherry')
+    file, directory = str(tmp_path / vector_spacing.VECTOR_INDEX_FILE), str(corpus) + os.sep
+    assert vector_spacing.get_index(file, directory).total_docs == 2
+
+    (corpus / 'c.txt').write_text('cherry date')
+    os.remove(corpus / 'a.txt')
+    assert vector_spacing.get_index(file, directory).total_docs == 2
+    index = vector_spacing.get_index(file, directory, refresh=True)
+    assert sorted(index.doc_ids.values()) == ['b.txt', 'c.txt']
+    assert 'apple' not in index.inverted_index and index.idf['date'] == vector_spacing.calculate_idf(2, 1)
+    assert sorted(VectorSpaceIndex.load(file).doc_ids.values()) == ['b.txt', 'c.txt']